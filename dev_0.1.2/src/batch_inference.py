@@ -0,0 +1,179 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+from modules.model_registry import ModelRegistry
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+PREDICTIONS_DIRECTORY = "predictions"
+CHUNK_SIZE = 10000
+RGB_COLUMNS = ["Red", "Green", "Blue"]
+
+# Model registry of the worker process (one per process, so its LRU cache is reused across files)
+registry = None
+
+
+# Define a function to initialize a worker process
+def init_worker(models_path):
+    global registry
+    registry = ModelRegistry(models_path, cache_size=64)
+
+# Define a function to read an input file in chunks (.csv or .parquet)
+def read_chunks(input_file, chunk_size):
+    if input_file.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Reading .parquet files requires pyarrow. Install it with: pip install pyarrow")
+        for batch in pq.ParquetFile(input_file).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        for chunk in pd.read_csv(input_file, chunksize=chunk_size):
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+
+# Define a class to write output chunks (.csv or .parquet) to a temporary file, renamed to the output file when it is complete
+class ChunkWriter:
+    def __init__(self, output_file):
+        self.output_file = output_file
+        self.temp_file = f"{output_file}.tmp"
+        self.parquet_writer = None
+        self.header = True
+
+    # Method to append a chunk to the output file
+    def write(self, chunk):
+        if self.output_file.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if self.parquet_writer is None:
+                self.parquet_writer = pq.ParquetWriter(self.temp_file, table.schema)
+            self.parquet_writer.write_table(table)
+        else:
+            chunk.to_csv(self.temp_file, mode="w" if self.header else "a", header=self.header, index=False)
+        self.header = False
+
+    # Method to finish the output file (renamed into place on success, removed otherwise)
+    def close(self, success=True):
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+        if success and os.path.exists(self.temp_file):
+            os.replace(self.temp_file, self.output_file)
+        elif os.path.exists(self.temp_file):
+            os.remove(self.temp_file)
+
+# Define a function to predict every row of one input file with a set of models
+def predict_file(input_file, output_file, model_ids, chunk_size):
+    start_time = time.perf_counter()
+    models = {model_id: registry.load(model_id) for model_id in model_ids}
+    writer = ChunkWriter(output_file)
+    num_rows = 0
+    success = False
+
+    try:
+        for chunk in read_chunks(input_file, chunk_size):
+            missing = [column for column in RGB_COLUMNS if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"{input_file} has no {missing} columns.")
+            rgb = chunk[RGB_COLUMNS].to_numpy(dtype=np.float64)
+
+            # Featurize once per color space, then predict with every model using it
+            features = {}
+            for model_id, model in models.items():
+                color_space = registry.get(model_id)["pipeline"]["color_space"]
+                if color_space not in features:
+                    features[color_space] = registry.featurize(model_id, rgb)
+                chunk[f"Predicted_{model_id}"] = model.predict(features[color_space])
+
+            writer.write(chunk)
+            num_rows += len(chunk)
+        success = True
+    finally:
+        writer.close(success)
+
+    return input_file, output_file, num_rows, time.perf_counter() - start_time
+
+# Define a function to expand file arguments (paths or glob patterns)
+def expand_inputs(patterns):
+    input_files = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern))
+        input_files.extend(matches if matches else [pattern])
+    return list(dict.fromkeys(os.path.normpath(input_file) for input_file in input_files)) # Each file once
+
+# Define a function to name the output file of every input file (inputs with the same name are prefixed with their directory; None on a collision)
+def get_output_files(input_files, output_dir, output_format):
+    stems = [os.path.splitext(os.path.basename(input_file))[0] for input_file in input_files]
+    output_files = []
+    for input_file, stem in zip(input_files, stems):
+        if stems.count(stem) > 1:
+            stem = f"{os.path.basename(os.path.dirname(os.path.abspath(input_file)))}_{stem}"
+        output_files.append(os.path.join(output_dir, f"{stem}_predicted.{output_format}"))
+    return output_files if len(set(output_files)) == len(output_files) else None
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Predict .csv/.parquet datasets with registered models.")
+    parser.add_argument("inputs", nargs="+", help="Input files or glob patterns (e.g. '../data/tests/*_corrected.csv').")
+    parser.add_argument("--models", nargs="+", default=["random_forest_cmyk"], help="Registered model ids.")
+    parser.add_argument("--output-dir", default=None, help="Output directory (default: data/predictions).")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Output file format.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per chunk.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Worker processes (one file per worker).")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    models_path = os.path.join(data_path, MODELS_DIRECTORY)
+    output_dir = args.output_dir or os.path.join(data_path, PREDICTIONS_DIRECTORY)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"Output directory is created at: {output_dir}")
+
+    # Check the model ids before starting the workers
+    model_ids = args.models
+    unknown_ids = [model_id for model_id in model_ids if model_id not in ModelRegistry(models_path).model_ids()]
+    if unknown_ids:
+        print(f"Unknown model ids: {unknown_ids}")
+        sys.exit(1)
+
+    input_files = expand_inputs(args.inputs)
+    output_files = get_output_files(input_files, output_dir, args.format)
+    if output_files is None:
+        print("Input files with the same name in directories with the same name would overwrite each other's predictions. "
+              "Predict them in separate runs with different --output-dir.")
+        sys.exit(1)
+    jobs = list(zip(input_files, output_files))
+
+    # Predict files in parallel worker processes
+    start_time = time.perf_counter()
+    total_rows = 0
+    workers = max(1, min(args.workers, len(jobs)))
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(models_path,)) as executor:
+        futures = [executor.submit(predict_file, input_file, output_file, model_ids, args.chunk_size)
+                   for input_file, output_file in jobs]
+        for future in as_completed(futures):
+            try:
+                input_file, output_file, num_rows, seconds = future.result()
+            except Exception as e:
+                print(f"Prediction error occurred: {e}")
+                continue
+            total_rows += num_rows
+            print(f"{os.path.basename(input_file)}: {num_rows} rows in {seconds:.2f} s "
+                  f"({num_rows / max(seconds, 1e-9):.0f} rows/s) -> {output_file}")
+
+    elapsed = time.perf_counter() - start_time
+    print(f"\nPredicted {total_rows} rows from {len(jobs)} files with {len(model_ids)} models "
+          f"in {elapsed:.2f} s ({total_rows / max(elapsed, 1e-9):.0f} rows/s, {workers} workers).")
@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import argparse
+import multiprocessing
+import numpy as np
+import pandas as pd
+from modules import training
+from modules.model_registry import ModelRegistry
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+METRICS_DIRECTORY = "metrics"
+BENCHMARK_FILE = "benchmark.csv"
+SINGLE_ROW_REPEATS = 500
+BATCH_SIZE = 10000
+RANDOM_STATE = 2
+
+
+# Define a function to read the resident memory (VmRSS) or peak resident memory (VmHWM) of the current process in MiB
+def get_rss_mib(field="VmRSS"):
+    try:
+        with open("/proc/self/status", "r") as file:
+            for line in file:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Fallback: peak resident memory (kB on Linux, bytes on macOS)
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+# Define a function to reset the peak resident memory of the current process to its current value (Linux only)
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+    except OSError:
+        pass
+
+# Define a function to flatten a forest into node arrays before it is benchmarked (returns the time in ms, NaN if there was nothing to do)
+def prepare_model(models_path, model_id):
+    from modules.ensemble import FOREST_TYPES
+    registry = ModelRegistry(models_path)
+    if registry.get(model_id).get("model_type") not in FOREST_TYPES or os.path.isdir(registry.arrays_path(model_id)):
+        return np.nan
+    start_time = time.perf_counter()
+    registry.load_tree_ensemble(model_id)
+    return (time.perf_counter() - start_time) * 1000
+
+# Define a function to benchmark one model (run in a fresh process, so the load is cold)
+def benchmark_model(models_path, model_id, repeats=SINGLE_ROW_REPEATS, batch_size=BATCH_SIZE):
+    # Import the model libraries first, so the load time and memory are the model's own
+    import joblib
+    import sklearn.ensemble, sklearn.neural_network, sklearn.svm
+    registry = ModelRegistry(models_path)
+    entry = registry.get(model_id)
+    rss_before = get_rss_mib()
+    reset_peak_rss()
+
+    # Loaded as the device loads it (forests as memory-mapped node arrays, already flattened by prepare_model)
+    from modules.ensemble import load_ensemble_model
+    start_time = time.perf_counter()
+    model = load_ensemble_model(registry, model_id)
+    load_seconds = time.perf_counter() - start_time
+
+    rng = np.random.RandomState(RANDOM_STATE)
+    X_batch = registry.featurize(model_id, rng.uniform(0, 255, size=(batch_size, 3)))
+    if entry.get("n_features") not in (None, X_batch.shape[1]):
+        raise ValueError(f"model expects {entry['n_features']} features, {entry['pipeline']['color_space']} has {X_batch.shape[1]}")
+
+    # Single-row latency (the first call is a warm-up)
+    X_row = X_batch[:1]
+    model.predict(X_row)
+    latencies = np.empty(repeats)
+    for i in range(repeats):
+        start_time = time.perf_counter()
+        model.predict(X_row)
+        latencies[i] = time.perf_counter() - start_time
+
+    # Batch throughput
+    start_time = time.perf_counter()
+    model.predict(X_batch)
+    batch_seconds = time.perf_counter() - start_time
+
+    # Memory once the model has been used (memory-mapped arrays are only resident after they are read)
+    rss_after = get_rss_mib()
+    peak_rss = get_rss_mib("VmHWM")
+
+    return {
+        "Model": model_id,
+        "Model_Type": entry.get("model_type"),
+        "Runtime": type(model).__name__,
+        "Color_Space": entry["pipeline"]["color_space"],
+        "File_Size_KiB": entry["size"] / 1024,
+        "Load_ms": load_seconds * 1000,
+        "RSS_MiB": rss_after - rss_before,
+        "Peak_RSS_MiB": peak_rss - rss_before,
+        "Single_Row_p50_us": np.percentile(latencies, 50) * 1e6,
+        "Single_Row_p99_us": np.percentile(latencies, 99) * 1e6,
+        "Batch_Rows_per_s": batch_size / batch_seconds,
+    }
+
+# Define a function to add the MAE of every model (from its manifest metrics, else from the metrics file of its dataset)
+def add_accuracy(results, metrics_path, registry):
+    mae = []
+    for model_id in results["Model"]:
+        entry = registry.get(model_id)
+        value = (entry.get("metrics") or {}).get("MAE")
+        if value is None:
+            recorded = training.get_recorded_mae(metrics_path, model_id, entry["model_name"], entry["pipeline"]["color_space"])
+            value = recorded.get(entry.get("dataset"), recorded.get(None, np.nan))
+        mae.append(value)
+    results.insert(3, "MAE", mae)
+    return results
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Benchmark load time, memory and latency of every registered model.")
+    parser.add_argument("models", nargs="*", help="Model ids (default: every registered model).")
+    parser.add_argument("--repeats", type=int, default=SINGLE_ROW_REPEATS, help="Single-row predictions per model.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows of the throughput batch.")
+    parser.add_argument("--output", default=None, help="Output .csv file (default: data/metrics/benchmark.csv).")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    models_path = os.path.join(data_path, MODELS_DIRECTORY)
+    metrics_path = os.path.join(data_path, METRICS_DIRECTORY)
+    output_file = args.output or os.path.join(metrics_path, BENCHMARK_FILE)
+
+    registry = ModelRegistry(models_path)
+    model_ids = args.models or registry.model_ids()
+
+    # Every model is measured in its own fresh process, one at a time
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for model_id in model_ids:
+        try:
+            # The one-time flattening of a forest is measured on its own, so Load_ms is the load of every later start
+            with context.Pool(processes=1, maxtasksperchild=1) as pool:
+                flatten_ms = pool.apply(prepare_model, (models_path, model_id))
+            with context.Pool(processes=1, maxtasksperchild=1) as pool:
+                result = pool.apply(benchmark_model, (models_path, model_id, args.repeats, args.batch_size))
+        except Exception as e:
+            print(f"{model_id}: skipped ({e})")
+            continue
+        result["Flatten_ms"] = flatten_ms
+        results.append(result)
+        print(f"{model_id:>28}: load {result['Load_ms']:8.1f} ms, RSS {result['RSS_MiB']:7.1f} MiB "
+              f"(peak {result['Peak_RSS_MiB']:7.1f} MiB), "
+              f"p50 {result['Single_Row_p50_us']:9.1f} us, p99 {result['Single_Row_p99_us']:9.1f} us, "
+              f"{result['Batch_Rows_per_s']:10.0f} rows/s")
+
+    if not results:
+        print("\nNo model could be benchmarked.")
+        sys.exit(1)
+    results = add_accuracy(pd.DataFrame(results), metrics_path, registry)
+    results.to_csv(output_file, index=False)
+    print(f"\nBenchmark saved at: {output_file}")
@@ -0,0 +1,126 @@
+import os
+import sys
+import glob
+import time
+import argparse
+import numpy as np
+import joblib
+from modules.color_space import convert_color_space
+from modules.prediction_surface import PredictionSurface, build_surface, save_surface
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+SURFACE_DIRECTORY = "surfaces"
+TRAINING_DIRECTORY = "training"
+TESTS_DIRECTORY = "tests"
+DATASET_NAME = "BCA-200uL-2"
+TEST_SIZE = 0.2
+RANDOM_STATE = 2
+RGB_DOMAIN_STEPS = 64
+
+
+# Define a function to get the color space name from a model file name (e.g. "random_forest_hsl.joblib")
+def get_color_space_name(model_file):
+    return os.path.splitext(os.path.basename(model_file))[0].split("_")[-1]
+
+# Define a function to find the bounds of a color space over every sensor RGB value
+def get_color_space_bounds(color_space_name, steps=RGB_DOMAIN_STEPS):
+    axis = np.linspace(0, 255, steps)
+    rgb = np.array(np.meshgrid(axis, axis, axis, indexing="ij")).reshape(3, -1).T
+    features = convert_color_space(rgb, color_space_name)
+    return features.min(axis=0), features.max(axis=0)
+
+# Define a function to read the Red, Green and Blue columns of a .csv file
+def load_rgb(csv_file):
+    data = np.genfromtxt(csv_file, delimiter=",", names=True, dtype=None, encoding=None)
+    return np.column_stack([data["Red"], data["Green"], data["Blue"]]).astype(np.float64)
+
+# Define a function to collect the test sets: the training notebooks' test split and data/tests
+def load_test_sets(data_path, dataset_name):
+    from sklearn.model_selection import train_test_split
+
+    test_sets = {}
+    reference_file = os.path.join(data_path, TRAINING_DIRECTORY, f"reference_corrected_{dataset_name}.csv")
+    if os.path.exists(reference_file):
+        rgb = load_rgb(reference_file)
+        _, rgb_test = train_test_split(rgb, test_size=TEST_SIZE, random_state=RANDOM_STATE)
+        test_sets[f"test split of {dataset_name}"] = rgb_test
+    for test_file in sorted(glob.glob(os.path.join(data_path, TESTS_DIRECTORY, "*_corrected.csv"))):
+        test_sets[os.path.basename(test_file)] = load_rgb(test_file)
+    return test_sets
+
+# Define a function to compare a surface with its model on the test sets
+def validate_surface(model, surface, color_space_name, test_sets):
+    print(f"{'Test set':>45} {'Rows':>6} {'MAE':>10} {'Max_Error':>10}")
+    for name, rgb in test_sets.items():
+        X = convert_color_space(rgb, color_space_name)
+        errors = np.abs(surface.predict(X) - model.predict(X))
+        print(f"{name:>45} {len(X):>6} {np.mean(errors):>10.4f} {np.max(errors):>10.4f}")
+
+# Define a function to time single-row predictions (microseconds per call)
+def time_single_row(predict, X, repeats=200):
+    predict(X)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        predict(X)
+    return (time.perf_counter() - start_time) / repeats * 1e6
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Precompute model predictions over a grid of the color space.")
+    parser.add_argument("models", nargs="*", help="Model files (default: every model in data/models).")
+    parser.add_argument("--resolution", type=int, default=None,
+                        help="Grid points per axis (default: 64 for 3 features, 32 for 4 features).")
+    parser.add_argument("--dataset", default=DATASET_NAME, help="Dataset whose test split is used for validation.")
+    parser.add_argument("--output", default=None, help="Output directory (default: data/models/surfaces).")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    models_path = os.path.join(data_path, MODELS_DIRECTORY)
+    surface_dir = args.output or os.path.join(models_path, SURFACE_DIRECTORY)
+    if not os.path.exists(surface_dir):
+        os.makedirs(surface_dir)
+        print(f"Surface directory is created at: {surface_dir}")
+
+    model_files = args.models or sorted(glob.glob(os.path.join(models_path, "*.joblib")))
+    test_sets = load_test_sets(data_path, args.dataset)
+
+    for model_file in model_files:
+        model_name = os.path.splitext(os.path.basename(model_file))[0]
+        color_space_name = get_color_space_name(model_file)
+        model = joblib.load(model_file)
+        lower, upper = get_color_space_bounds(color_space_name)
+        if getattr(model, "n_features_in_", len(lower)) != len(lower):
+            print(f"{model_name}: skipped (model expects {model.n_features_in_} features, {color_space_name} has {len(lower)})")
+            continue
+        resolution = args.resolution or (64 if len(lower) <= 3 else 32)
+
+        # Evaluate the model over the grid once
+        start_time = time.time()
+        values, lower, upper = build_surface(model.predict, lower, upper, resolution)
+        metadata = {
+            "model_file": os.path.basename(model_file),
+            "model_type": type(model).__name__,
+            "color_space": color_space_name,
+            "resolution": resolution,
+        }
+        surface_path = os.path.join(surface_dir, f"{model_name}.npy")
+        save_surface(surface_path, values, lower, upper, metadata)
+        print(f"{model_name}: {values.size} grid points in {time.time() - start_time:.1f} s, {values.nbytes / 1024:.0f} KiB")
+
+        # Validate the interpolation error and compare latency
+        surface = PredictionSurface.load(surface_path)
+        validate_surface(model, surface, color_space_name, test_sets)
+        X = convert_color_space(next(iter(test_sets.values()))[:1], color_space_name)
+        print(f"Single row: model {time_single_row(model.predict, X):.1f} us, "
+              f"surface {time_single_row(surface.predict, X):.1f} us\n")
+
+    print("Prediction surfaces done.")
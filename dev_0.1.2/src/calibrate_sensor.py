@@ -5,10 +5,11 @@ import traceback
 import RPi.GPIO as GPIO
 from modules.I2CLCD import I2CLCD
 from modules.TCS3200 import TCS3200
+from modules.calibration_store import CalibrationStore, LEGACY_CALIBRATION_FILE, get_sensor_config
 
 # Hyperparameters
 DATA_DIRECTORY = os.path.join("..", "data")
-CALIBRATION_FILE = "calibration.txt"
+WRITE_LEGACY_FILE = True # Also write calibration.txt for the notebooks
 
 
 if __name__ == "__main__":
@@ -79,13 +80,18 @@ if __name__ == "__main__":
         if not os.path.exists(data_dir):
             os.makedirs(data_dir)
 
-        # Save the global min and max values to a file
-        with open(os.path.join(data_dir, CALIBRATION_FILE), "w") as f:
-            f.write(f"global_min:{global_min}\n")
-            f.write(f"global_max:{global_max}\n")
-            f.write(f"white_balance:{global_max[3]}\n")  # Saving the CLEAR channel reading as the white balance
-        print(f"Calibration done. \nCalibration file saved at: {os.path.join(data_dir, CALIBRATION_FILE)}\n")
-        
+        # Save the calibration as a new version of the profile of this sensor setup
+        store = CalibrationStore(data_dir)
+        profile, version = store.save(global_min, global_max, white_balance=global_max[3],  # The CLEAR channel reading is the white balance
+                                      source=os.path.basename(__file__), **get_sensor_config(sensor))
+        print(f"Calibration done. \nCalibration profile {profile} (version {version}) saved at: {store.path}\n")
+
+        if WRITE_LEGACY_FILE:
+            with open(os.path.join(data_dir, LEGACY_CALIBRATION_FILE), "w") as f:
+                f.write(f"global_min:{global_min}\n")
+                f.write(f"global_max:{global_max}\n")
+                f.write(f"white_balance:{global_max[3]}\n")
+
         lcd.text("File saved.", line=2)
         time.sleep(1)
 
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import argparse
+from modules.data_catalog import DataCatalog
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Update and query the data catalog (data/catalog.sqlite).")
+    parser.add_argument("--scan", action="store_true", help="Index new and changed files, drop removed ones.")
+    parser.add_argument("--kind", default=None, help="List the files of a kind (e.g. reference_corrected, session, model, metrics).")
+    parser.add_argument("--dataset", default=None, help="List the files of a dataset (e.g. BCA-200uL-2).")
+    parser.add_argument("--lineage", default=None, help="Print what a file (path relative to data/) was made from and what was made from it.")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    catalog = DataCatalog(os.path.join(current_dir, DATA_DIRECTORY))
+
+    if args.scan:
+        start_time = time.perf_counter()
+        changed, removed = catalog.scan()
+        print(f"Catalog updated in {time.perf_counter() - start_time:.3f} s: {changed} files indexed, {removed} removed.")
+
+    if args.lineage:
+        for row in catalog.lineage(args.lineage):
+            print(f"{args.lineage} <- {row['path']} ({row['relation']})")
+        for row in catalog.lineage(args.lineage, children=True):
+            print(f"{args.lineage} -> {row['path']} ({row['relation']})")
+    elif args.kind or args.dataset or not args.scan:
+        rows = catalog.find(kind=args.kind, dataset=args.dataset)
+        for row in rows:
+            rows_text = f"{row['rows']:>6} rows" if row["rows"] is not None else " " * 11
+            print(f"{row['kind']:<20} {rows_text} {row['sha256'][:12]} {row['path']}")
+        print(f"\n{len(rows)} files in: {catalog.catalog_path}")
+    catalog.close()
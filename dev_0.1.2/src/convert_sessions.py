@@ -0,0 +1,71 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from datetime import datetime
+import pandas as pd
+from modules.model_registry import file_hash
+from modules.calibration_store import get_store
+from modules.session_store import write_session, read_session, read_session_metadata
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+SESSION_DIRECTORY = "sessions"
+
+
+# Define a function to time a function call (milliseconds)
+def time_call(function, *args, repeats=5, **kwargs):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        function(*args, **kwargs)
+    return (time.perf_counter() - start_time) / repeats * 1000
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Convert session .csv files to Parquet with the fixed session schema.")
+    parser.add_argument("inputs", nargs="+", help="Input .csv files or glob patterns (e.g. '../data/tests/*.csv').")
+    parser.add_argument("--output-dir", default=None, help="Output directory (default: data/sessions).")
+    parser.add_argument("--model-id", default=None, help="Model id that produced the predictions, stored in the metadata.")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    output_dir = args.output_dir or os.path.join(data_path, SESSION_DIRECTORY)
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+        print(f"Session directory is created at: {output_dir}")
+
+    # Provenance shared by every converted file
+    calibration = get_store(data_path).get()
+
+    input_files = []
+    for pattern in args.inputs:
+        input_files.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    for input_file in input_files:
+        dataframe = pd.read_csv(input_file)
+        metadata = {
+            "source": os.path.basename(input_file),
+            "source_sha256": file_hash(input_file),
+            "started": datetime.fromtimestamp(os.path.getmtime(input_file)).isoformat(timespec="seconds"),
+            "calibration": calibration,
+            "model_id": args.model_id,
+        }
+        output_file = os.path.join(output_dir, f"{os.path.splitext(os.path.basename(input_file))[0]}.parquet")
+        write_session(output_file, dataframe, metadata)
+
+        dropped = read_session_metadata(output_file)["dropped_columns"]
+        csv_ms = time_call(pd.read_csv, input_file)
+        parquet_ms = time_call(read_session, output_file, columns=["Red", "Green", "Blue", "Label"])
+        print(f"{os.path.basename(input_file)}: {len(dataframe)} rows, {os.path.getsize(input_file) / 1024:.1f} KiB -> "
+              f"{os.path.getsize(output_file) / 1024:.1f} KiB; read {csv_ms:.2f} ms (.csv) vs {parquet_ms:.2f} ms (4 columns)"
+              + (f"; dropped columns: {dropped}" if dropped else ""))
+
+    print(f"\nSessions saved at: {output_dir}")
@@ -0,0 +1,61 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from modules.base_length import BaseLengthCorrector
+from modules.calibration_store import get_store
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+BASE_LENGTH_FILE = "base_length.csv"
+OUTPUT_SUFFIX = "_corrected"
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Apply the base length (well row) correction to .csv datasets.")
+    parser.add_argument("inputs", nargs="+", help="Input .csv files or glob patterns (e.g. '../data/tests/BCA_unknown_sample_?.csv').")
+    parser.add_argument("--base-length", default=None, help="Base length readings (default: data/base_length.csv).")
+    parser.add_argument("--profile", default=None, help="Calibration profile for the RGB scaling (default: the most recent one).")
+    parser.add_argument("--output-dir", default=None, help="Output directory (default: next to each input file).")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Rows per chunk (default: 100000).")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+
+    # Build the factor table once for every input file
+    calibration = get_store(data_path).get(profile=args.profile)
+    if calibration is None:
+        print(f"No calibration data found at: {os.path.abspath(data_path)}")
+        sys.exit(1)
+    print(f"Calibration profile {calibration['profile']}, version {calibration['version']}")
+    corrector = BaseLengthCorrector.from_file(args.base_length or os.path.join(data_path, BASE_LENGTH_FILE),
+                                              calibration["global_min"], calibration["global_max"])
+    print(corrector.factor_df.to_string(index=False))
+    print()
+
+    input_files = []
+    for pattern in args.inputs:
+        input_files.extend(sorted(glob.glob(pattern)) or [pattern])
+
+    for input_file in input_files:
+        if os.path.splitext(input_file)[0].endswith(OUTPUT_SUFFIX):
+            print(f"Skipping corrected file: {input_file}")
+            continue
+        stem = os.path.splitext(os.path.basename(input_file))[0]
+        output_file = os.path.join(args.output_dir or os.path.dirname(input_file), f"{stem}{OUTPUT_SUFFIX}.csv")
+        start_time = time.perf_counter()
+        try:
+            num_rows = corrector.correct_file(input_file, output_file, chunksize=args.chunksize)
+        except ValueError as e:
+            print(f"Skipping {input_file}: {e}")
+            continue
+        seconds = time.perf_counter() - start_time
+        print(f"{num_rows} rows corrected in {seconds * 1000:.1f} ms, saved at: {os.path.abspath(output_file)}")
@@ -4,89 +4,49 @@ import time
 import traceback
 import RPi.GPIO as GPIO
 import numpy as np
-import pandas as pd
-import joblib
 from modules.I2CLCD import I2CLCD
-from modules.TCS3200 import TCS3200, convert_color
+from modules.TCS3200 import TCS3200
+from modules.calibration_store import load_calibration_data
+from modules.base_length import BaseLengthCorrector, get_well_rows, CORRECTED_PREFIX, FREQUENCY_COLUMNS, RGB_COLUMNS
+from modules.session_writer import SessionWriter, JOURNAL_SUFFIX, read_journal
+from modules.dataset_writer import write_atomic, append_rows, replay_journals, read_header
+from modules.data_catalog import DataCatalog
+from modules import color_space
+from modules.model_registry import ModelRegistry
 
 
 # Hyperparameters
 DATA_DIRECTORY = os.path.join("..", "data")
-CALIBRATION_FILE = "calibration.txt"
+SESSION_DIRECTORY = "sessions"
 PREDICTION_FILE = "prediction_albumin_Bradford-200uL-2.csv"
+BASE_LENGTH_FILE = "base_length.csv"
+BASE_LENGTH_CORRECTION = True # Correct each reading for the well row of its label (e.g. "1-D1") as it is measured
+PREDICTION_COLUMNS = ["Label_Name", "Red_Frequency", "Green_Frequency", "Blue_Frequency", "Clear_Frequency", "Red", "Green", "Blue", "Predicted_Label"]
+CORRECTION_COLUMNS = [f"{CORRECTED_PREFIX}{column}" for column in FREQUENCY_COLUMNS + RGB_COLUMNS] + ["Well_Row", "Normalization_Factor", "Corrected_Predicted_Label"]
 
 
-# Define a function to load sensor calibration data
-def load_calibration_data(calibration_data, data_dir):
+# Define a function to load pre-trained model from the model registry
+def load_model(model_id, data_dir):
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
     # Join it with the relative path of your data
     data_path = os.path.join(current_dir, data_dir)
 
-    # Define the calibration data path
-    calibration_data_path = os.path.join(data_path, calibration_data)
-    
-    # Check if the data file exists
-    if not os.path.exists(calibration_data_path):
-        print(f"No calibration data found at: {os.path.abspath(calibration_data_path)}")
-        return None, None
-
-    # Load the global_min and global_max data
-    try:
-        with open(calibration_data_path, 'r') as file:
-            lines = file.readlines()
-            global_min = [float(val) for val in lines[0].split(":")[1].strip()[1:-1].split(", ")]
-            global_max = [float(val) for val in lines[1].split(":")[1].strip()[1:-1].split(", ")]
-
-        print(f"Calibration data loaded from: {os.path.abspath(calibration_data_path)}")
-    except Exception as e:
-        print(f"Calibration data load error occurred: {e}")
-        return None, None
-
-    return global_min, global_max
-
-# Define a function to load pre-trained model
-def load_model(model_name, data_dir):
-    # Get the directory of the current script
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Join it with the relative path of your data
-    data_path = os.path.join(current_dir, data_dir)
-
-    # Define the model path
-    model_path = os.path.join(data_path, "models", model_name)
-    
-    # Check if the model exists
-    if not os.path.exists(model_path):
-        raise(f"No model found at: {os.path.abspath(model_path)}")
-
     # Load the model
-    try:
-        model = joblib.load(model_path)
-        print(f"Model loaded from: {os.path.abspath(model_path)}")
-    except Exception as e:
-        print("Model load error occurred: {e}")
+    registry = ModelRegistry(os.path.join(data_path, "models"))
+    model = registry.load(model_id)
+    print(f"Model {model_id} loaded from: {os.path.abspath(os.path.join(registry.models_dir, registry.get(model_id)['file']))}")
 
     return model
 
-# Define a function to select color conversion
+# Define a function to select color conversion (same conversions as the training notebooks)
 def convert_color_space(rgb, color_space_name='rgb'):
     r, g, b = [rgb['RED'], rgb['GREEN'], rgb['BLUE']]
-    converter = convert_color()  # Instantiate the convert_color class.
 
     try:
         # Convert color space
-        if color_space_name == 'rgb':
-            return r, g, b
-        elif color_space_name == 'cmyk':
-            return converter.rgb_to_cmyk(r, g, b)
-        elif color_space_name == 'hsl':
-            return converter.rgb_to_hsl(r, g, b)
-        elif color_space_name == 'hsv':
-            return converter.rgb_to_hsv(r, g, b)
-        elif color_space_name == 'lab':
-            return converter.rgb_to_lab(r, g, b)
+        return tuple(color_space.convert_color_space([r, g, b], color_space_name))
     
     except Exception as e:
         print(f"Conversion of color error occurred: {e}")
@@ -135,10 +95,14 @@ def measure_color(measurement_count=5, deviation=3):
     return avg_rgb, avg_rgb_freq, avg_clear_freq  # Return avg_clear_freq as well
 
 # Define a function to prompt for selection of model
-def select_model():
+def select_model(data_dir):
     model_names = ['Random Forest', 'Gradient Boosting', 'SVM', 'MLP']
     color_space_names = ['RGB', 'CMYK', 'HSL', 'HSV', 'LAB']
 
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    registry = ModelRegistry(os.path.join(current_dir, data_dir, "models"))
+
     print(f"\nSelect model:\t{model_names}")
     lcd.text("Select model.", line=1)
     user_input = input("Type name of the model:\t")
@@ -149,10 +113,25 @@ def select_model():
     user_input = input("Type name of the color space: \t")
     color_space_name = user_input.lower()
 
-    model_name = f'{model_name}_{color_space_name}.joblib'
-    return model_name, color_space_name
+    # Look up the model in the registry
+    try:
+        model_id = registry.find(model_name, color_space_name)
+    except KeyError as e:
+        print(f"{e}\nRegistered models: {registry.model_ids()}")
+        return select_model(data_dir)
+
+    return model_id, color_space_name
 
-# Define a function to save the prediction data
+# Define a function to register a written file in the data catalog (a catalog error does not lose the data)
+def register_file(path, data_path):
+    try:
+        catalog = DataCatalog(data_path)
+        catalog.add(path)
+        catalog.close()
+    except Exception as e:
+        print(f"Data catalog update error occurred: {e}")
+
+# Define a function to save the prediction data (returns True if the data was saved or deliberately discarded)
 def save_data(dataframe, filename, data_dir):
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -176,45 +155,91 @@ def save_data(dataframe, filename, data_dir):
 
         if option.lower() in ['a', 'append']:
             try:
-                dataframe.to_csv(prediction_data_path, mode='a', header=False, index=False)
+                append_rows(dataframe, prediction_data_path)
+                register_file(prediction_data_path, data_path)
                 print(f"Data appended at: {os.path.abspath(prediction_data_path)}")
             except Exception as e:
                 print(f"Data append error occurred: {e}")
-                return
+                return False
         elif option.lower() in ['n', 'new', 'new_file']:
             new_filename = input("Enter the new filename: ")
             new_data_path = os.path.join(data_path, new_filename)
             try:
-                dataframe.to_csv(new_data_path, index=False)
+                write_atomic(dataframe, new_data_path)
+                register_file(new_data_path, data_path)
                 print(f"Data saved at: {os.path.abspath(new_data_path)}")
             except Exception as e:
                 print(f"Data save error occurred: {e}")
-                return
+                return False
         elif option.lower() in ['o', 'overwrite']:
             try:
-                dataframe.to_csv(prediction_data_path, index=False)
+                write_atomic(dataframe, prediction_data_path)
+                register_file(prediction_data_path, data_path)
                 print(f"Data overwritten at: {os.path.abspath(prediction_data_path)}")
             except Exception as e:
                 print(f"Data overwrite error occurred: {e}")
-                return
+                return False
         elif option.lower() in ['d', 'delete']:
             print("Data not saved.")
-            return
+            return True
         else:
             print("Invalid option. Data not saved.")
             return save_data(dataframe, filename, data_dir)
     else:
         # Save the data in a new file if the file does not exist
         try:
-            dataframe.to_csv(prediction_data_path, index=False)
+            write_atomic(dataframe, prediction_data_path)
+            register_file(prediction_data_path, data_path)
             print(f"Data saved at: {os.path.abspath(prediction_data_path)}")
         except Exception as e:
             print(f"Data save error occurred: {e}")
-            return
-    return
+            return False
+    return True
+
+# Define a function to save sessions that died before their data was saved
+def recover_sessions(filename, data_dir):
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Join it with the relative path of your data
+    journal_dir = os.path.join(current_dir, data_dir, SESSION_DIRECTORY)
+
+    # Finish appends that were cut off first, so the sessions are appended to complete files
+    replay_journals(os.path.join(current_dir, data_dir))
+
+    for journal_path in SessionWriter.pending(journal_dir, filename):
+        dataframe = read_journal(journal_path)
+        print(f"Unsaved session with {len(dataframe)} rows found at: {os.path.abspath(journal_path)}")
+        if dataframe.empty or save_data(dataframe, filename, data_dir):
+            os.remove(journal_path)
+
+# Define a function to archive the session with its metadata (data/sessions/*.parquet)
+def archive_session(session):
+    metadata = {
+        "source": os.path.basename(__file__),
+        "calibration": {"global_min": global_min, "global_max": global_max},
+        "sensor": {"scaling": sensor.scaling, "led_power": sensor.led_power},
+    }
+    metadata["model_id"] = model_id
+    try:
+        archive_path = session.materialize(session.journal_path.replace(JOURNAL_SUFFIX, ".parquet"), metadata=metadata)
+        register_file(archive_path, os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY))
+        print(f"Session archived at: {os.path.abspath(archive_path)}")
+    except ImportError as e:
+        print(f"Session not archived: {e}")
+
+# Define a function to save the session and remove its journal
+def finish_session(session, filename, data_dir):
+    if session.num_rows:
+        archive_session(session)
+    if save_data(session.to_dataframe(), filename, data_dir):
+        session.discard()
+    else:
+        session.close()
+        print(f"Session kept at: {os.path.abspath(session.journal_path)}")
 
 def measurement_prompt(avg_rgb, avg_rgb_freq, avg_clear_freq, predicted_label):
-    global prediction_data
+    global session
 
     # Ask for label
     lcd.text(f"Pred: {predicted_label[0]:3.3f}", line=1)
@@ -232,24 +257,37 @@ def measurement_prompt(avg_rgb, avg_rgb_freq, avg_clear_freq, predicted_label):
         return measurement_prompt(avg_rgb, avg_rgb_freq, avg_clear_freq, prediction)
 
     elif user_input.lower() in ['n', 'no', 'none', 's', 'save']:
-        save_data(prediction_data, PREDICTION_FILE, DATA_DIRECTORY)
+        finish_session(session, PREDICTION_FILE, DATA_DIRECTORY)
         print("\n")
         return False
 
     elif user_input:  # If user presses enter
-        # Add the predicted_label to DataFrame
-        new_data = pd.DataFrame({
+        row = {
             "Label_Name": str(user_input),
-            "Red_Frequency": [avg_rgb_freq['RED']],
-            "Green_Frequency": [avg_rgb_freq['GREEN']],
-            "Blue_Frequency": [avg_rgb_freq['BLUE']],
-            "Clear_Frequency": [avg_clear_freq],  # Add clear frequency data
-            "Red": [avg_rgb['RED']],
-            "Green": [avg_rgb['GREEN']],
-            "Blue": [avg_rgb['BLUE']],
-            "Predicted_Label": [predicted_label[0]]
-        })
-        prediction_data = pd.concat([prediction_data, new_data])
+            "Red_Frequency": avg_rgb_freq['RED'],
+            "Green_Frequency": avg_rgb_freq['GREEN'],
+            "Blue_Frequency": avg_rgb_freq['BLUE'],
+            "Clear_Frequency": avg_clear_freq,  # Add clear frequency data
+            "Red": avg_rgb['RED'],
+            "Green": avg_rgb['GREEN'],
+            "Blue": avg_rgb['BLUE'],
+            "Predicted_Label": predicted_label[0]
+        }
+
+        # Correct the reading for its well row and predict again from the corrected RGB (the raw values are kept)
+        if corrector is not None:
+            corrected_row = corrector.correct_reading(row, get_well_rows([user_input])[0])
+            if corrected_row is None:
+                print(f"{user_input} is not a plate well with a base length factor. Reading saved without correction.")
+            else:
+                row = corrected_row
+                color = convert_color_space({"RED": row["Corrected_Red"], "GREEN": row["Corrected_Green"], "BLUE": row["Corrected_Blue"]},
+                                            color_space_name)
+                row["Corrected_Predicted_Label"] = model.predict(np.array(color).reshape(1, -1))[0]
+                print(f"Corrected prediction (well row {row['Well_Row']}): {row['Corrected_Predicted_Label']:.3f}")
+
+        # Append the predicted_label to the session journal
+        session.append(row)
         return True
     else:
 
@@ -262,6 +300,8 @@ if __name__ == "__main__":
     print(f"{sys.argv[0]} is running.")
     print("="*50+"\n")
 
+    session = None
+
     try:
         # Initialize
         lcd = I2CLCD(i2c_address=0x27, display_size=(16, 2))
@@ -276,15 +316,33 @@ if __name__ == "__main__":
         print("Sensor is ready.")
         time.sleep(1)
 
-        global_min, global_max = load_calibration_data(CALIBRATION_FILE, DATA_DIRECTORY)
+        global_min, global_max = load_calibration_data(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY), sensor)
         print("Calibration data is ready.")
         time.sleep(1)
 
-        model_name, color_space_name = select_model()
-        model = load_model(model_name, DATA_DIRECTORY)
-
-        # Initialize parameters
-        prediction_data = pd.DataFrame(columns=["Label_Name", "Red_Frequency", "Green_Frequency", "Blue_Frequency", "Clear_Frequency", "Red", "Green", "Blue", "Predicted_Label"])
+        # Base length correction, if the prediction file can hold the corrected columns (files saved without them stay appendable)
+        corrector = None
+        columns = PREDICTION_COLUMNS
+        base_length_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY, BASE_LENGTH_FILE)
+        prediction_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY, PREDICTION_FILE)
+        if BASE_LENGTH_CORRECTION and global_min is not None and os.path.exists(base_length_path):
+            header = read_header(prediction_data_path) if os.path.exists(prediction_data_path) else CORRECTION_COLUMNS
+            missing_columns = [column for column in CORRECTION_COLUMNS if column not in header]
+            if missing_columns:
+                print(f"Base length correction is off: {PREDICTION_FILE} has no {missing_columns} columns. "
+                      "Set PREDICTION_FILE to a new file to record corrected readings.")
+            else:
+                corrector = BaseLengthCorrector.from_file(base_length_path, global_min, global_max)
+                columns = PREDICTION_COLUMNS + CORRECTION_COLUMNS
+                print(f"Base length correction is on (well rows: {', '.join(corrector.factors.index)}).")
+
+        model_id, color_space_name = select_model(DATA_DIRECTORY)
+        model = load_model(model_id, DATA_DIRECTORY)
+
+        # Save sessions that were interrupted, then start journaling this one
+        recover_sessions(PREDICTION_FILE, DATA_DIRECTORY)
+        session = SessionWriter.create(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY, SESSION_DIRECTORY),
+                                       PREDICTION_FILE, columns)
         index = 0
         loop = True # main loop
 
@@ -305,7 +363,8 @@ if __name__ == "__main__":
 
     except KeyboardInterrupt:
         # Handle the Ctrl-C exception to gracefully exit the script
-        save_data(prediction_data, PREDICTION_FILE, DATA_DIRECTORY) # checkpointing
+        if session is not None:
+            finish_session(session, PREDICTION_FILE, DATA_DIRECTORY) # every row is already in the session journal
         print("\nKeyboard interrupted.")
         print("Program terminated by user.\n")
 
@@ -4,48 +4,30 @@ import time
 import traceback
 import RPi.GPIO as GPIO
 import numpy as np
-import pandas as pd
 from modules.I2CLCD import I2CLCD
 from modules.TCS3200 import TCS3200
+from modules.calibration_store import load_calibration_data
+from modules.session_writer import SessionWriter, JOURNAL_SUFFIX, read_journal
+from modules.dataset_writer import write_atomic, append_rows, replay_journals
+from modules.data_catalog import DataCatalog
 
 
 # Hyperparameters
 DATA_DIRECTORY = os.path.join("..", "data")
-CALIBRATION_FILE = "calibration.txt"
+SESSION_DIRECTORY = "sessions"
 REFERENCE_FILE = "reference_BCA-200uL-2.csv"
 
 
-# Define a function to load sensor calibration data
-def load_calibration_data(calibration_data, data_dir):
-    # Get the directory of the current script
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Join it with the relative path of your data
-    data_path = os.path.join(current_dir, data_dir)
-
-    # Define the calibration data path
-    calibration_data_path = os.path.join(data_path, calibration_data)
-    
-    # Check if the data file exists
-    if not os.path.exists(calibration_data_path):
-        print(f"No calibration data found at: {os.path.abspath(calibration_data_path)}")
-        return None, None
-
-    # Load the global_min and global_max data
+# Define a function to register a written file in the data catalog (a catalog error does not lose the data)
+def register_file(path, data_path):
     try:
-        with open(calibration_data_path, 'r') as file:
-            lines = file.readlines()
-            global_min = [float(val) for val in lines[0].split(":")[1].strip()[1:-1].split(", ")]
-            global_max = [float(val) for val in lines[1].split(":")[1].strip()[1:-1].split(", ")]
-
-        print(f"Calibration data loaded from: {os.path.abspath(calibration_data_path)}")
+        catalog = DataCatalog(data_path)
+        catalog.add(path)
+        catalog.close()
     except Exception as e:
-        print(f"Calibration data load error occurred: {e}")
-        return None, None
+        print(f"Data catalog update error occurred: {e}")
 
-    return global_min, global_max
-
-# Define a function to save the reference data
+# Define a function to save the reference data (returns True if the data was saved or deliberately discarded)
 def save_data(dataframe, filename, data_dir):
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -69,42 +51,87 @@ def save_data(dataframe, filename, data_dir):
 
         if option.lower() in ['a', 'append']:
             try:
-                dataframe.to_csv(reference_data_path, mode='a', header=False, index=False)
+                append_rows(dataframe, reference_data_path)
+                register_file(reference_data_path, data_path)
                 print(f"Data appended at: {os.path.abspath(reference_data_path)}")
             except Exception as e:
                 print(f"Data append error occurred: {e}")
-                return
+                return False
         elif option.lower() in ['n', 'new', 'new_file']:
             new_filename = input("Enter the new filename: ")
             new_data_path = os.path.join(data_path, new_filename)
             try:
-                dataframe.to_csv(new_data_path, index=False)
+                write_atomic(dataframe, new_data_path)
+                register_file(new_data_path, data_path)
                 print(f"Data saved at: {os.path.abspath(new_data_path)}")
             except Exception as e:
                 print(f"Data save error occurred: {e}")
-                return
+                return False
         elif option.lower() in ['o', 'overwrite']:
             try:
-                dataframe.to_csv(reference_data_path, index=False)
+                write_atomic(dataframe, reference_data_path)
+                register_file(reference_data_path, data_path)
                 print(f"Data overwritten at: {os.path.abspath(reference_data_path)}")
             except Exception as e:
                 print(f"Data overwrite error occurred: {e}")
-                return
+                return False
         elif option.lower() in ['d', 'delete']:
             print("Data not saved.")
-            return
+            return True
         else:
             print("Invalid option. Data not saved.")
             return save_data(dataframe, filename, data_dir)
     else:
         # Save the data in a new file if the file does not exist
         try:
-            dataframe.to_csv(reference_data_path, index=False)
+            write_atomic(dataframe, reference_data_path)
+            register_file(reference_data_path, data_path)
             print(f"Data saved at: {os.path.abspath(reference_data_path)}")
         except Exception as e:
             print(f"Data save error occurred: {e}")
-            return
-    return
+            return False
+    return True
+
+# Define a function to save sessions that died before their data was saved
+def recover_sessions(filename, data_dir):
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # Join it with the relative path of your data
+    journal_dir = os.path.join(current_dir, data_dir, SESSION_DIRECTORY)
+
+    # Finish appends that were cut off first, so the sessions are appended to complete files
+    replay_journals(os.path.join(current_dir, data_dir))
+
+    for journal_path in SessionWriter.pending(journal_dir, filename):
+        dataframe = read_journal(journal_path)
+        print(f"Unsaved session with {len(dataframe)} rows found at: {os.path.abspath(journal_path)}")
+        if dataframe.empty or save_data(dataframe, filename, data_dir):
+            os.remove(journal_path)
+
+# Define a function to archive the session with its metadata (data/sessions/*.parquet)
+def archive_session(session):
+    metadata = {
+        "source": os.path.basename(__file__),
+        "calibration": {"global_min": global_min, "global_max": global_max},
+        "sensor": {"scaling": sensor.scaling, "led_power": sensor.led_power},
+    }
+    try:
+        archive_path = session.materialize(session.journal_path.replace(JOURNAL_SUFFIX, ".parquet"), metadata=metadata)
+        register_file(archive_path, os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY))
+        print(f"Session archived at: {os.path.abspath(archive_path)}")
+    except ImportError as e:
+        print(f"Session not archived: {e}")
+
+# Define a function to save the session and remove its journal
+def finish_session(session, filename, data_dir):
+    if session.num_rows:
+        archive_session(session)
+    if save_data(session.to_dataframe(), filename, data_dir):
+        session.discard()
+    else:
+        session.close()
+        print(f"Session kept at: {os.path.abspath(session.journal_path)}")
 
 
 def measure_color(measurement_count=5, deviation=3):
@@ -150,7 +177,7 @@ def measure_color(measurement_count=5, deviation=3):
 
 
 def label_prompt(avg_rgb, avg_rgb_freq, avg_clear_freq):
-    global reference_data
+    global session
     global previous_label
 
     # Ask for label
@@ -169,27 +196,25 @@ def label_prompt(avg_rgb, avg_rgb_freq, avg_clear_freq):
     try:
         label = float(label)  # convert the input to a float
 
-        # Add to DataFrame
-        new_data = pd.DataFrame({
-            "Red_Frequency": [avg_rgb_freq['RED']],
-            "Green_Frequency": [avg_rgb_freq['GREEN']],
-            "Blue_Frequency": [avg_rgb_freq['BLUE']],
-            "Clear_Frequency": [avg_clear_freq],  # Add clear frequency data
-            "Red": [avg_rgb['RED']],
-            "Green": [avg_rgb['GREEN']],
-            "Blue": [avg_rgb['BLUE']],
-            "Label": [label]
+        # Append to the session journal
+        session.append({
+            "Red_Frequency": avg_rgb_freq['RED'],
+            "Green_Frequency": avg_rgb_freq['GREEN'],
+            "Blue_Frequency": avg_rgb_freq['BLUE'],
+            "Clear_Frequency": avg_clear_freq,  # Add clear frequency data
+            "Red": avg_rgb['RED'],
+            "Green": avg_rgb['GREEN'],
+            "Blue": avg_rgb['BLUE'],
+            "Label": label
         })
 
-        reference_data = pd.concat([reference_data, new_data])
-
         # Update the previous label with the current one
         previous_label = label
         return True
 
     except ValueError:  # if the conversion fails, the input was not a number
         if label.lower() in ['n', 'no', 'none', 's', 'save']:
-            save_data(reference_data, REFERENCE_FILE, DATA_DIRECTORY)
+            finish_session(session, REFERENCE_FILE, DATA_DIRECTORY)
             print("\n")
             return False
         elif label.lower() in ['r', 're', 'redo']:
@@ -205,6 +230,8 @@ if __name__ == "__main__":
     print(f"{sys.argv[0]} is running.")
     print("="*50+"\n")
 
+    session = None
+
     try:
         # Initialize
         lcd = I2CLCD(i2c_address=0x27, display_size=(16, 2))
@@ -219,12 +246,14 @@ if __name__ == "__main__":
         print("Sensor is ready.")
         time.sleep(1)
 
-        global_min, global_max = load_calibration_data(CALIBRATION_FILE, DATA_DIRECTORY)
+        global_min, global_max = load_calibration_data(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY), sensor)
         print("Calibration data is ready.")
         time.sleep(1)
 
-        # Initialize parameters
-        reference_data = pd.DataFrame(columns=["Red_Frequency", "Green_Frequency", "Blue_Frequency", "Clear_Frequency", "Red", "Green", "Blue", "Label"])
+        # Save sessions that were interrupted, then start journaling this one
+        recover_sessions(REFERENCE_FILE, DATA_DIRECTORY)
+        session = SessionWriter.create(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY, SESSION_DIRECTORY),
+                                       REFERENCE_FILE, ["Red_Frequency", "Green_Frequency", "Blue_Frequency", "Clear_Frequency", "Red", "Green", "Blue", "Label"])
         previous_label = None
         index = 0
         loop = True # main loop
@@ -244,7 +273,8 @@ if __name__ == "__main__":
 
     except KeyboardInterrupt:
         # Handle the Ctrl-C exception to gracefully exit the script
-        save_data(reference_data, REFERENCE_FILE, DATA_DIRECTORY) # checkpointing
+        if session is not None:
+            finish_session(session, REFERENCE_FILE, DATA_DIRECTORY) # every row is already in the session journal
         print("\nKeyboard interrupted.")
         print("Program terminated by user.\n")
 
@@ -0,0 +1,150 @@
+import os
+import sys
+import glob
+import argparse
+import numpy as np
+import joblib
+from modules.color_space import convert_color_space
+from modules.compiled_model import load_compiled_model
+from modules.tree_ensemble import export_tree_ensemble
+from modules.numpy_mlp import export_mlp
+from modules.svr_compression import export_svr, compress_svr_to_tolerance, svr_compression_report
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+EXPORT_DIRECTORY = "compiled"
+TRAINING_DIRECTORY = "training"
+NUM_RANDOM_SAMPLES = 1000
+RANDOM_STATE = 2
+EXPORT_TOLERANCE = 1e-9
+
+# Exporters of each model type
+EXPORTERS = {
+    "RandomForestRegressor": export_tree_ensemble,
+    "ExtraTreesRegressor": export_tree_ensemble,
+    "GradientBoostingRegressor": export_tree_ensemble,
+    "MLPRegressor": export_mlp,
+    "Pipeline": export_mlp,
+    "SVR": export_svr,
+}
+
+
+# Define a function to get the color space name from a model file name (e.g. "random_forest_hsl.joblib")
+def get_color_space_name(model_file):
+    return os.path.splitext(os.path.basename(model_file))[0].split("_")[-1]
+
+# Define a function to build verification inputs: every training color plus random colors
+def load_verification_rgb(data_path, num_random_samples=NUM_RANDOM_SAMPLES, random_state=RANDOM_STATE):
+    rgb = []
+    for reference_file in sorted(glob.glob(os.path.join(data_path, TRAINING_DIRECTORY, "*.csv"))):
+        data = np.genfromtxt(reference_file, delimiter=",", names=True, dtype=None, encoding=None)
+        rgb.append(np.column_stack([data["Red"], data["Green"], data["Blue"]]).astype(np.float64))
+    rng = np.random.default_rng(random_state)
+    rgb.append(rng.uniform(0, 255, size=(num_random_samples, 3)))
+    return np.vstack(rgb)
+
+# Define a function to print the accuracy versus speed trade-off of SVR compression
+def print_svr_report(model_file, fit_rgb, check_rgb):
+    model = joblib.load(model_file)
+    color_space_name = get_color_space_name(model_file)
+    X_fit = convert_color_space(fit_rgb, color_space_name)
+    X_check = convert_color_space(check_rgb, color_space_name)
+
+    print(f"\n{os.path.basename(model_file)}: SVR compression trade-off")
+    print(f"{'Centers':>8} {'Runtime':>8} {'MAE':>10} {'Max_Error':>10} {'Single_Row_us':>14} {'Batch_Rows_per_s':>17}")
+    for row in svr_compression_report(model, X_fit, X_check):
+        print(f"{row['Centers']:>8} {row['Runtime']:>8} {row['MAE']:>10.4f} {row['Max_Error']:>10.4f} "
+              f"{row['Single_Row_us']:>14.1f} {row['Batch_Rows_per_s']:>17.0f}")
+
+# Define a function to export one model and verify it against the original
+def export_model(model_file, export_path, fit_rgb, check_rgb, svr_tolerance=None):
+    model = joblib.load(model_file)
+    model_type = type(model).__name__
+    if model_type not in EXPORTERS:
+        raise ValueError(f"Model type {model_type} cannot be exported.")
+    X = convert_color_space(check_rgb, get_color_space_name(model_file))
+
+    # SVRs are optionally compressed to the fewest kernel centers within the tolerance
+    tolerance = EXPORT_TOLERANCE
+    if model_type == "SVR" and svr_tolerance is not None:
+        X_fit = convert_color_space(fit_rgb, get_color_space_name(model_file))
+        arrays, _ = compress_svr_to_tolerance(model, X_fit, X, svr_tolerance)
+        tolerance = max(svr_tolerance, EXPORT_TOLERANCE)
+    else:
+        arrays = EXPORTERS[model_type](model)
+    np.savez(export_path, **arrays)
+
+    # Verify predictions of the exported model
+    expected = model.predict(X)
+    exported = load_compiled_model(export_path).predict(X)
+    identical = np.array_equal(expected.view(np.uint64), exported.view(np.uint64))
+    max_error = np.max(np.abs(expected - exported))
+    max_relative_error = np.max(np.abs(expected - exported) / np.maximum(np.abs(expected), 1.0))
+
+    # Tree ensembles must match bit for bit, other models within the tolerance
+    if str(arrays["format"]) == "tree_ensemble":
+        passed = identical
+    elif tolerance > EXPORT_TOLERANCE:
+        passed = max_error <= tolerance
+    else:
+        passed = max_relative_error <= tolerance
+
+    joblib_size = os.path.getsize(model_file) / 1024
+    export_size = os.path.getsize(export_path) / 1024
+    details = f" ({arrays['centers'].shape[0]}/{arrays['n_support']} centers)" if str(arrays["format"]) == "svr" else ""
+    print(f"{os.path.basename(model_file)}: {model_type} -> {arrays['format']}{details}, "
+          f"{joblib_size:.0f} KiB -> {export_size:.0f} KiB, "
+          f"{'bitwise identical' if identical else f'max error {max_error:.3e}'}")
+    return passed
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Export trained models to NumPy arrays for fast inference.")
+    parser.add_argument("models", nargs="*", help="Model files to export (default: every model in data/models).")
+    parser.add_argument("--output", default=None, help="Output directory (default: data/models/compiled).")
+    parser.add_argument("--svr-tolerance", type=float, default=None,
+                        help="Compress SVRs to the fewest kernel centers whose maximum error stays within this bound.")
+    parser.add_argument("--svr-report", action="store_true",
+                        help="Print the accuracy versus speed trade-off of SVR compression.")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    models_path = os.path.join(data_path, MODELS_DIRECTORY)
+    export_dir = args.output or os.path.join(models_path, EXPORT_DIRECTORY)
+    if not os.path.exists(export_dir):
+        os.makedirs(export_dir)
+        print(f"Export directory is created at: {export_dir}")
+
+    model_files = args.models or sorted(glob.glob(os.path.join(models_path, "*.joblib")))
+    fit_rgb = load_verification_rgb(data_path, random_state=RANDOM_STATE)
+    check_rgb = load_verification_rgb(data_path, random_state=RANDOM_STATE + 1)
+
+    failures = []
+    for model_file in model_files:
+        model_name = os.path.splitext(os.path.basename(model_file))[0]
+        export_path = os.path.join(export_dir, f"{model_name}.npz")
+        try:
+            if not export_model(model_file, export_path, fit_rgb, check_rgb, args.svr_tolerance):
+                # Do not leave exports that differ from the original behind
+                os.remove(export_path)
+                failures.append(model_name)
+            if args.svr_report and model_name.startswith("svm"):
+                print_svr_report(model_file, fit_rgb, check_rgb)
+        except ValueError as e:
+            # Do not leave unverified exports behind
+            if os.path.exists(export_path):
+                os.remove(export_path)
+            print(f"{os.path.basename(model_file)}: skipped ({e})")
+
+    if failures:
+        print(f"\nExports differing from the originals (removed): {failures}")
+        sys.exit(1)
+    print("\nExport done.")
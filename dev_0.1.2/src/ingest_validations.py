@@ -0,0 +1,110 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from modules.model_registry import file_hash
+from modules.validation_ingest import (ValidationCache, parse_validation_file, prepare_predictions,
+                                       merge_validations, get_validation_metrics)
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+VALIDATIONS_DIRECTORY = "validations"
+PREDICTIONS_DIRECTORY = "predictions"
+METRICS_DIRECTORY = "metrics"
+VALIDATION_CACHE_DIRECTORY = os.path.join("cache", "validations")
+
+
+# Define a function to parse the validation files, in parallel worker processes for the files that are not cached
+def load_validations(validation_files, cache, workers=None):
+    hashes = {validation_file: file_hash(validation_file) for validation_file in validation_files}
+    parsed = {}
+    if cache is not None:
+        for validation_file, sha256 in hashes.items():
+            dataframe = cache.get(sha256)
+            if dataframe is not None:
+                parsed[validation_file] = dataframe
+    pending_files = [validation_file for validation_file in validation_files if validation_file not in parsed]
+    print(f"Validation files: {len(validation_files)} ({len(parsed)} cached, {len(pending_files)} to parse)")
+
+    if pending_files:
+        with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(pending_files))) as executor:
+            futures = {executor.submit(parse_validation_file, validation_file): validation_file for validation_file in pending_files}
+            for future in as_completed(futures):
+                validation_file = futures[future]
+                try:
+                    parsed[validation_file] = future.result()
+                except Exception as e:
+                    print(f"Validation file parse error occurred ({os.path.basename(validation_file)}): {e}")
+                    continue
+                if cache is not None:
+                    cache.put(hashes[validation_file], parsed[validation_file])
+
+    dataframes = [parsed[validation_file] for validation_file in validation_files if validation_file in parsed]
+    return pd.concat(dataframes, ignore_index=True) if dataframes else None
+
+# Define a function to read prediction files (.csv or .parquet)
+def load_predictions(prediction_files):
+    dataframes = []
+    for prediction_file in prediction_files:
+        dataframe = pd.read_parquet(prediction_file) if prediction_file.endswith(".parquet") else pd.read_csv(prediction_file)
+        dataframes.append(prepare_predictions(dataframe, source=prediction_file).assign(Prediction_File=os.path.basename(prediction_file)))
+    return pd.concat(dataframes, ignore_index=True)
+
+# Define a function to expand file arguments (paths or glob patterns)
+def expand_files(patterns):
+    files = []
+    for pattern in patterns:
+        files.extend(sorted(glob.glob(pattern)) or [pattern])
+    return files
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+
+    parser = argparse.ArgumentParser(description="Parse plate reader validation spreadsheets and join them with predictions.")
+    parser.add_argument("--validations", nargs="+", default=[os.path.join(data_path, VALIDATIONS_DIRECTORY, "*.xls*")],
+                        help="Validation files or glob patterns (default: data/validations/*.xls*).")
+    parser.add_argument("--predictions", nargs="+", default=None,
+                        help="Prediction files or glob patterns with Label and Predicted_* columns (e.g. '../data/predictions/*_predicted.csv').")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: number of CPUs).")
+    parser.add_argument("--no-cache", action="store_true", help="Parse every file again instead of using data/cache/validations.")
+    parser.add_argument("--output", default=None, help="Merged output file (default: data/predictions/validation_merged.csv).")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    cache = None if args.no_cache else ValidationCache(os.path.join(data_path, VALIDATION_CACHE_DIRECTORY))
+    validations_df = load_validations(expand_files(args.validations), cache, args.workers)
+    if validations_df is None:
+        print("No validation data found.")
+        sys.exit(1)
+    print(f"{len(validations_df)} wells from {validations_df['Source'].nunique()} files "
+          f"(plates: {', '.join(sorted(validations_df['Plate'].dropna().unique()))}) in {time.perf_counter() - start_time:.2f} s")
+
+    if args.predictions:
+        predictions_df = load_predictions(expand_files(args.predictions))
+        merged_df = merge_validations(predictions_df, validations_df)
+        print(f"{len(merged_df)} of {len(predictions_df)} predictions matched a validation well.")
+
+        output_file = args.output or os.path.join(data_path, PREDICTIONS_DIRECTORY, "validation_merged.csv")
+        os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+        merged_df.to_csv(output_file, index=False)
+        print(f"Merged data saved at: {os.path.abspath(output_file)}")
+
+        metrics_df = get_validation_metrics(merged_df)
+        if not metrics_df.empty:
+            print(metrics_df.to_string(index=False))
+            metrics_file = os.path.join(data_path, METRICS_DIRECTORY, "metrics_validation.csv")
+            metrics_df.to_csv(metrics_file, index=False)
+            print(f"Metrics saved at: {os.path.abspath(metrics_file)}")
+
+    print(f"\nDone in {time.perf_counter() - start_time:.2f} s.")
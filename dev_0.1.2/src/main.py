@@ -3,73 +3,45 @@ import sys
 import time
 import traceback
 import RPi.GPIO as GPIO
-import numpy as np
-from sklearn import ensemble, svm, neural_network
-import joblib
 from modules.I2CLCD import I2CLCD
-from modules.TCS3200 import TCS3200
+from modules.startup import PhaseTimer, BackgroundTask
+from modules.calibration_store import load_calibration_data
+from modules.hot_reload import HotReloader
 
 
 # Hyperparameters
 DATA_DIRECTORY = os.path.join("..", "data")
-MODEL_FILE = "random_forest_hsl.joblib"
-CALIBRATION_FILE = "calibration.txt"
+MODEL_ID = "gradient_boosting_hsl"
+ENSEMBLE_MODEL_IDS = [] # Extra models evaluated together with MODEL_ID for a confidence figure (e.g. ["svm_hsl", "mlp_hsl"])
+PREDICTION_CACHE_SIZE = 256 # Cached readings in monitoring mode (0 disables the cache)
+SENSOR_RESOLUTION = 1.0 # Readings closer than this (RGB units) share a cached prediction
+READING_LOG_FILE = os.path.join("monitoring", "readings.ringlog") # Ring buffer of readings, tail it with tail_readings.py
+READING_LOG_CAPACITY = 100_000 # Readings kept in the log (72 bytes each)
 
 
-# Define a function to load pre-trained model
-def load_model(model_name, data_dir):
+# Define a function to load pre-trained models from the model registry (heavy libraries are imported here, not at startup)
+def load_model(model_ids, data_dir):
     # Get the directory of the current script
     current_dir = os.path.dirname(os.path.abspath(__file__))
 
     # Join it with the relative path of your data
     data_path = os.path.join(current_dir, data_dir)
 
-    # Define the model path
-    model_path = os.path.join(data_path, "models", model_name)
-    
-    # Check if the model exists
-    if not os.path.exists(model_path):
-        print(f"No model found at: {os.path.abspath(model_path)}")
-        return None
-
-    # Load the model
+    # Load the models and the feature pipelines they expect
     try:
-        model = joblib.load(model_path)
-        print(f"Model loaded from: {os.path.abspath(model_path)}")
+        from modules.model_registry import ModelRegistry
+        from modules.ensemble import EnsemblePredictor
+        from modules.prediction_cache import PredictionCache
+        registry = ModelRegistry(os.path.join(data_path, "models"), cache_size=max(4, len(model_ids)))
+        cache = PredictionCache(PREDICTION_CACHE_SIZE) if PREDICTION_CACHE_SIZE > 0 else None
+        ensemble = EnsemblePredictor(registry, model_ids, cache=cache, rgb_resolution=SENSOR_RESOLUTION)
+        for model_id in model_ids:
+            print(f"Model {model_id} loaded from: {os.path.abspath(os.path.join(registry.models_dir, registry.get(model_id)['file']))}")
     except Exception as e:
-        print("Model load error occurred: {e}")
-
-    return model
-
-# Define a function to load sensor calibration data
-def load_calibration_data(calibration_data, data_dir):
-    # Get the directory of the current script
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Join it with the relative path of your data
-    data_path = os.path.join(current_dir, data_dir)
-
-    # Define the calibration data path
-    calibration_data_path = os.path.join(data_path, calibration_data)
-    
-    # Check if the data file exists
-    if not os.path.exists(calibration_data_path):
-        print(f"No calibration data found at: {os.path.abspath(calibration_data_path)}")
-        return None, None
-
-    # Load the global_min and global_max data
-    try:
-        with open(calibration_data_path, 'r') as file:
-            lines = file.readlines()
-            global_min = [float(val) for val in lines[0].split(":")[1].strip()[1:-1].split(", ")]
-            global_max = [float(val) for val in lines[1].split(":")[1].strip()[1:-1].split(", ")]
-
-        print(f"Calibration data loaded from: {os.path.abspath(calibration_data_path)}")
-    except Exception as e:
-        print(f"Calibration data load error occurred: {e}")
-        return None, None
+        print(f"Model load error occurred: {e}")
+        return None
 
-    return global_min, global_max
+    return ensemble
 
 
 if __name__ == "__main__":
@@ -77,54 +49,98 @@ if __name__ == "__main__":
     print(f"{sys.argv[0]} is running.")
     print("="*50+"\n")
 
-    try:
-        # Initialize
-        lcd = I2CLCD(i2c_address=0x27, display_size=(16, 2))
-        lcd.backlight(True)
-        lcd.clear()
-        lcd.text("Initializing...", line=1)
-        print("LCD screen is ready.")
-        time.sleep(1)
+    lcd = None
+    sensor = None
+    ensemble = None
+    reading_log = None
+    reloader = None
+    timer = PhaseTimer()
 
-        sensor = TCS3200(S0=5, S1=6, S2=23, S3=24, OUT=25, LED=18, scaling=0.20, led_power=False)
-        sensor.read_color_freq() # Booting sensor with a read
-        print("Sensor is ready.")
-        time.sleep(1)
-
-        model = load_model(MODEL_FILE, DATA_DIRECTORY)
-        print("Model is ready.")
-        time.sleep(1)
+    try:
+        # Load the model in the background while the LCD and sensor initialize
+        model_task = BackgroundTask(load_model, [MODEL_ID] + ENSEMBLE_MODEL_IDS, DATA_DIRECTORY)
 
-        global_min, global_max = load_calibration_data(CALIBRATION_FILE, DATA_DIRECTORY)
-        print("Calibration data is ready.")
-        time.sleep(1)
+        # Initialize
+        with timer.phase("LCD"):
+            lcd = I2CLCD(i2c_address=0x27, display_size=(16, 2))
+            lcd.backlight(True)
+            lcd.clear()
+            lcd.text("Initializing...", line=1)
+            print("LCD screen is ready.")
+
+        with timer.phase("Sensor"):
+            from modules.TCS3200 import TCS3200
+            sensor = TCS3200(S0=5, S1=6, S2=23, S3=24, OUT=25, LED=18, scaling=0.20, led_power=False)
+            sensor.read_color_freq() # Booting sensor with a read
+            print("Sensor is ready.")
+
+        with timer.phase("Calibration data"):
+            global_min, global_max = load_calibration_data(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY), sensor)
+            print("Calibration data is ready.")
+
+        with timer.phase("Reading log"):
+            from modules.reading_log import ReadingLog
+            reading_log = ReadingLog.open_writer(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY, READING_LOG_FILE),
+                                                 capacity=READING_LOG_CAPACITY)
+            print(f"Reading log is ready ({reading_log.write_seq} readings logged): {os.path.abspath(reading_log.path)}")
+
+        with timer.phase("Model (waiting)"):
+            ensemble = model_task.result()
+            if ensemble is None:
+                raise Exception(f"Model {MODEL_ID} could not be loaded.")
+            print(f"Model is ready. Features: {', '.join(color_space.upper() for color_space in dict.fromkeys(ensemble.color_spaces.values()))}")
+        timer.add("Model (background load)", model_task.seconds)
+
+        # Calibration and model changes on disk are picked up between readings from here on
+        reloader = HotReloader(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY), sensor, ensemble,
+                               lambda model_ids: load_model(model_ids, DATA_DIRECTORY))
+        ensemble = None # Owned by the reloader
 
         print("Initialization done.")
-        print("\n")
         lcd.text("Done.", line=1)
-        lcd.text("Device is ready.", line=2)
-        time.sleep(1)
-        lcd.clear()
+        lcd.text(reloader.versions(), line=2)
+        timer.report()
+        print("\n")
+        first_reading = True
 
         while True:
+            # Swap in a new calibration or new models, then use the same pair for the whole reading
+            if reloader.check():
+                lcd.text("Reloaded.", line=1)
+                lcd.text(reloader.versions(), line=2)
+            calibration, ensemble = reloader.current()
+            global_min, global_max = (calibration["global_min"], calibration["global_max"]) if calibration else (None, None)
+
             # Read color
             print("Reading color...")
             lcd.text("Reading color...", line=1)
             rgb = sensor.read_color(global_min, global_max)
             print(f"RGB({rgb['RED']:3.3f}, {rgb['GREEN']:3.3f}, {rgb['BLUE']:3.3f})")
 
-            # Convert RGB to HSL
-            hsl = sensor.rgb_to_hsl(rgb['RED'], rgb['GREEN'], rgb['BLUE'])
-            print(f"HSL({hsl[0]*360:3.3f}, {hsl[1]*100:3.3f}, {hsl[2]*100:3.3f})")
-
-            # Predict the value
-            predicted_value = model.predict(np.array(hsl).reshape(1, -1))
-            print(f"Value: {predicted_value}")
+            # Convert RGB to the color spaces of the models and predict the value
+            result = ensemble.predict([[rgb['RED'], rgb['GREEN'], rgb['BLUE']]],
+                                      calibration=(calibration["profile"], calibration["version"]) if calibration else None)
+            for color_space, features in result["features"].items():
+                print(f"{color_space.upper()}({', '.join(f'{value:3.3f}' for value in features[0])})")
+            predicted_value = result["mean"]
+            spread = ensemble.spread(result)
+            for model_id, values in result["values"].items():
+                print(f"\t{model_id}: {values[0]:.3f}")
+            print(f"Value: {predicted_value}" + (f" +/- {spread[0]:.3f}" if spread is not None else "")
+                  + (" (cached)" if result["cached"] else ""))
+            reading_log.append((rgb['RED'], rgb['GREEN'], rgb['BLUE']), predicted_value[0],
+                               spread=spread[0] if spread is not None else None, cached=result["cached"])
+            if first_reading:
+                print(f"Time to first reading: {timer.elapsed():.3f} s")
+                first_reading = False
             print("\n")
 
             # Display
             lcd.text(f"RGB({int(rgb['RED']):3d},{int(rgb['GREEN']):3d},{int(rgb['BLUE']):3d})", line=1)
-            lcd.text(f"Value: {predicted_value[0]:.3f}", line=2)
+            if spread is not None:
+                lcd.text(f"{predicted_value[0]:.2f} +/-{spread[0]:.2f}", line=2)
+            else:
+                lcd.text(f"Value: {predicted_value[0]:.3f}", line=2)
             time.sleep(3) # refresh rate
 
     except KeyboardInterrupt:
@@ -140,10 +156,21 @@ if __name__ == "__main__":
         print("\n")
 
     finally:
-        lcd.clear()
-        lcd.backlight(True)
-        lcd.clear()  # Clear the display before stopping
-        sensor.led_off()
+        if lcd is not None:
+            lcd.clear()
+            lcd.backlight(True)
+            lcd.clear()  # Clear the display before stopping
+        if sensor is not None:
+            sensor.led_off()
+        if reloader is not None:
+            ensemble = reloader.current()[1]
+            if ensemble.cache is not None:
+                print(f"Prediction cache: {ensemble.cache.stats()}")
+            reloader.close()
+        elif ensemble is not None:
+            ensemble.close()
+        if reading_log is not None:
+            reading_log.close()
         GPIO.cleanup()
         time.sleep(1)
         exit(0)
\ No newline at end of file
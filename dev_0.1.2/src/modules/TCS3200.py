@@ -52,16 +52,19 @@ class TCS3200:
             print("TCS3200 sensor is scaled to 100%.")
         else:
             raise(f"Scaling to {scaling} is not available. Please select among 0.02, 0.20, or 1.00.")
+        self.scaling = scaling
         return
 
     # Method to turn LED on
     def led_on(self):
         GPIO.output(self.LED, GPIO.HIGH)
+        self.led_power = True
         return
 
     # Method to turn LED off
     def led_off(self):
         GPIO.output(self.LED, GPIO.LOW)
+        self.led_power = False
         return
 
     # Method to apply statistic model to return precise value through several iterations
@@ -0,0 +1,105 @@
+import os
+import numpy as np
+import pandas as pd
+
+
+# Base length (well row) correction.
+# The rows of a well plate are not lit equally: base_length.csv holds readings
+# of the empty plate, and the mean sum of the RGB frequencies of each well row
+# relative to the brightest row is the normalization factor of that row. A
+# reading is corrected by dividing its frequencies by the factor of its well
+# row and scaling them to 0-255 RGB with the calibration min/max, as in
+# docs/base_length_correction.ipynb. The factor table is built once; whole
+# files are corrected with array operations, chunk by chunk, and single
+# readings can be corrected while they are measured. Only labels of plate
+# wells ("1-D1", "1_D1") have a well row, other readings are not corrected.
+
+FREQUENCY_COLUMNS = ["Red_Frequency", "Green_Frequency", "Blue_Frequency"]
+RGB_COLUMNS = ["Red", "Green", "Blue"]
+CORRECTED_PREFIX = "Corrected_" # Corrected values of single readings are stored next to the raw ones
+WELL_LABEL_PATTERN = r"^\d+[-_]([A-H])\d{1,2}$"
+
+
+# Define a function to build the normalization factor of each well row from base length readings
+def build_factor_table(base_length_df):
+    base_length_df = base_length_df.rename(columns=lambda column: str(column).strip())
+    frequency_sum = base_length_df[FREQUENCY_COLUMNS].sum(axis=1)
+    factor_df = frequency_sum.groupby(base_length_df["Well_Row"]).agg(["mean", "std"]).reset_index()
+    factor_df.columns = ["Well_Row", "Mean_Frequency_Sum", "Std_Frequency_Sum"]
+    factor_df["Normalization_Factor"] = factor_df["Mean_Frequency_Sum"] / factor_df["Mean_Frequency_Sum"].max()
+    return factor_df
+
+# Define a function to get the well rows of labels (e.g. "1-D1" or "1_D1" -> "D"; None if the label is not a plate well, e.g. "BSA")
+def get_well_rows(labels):
+    rows = pd.Series(labels, dtype="object").astype(str).str.strip().str.upper().str.extract(WELL_LABEL_PATTERN)[0]
+    return rows.where(rows.notna(), None)
+
+
+class BaseLengthCorrector:
+    """Per well row frequency correction followed by min/max RGB scaling"""
+    def __init__(self, factor_df, global_min, global_max):
+        self.factor_df = factor_df
+        self.factors = factor_df.set_index("Well_Row")["Normalization_Factor"]
+        self.global_min = np.asarray(global_min[:3], dtype=np.float64)
+        self.scale = 255 / (np.asarray(global_max[:3], dtype=np.float64) - self.global_min)
+
+    # Method to build the corrector from a base length file
+    @classmethod
+    def from_file(cls, base_length_path, global_min, global_max):
+        return cls(build_factor_table(pd.read_csv(base_length_path)), global_min, global_max)
+
+    # Method to get the well rows of a DataFrame (its Well_Row or Row column, else its text labels)
+    @staticmethod
+    def well_rows(dataframe):
+        for column in ("Well_Row", "Row"):
+            if column in dataframe.columns:
+                return dataframe[column].astype(str).str.strip().str.upper()
+        return get_well_rows(dataframe["Label"]).set_axis(dataframe.index)
+
+    # Method to correct frequencies (n, 3) of readings in the given well rows (returns corrected frequencies, RGB and factors)
+    def correct_arrays(self, frequencies, well_rows):
+        factors = pd.Series(well_rows).map(self.factors).to_numpy(dtype=np.float64)
+        frequencies = np.asarray(frequencies, dtype=np.float64) / factors[:, None]
+        rgb = np.clip((frequencies - self.global_min) * self.scale, 0, 255)
+        return frequencies, rgb, factors
+
+    # Method to correct a DataFrame of readings (frequency and RGB columns replaced, Well_Row and Normalization_Factor added;
+    # readings without a factor keep their values and get a NaN factor)
+    def correct(self, dataframe):
+        output_df = dataframe.rename(columns=lambda column: str(column).strip())
+        if "Normalization_Factor" in output_df.columns:
+            raise ValueError("Readings are already corrected (they have a Normalization_Factor column).")
+        well_rows = self.well_rows(output_df)
+        frequencies, rgb, factors = self.correct_arrays(output_df[FREQUENCY_COLUMNS].to_numpy(), well_rows.to_numpy())
+        corrected = ~np.isnan(factors)
+        output_df.loc[corrected, FREQUENCY_COLUMNS] = frequencies[corrected]
+        output_df.loc[corrected, RGB_COLUMNS] = rgb[corrected]
+        if "Row" not in output_df.columns:
+            output_df["Well_Row"] = well_rows
+        output_df["Normalization_Factor"] = factors
+        return output_df
+
+    # Method to correct a single reading (a row dict with frequency columns) while it is measured
+    # (the raw values are kept, the corrected ones are added as Corrected_* columns; None if the well row has no factor)
+    def correct_reading(self, row, well_row):
+        if well_row not in self.factors.index:
+            return None
+        frequencies, rgb, factors = self.correct_arrays([[row[column] for column in FREQUENCY_COLUMNS]], [well_row])
+        corrected = dict(zip(FREQUENCY_COLUMNS + RGB_COLUMNS, np.concatenate([frequencies[0], rgb[0]])))
+        return dict(row, **{f"{CORRECTED_PREFIX}{column}": value for column, value in corrected.items()},
+                    Well_Row=well_row, Normalization_Factor=factors[0])
+
+    # Method to correct a .csv file chunk by chunk (returns the number of rows)
+    def correct_file(self, input_file, output_file, chunksize=100_000):
+        temp_file = f"{output_file}.tmp"
+        num_rows = 0
+        try:
+            for index, chunk in enumerate(pd.read_csv(input_file, chunksize=chunksize)):
+                self.correct(chunk).to_csv(temp_file, mode="w" if index == 0 else "a", header=(index == 0), index=False)
+                num_rows += len(chunk)
+        except Exception:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+        os.replace(temp_file, output_file)
+        return num_rows
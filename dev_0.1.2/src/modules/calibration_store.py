@@ -0,0 +1,201 @@
+import os
+import json
+from datetime import datetime
+
+
+# Versioned calibration store.
+# All calibrations live in one JSON file (data/calibration.json), grouped into
+# named profiles, one per sensor setup (sensor id, frequency scaling, LED
+# state). Every calibration run adds a new version to its profile, so earlier
+# calibrations are kept and can be selected again. The file is parsed once and
+# cached until it changes on disk, and the profile is selected from the
+# configuration of the sensor, so switching setups needs neither a restart nor
+# a reparse. A legacy calibration.txt is imported on first use.
+
+CALIBRATION_FILE = "calibration.json"
+LEGACY_CALIBRATION_FILE = "calibration.txt"
+STORE_VERSION = 1
+DEFAULT_SENSOR_ID = "tcs3200"
+
+# Sensor setup of the legacy calibration.txt (calibrate_sensor.py defaults)
+LEGACY_SENSOR = {"sensor_id": DEFAULT_SENSOR_ID, "scaling": 0.20, "led_power": True}
+
+
+# Define a function to get the sensor setup (sensor id, scaling, LED state) of a TCS3200 object
+def get_sensor_config(sensor):
+    return {
+        "sensor_id": getattr(sensor, "sensor_id", DEFAULT_SENSOR_ID),
+        "scaling": float(sensor.scaling),
+        "led_power": bool(sensor.led_power),
+    }
+
+# Define a function to get the profile name of a sensor setup (e.g. tcs3200_s20_led-off)
+def get_profile_name(sensor_id=DEFAULT_SENSOR_ID, scaling=0.20, led_power=True):
+    return f"{sensor_id}_s{round(float(scaling) * 100):d}_led-{'on' if led_power else 'off'}"
+
+# Define a function to parse a legacy calibration.txt (python list reprs)
+def parse_legacy_calibration(path):
+    values = {}
+    with open(path, "r") as file:
+        for line in file:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                values[key.strip()] = json.loads(value.strip())
+    return values
+
+
+class CalibrationStore:
+    """Calibration profiles of the sensor setups, with every calibration run kept as a version"""
+    def __init__(self, data_path, filename=CALIBRATION_FILE):
+        self.data_path = data_path
+        self.path = os.path.join(data_path, filename)
+        self._data = None
+        self._stamp = None
+
+    # Method to load the store (parsed again only if the file changed since the last load)
+    def load(self):
+        if not os.path.exists(self.path):
+            legacy_path = os.path.join(self.data_path, LEGACY_CALIBRATION_FILE)
+            if not os.path.exists(legacy_path):
+                return {"store_version": STORE_VERSION, "profiles": {}}
+            self.import_legacy(legacy_path)
+
+        stat = os.stat(self.path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            with open(self.path, "r") as file:
+                self._data = json.load(file)
+            self._stamp = stamp
+        return self._data
+
+    # Method to write the store (written to a temporary file, then renamed)
+    def _write(self, data):
+        os.makedirs(self.data_path, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(data, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+        self._stamp = None
+
+    # Method to import a legacy calibration.txt as the first version of its profile
+    def import_legacy(self, legacy_path):
+        values = parse_legacy_calibration(legacy_path)
+        print(f"Importing legacy calibration data from: {os.path.abspath(legacy_path)}")
+        data = {"store_version": STORE_VERSION, "profiles": {}}
+        self._add_version(data, values["global_min"], values["global_max"], values.get("white_balance"),
+                          source=os.path.basename(legacy_path), **LEGACY_SENSOR)
+        self._write(data)
+
+    # Method to list the profiles
+    def profiles(self):
+        return self.load()["profiles"]
+
+    # Method to add a calibration as a new version of the profile of its sensor setup (returns the profile name and version)
+    def save(self, global_min, global_max, white_balance=None, sensor_id=DEFAULT_SENSOR_ID, scaling=0.20, led_power=True,
+             profile=None, source=None):
+        data = json.loads(json.dumps(self.load())) # Do not modify the cached copy
+        profile, version = self._add_version(data, global_min, global_max, white_balance, sensor_id, scaling, led_power, profile, source)
+        self._write(data)
+        return profile, version
+
+    # Method to add a calibration version to the data of the store
+    @staticmethod
+    def _add_version(data, global_min, global_max, white_balance=None, sensor_id=DEFAULT_SENSOR_ID, scaling=0.20, led_power=True,
+                     profile=None, source=None):
+        profile = profile or get_profile_name(sensor_id, scaling, led_power)
+        entry = data["profiles"].setdefault(profile, {
+            "sensor": {"sensor_id": sensor_id, "scaling": float(scaling), "led_power": bool(led_power)},
+            "active_version": None,
+            "versions": [],
+        })
+        version = max((record["version"] for record in entry["versions"]), default=0) + 1
+        entry["versions"].append({
+            "version": version,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "source": source,
+            "global_min": [float(value) for value in global_min],
+            "global_max": [float(value) for value in global_max],
+            "white_balance": None if white_balance is None else float(white_balance),
+        })
+        entry["active_version"] = version
+        return profile, version
+
+    # Method to activate a version of a profile (e.g. to go back to an earlier calibration)
+    def activate(self, profile, version):
+        data = json.loads(json.dumps(self.load()))
+        entry = data["profiles"][profile]
+        if version not in [record["version"] for record in entry["versions"]]:
+            raise KeyError(f"Calibration profile {profile} has no version {version}.")
+        entry["active_version"] = version
+        self._write(data)
+
+    # Method to select the profile of a sensor setup (the same sensor and scaling, then any profile, if there is no exact match)
+    def select(self, sensor_config=None):
+        profiles = self.profiles()
+        if not profiles:
+            return None
+        if sensor_config is None:
+            return max(profiles, key=lambda name: self._active(profiles[name])["created"])
+
+        name = get_profile_name(**sensor_config)
+        if name in profiles:
+            return name
+        candidates = [candidate for candidate, entry in profiles.items()
+                      if entry["sensor"]["sensor_id"] == sensor_config["sensor_id"] and entry["sensor"]["scaling"] == sensor_config["scaling"]]
+        fallback = candidates[0] if candidates else max(profiles, key=lambda candidate: self._active(profiles[candidate])["created"])
+        print(f"No calibration profile {name}. Using {fallback} instead, calibrate this setup with calibrate_sensor.py.")
+        return fallback
+
+    # Method to get the active (or a given) version of a profile
+    @staticmethod
+    def _active(entry, version=None):
+        version = entry["active_version"] if version is None else version
+        return next(record for record in entry["versions"] if record["version"] == version)
+
+    # Method to get a calibration (profile selected from the sensor setup unless given)
+    def get(self, sensor_config=None, profile=None, version=None):
+        profile = profile or self.select(sensor_config)
+        if profile is None:
+            return None
+        entry = self.profiles()[profile]
+        return dict(self._active(entry, version), profile=profile, sensor=entry["sensor"])
+
+    # Method to get the reference of a calibration recorded with trained models (profile and version; the first version imported from source if given)
+    def reference(self, sensor_config=None, profile=None, version=None, source=None):
+        if source is not None:
+            for name, entry in self.profiles().items():
+                for record in entry["versions"]:
+                    if record.get("source") == source:
+                        return {"profile": name, "version": record["version"], "source": source}
+            return None
+        calibration = self.get(sensor_config, profile, version)
+        if calibration is None:
+            return None
+        return {"profile": calibration["profile"], "version": calibration["version"], "source": calibration.get("source")}
+
+
+_stores = {}
+
+# Define a function to get the (cached) calibration store of a data directory
+def get_store(data_path):
+    data_path = os.path.abspath(data_path)
+    if data_path not in _stores:
+        _stores[data_path] = CalibrationStore(data_path)
+    return _stores[data_path]
+
+# Define a function to load sensor calibration data (the profile is selected from the sensor setup)
+def load_calibration_data(data_path, sensor=None, profile=None):
+    store = get_store(data_path)
+    try:
+        calibration = store.get(get_sensor_config(sensor) if sensor is not None else None, profile)
+    except Exception as e:
+        print(f"Calibration data load error occurred: {e}")
+        return None, None
+    if calibration is None:
+        print(f"No calibration data found at: {os.path.abspath(store.path)}")
+        return None, None
+
+    print(f"Calibration data loaded from: {os.path.abspath(store.path)} (profile {calibration['profile']}, version {calibration['version']})")
+    return calibration["global_min"], calibration["global_max"]
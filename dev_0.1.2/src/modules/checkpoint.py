@@ -0,0 +1,91 @@
+import os
+import json
+import shutil
+import hashlib
+
+
+# Checkpoints of training sweeps.
+# A sweep directory holds one append-only journal of finished jobs (written by
+# the process that collects the results) and one journal per job with the
+# cross-validation score of every evaluated candidate (written by the worker
+# running that job). Every line is flushed and fsynced before the work is
+# considered done, so an interrupted sweep restarts where it stopped: finished
+# jobs are skipped and half-finished searches skip the candidates they scored.
+
+JOBS_FILE = "jobs.jsonl"
+
+
+# Define a function to get a stable key of JSON-serializable values
+def make_key(*values):
+    return hashlib.sha256(json.dumps(values, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+# Define a function to append a record to a journal file
+def append_record(path, record):
+    with open(path, "a") as file:
+        file.write(json.dumps(record, sort_keys=True, default=str) + "\n")
+        file.flush()
+        os.fsync(file.fileno())
+
+# Define a function to read the records of a journal file (a torn last line from a crash is ignored)
+def read_records(path):
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, "r") as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+class CandidateJournal:
+    """Cross-validation scores of the candidates of one search"""
+    def __init__(self, path):
+        self.path = path
+        self.scores = {record["params_key"]: record for record in read_records(path)}
+
+    # Method to return the recorded score of a candidate, or None
+    def get(self, params):
+        record = self.scores.get(make_key(params))
+        return record["score"] if record is not None else None
+
+    # Method to record the score of a candidate
+    def record(self, params, score, n_fits):
+        record = {"params_key": make_key(params), "params": params, "score": float(score), "n_fits": n_fits}
+        append_record(self.path, record)
+        self.scores[record["params_key"]] = record
+
+
+class SweepCheckpoint:
+    """Finished jobs and candidate scores of a training sweep"""
+    def __init__(self, checkpoint_dir):
+        self.checkpoint_dir = checkpoint_dir
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.jobs_path = os.path.join(checkpoint_dir, JOBS_FILE)
+        self.jobs = {record["job_key"]: record["result"] for record in read_records(self.jobs_path)}
+
+    # Method to get the key of a job from everything that determines its result
+    @staticmethod
+    def job_key(model_id, source_hash, search):
+        return make_key(model_id, source_hash, search)
+
+    # Method to return the result of a finished job, or None
+    def get(self, job_key):
+        return self.jobs.get(job_key)
+
+    # Method to record a finished job
+    def record(self, job_key, result):
+        append_record(self.jobs_path, {"job_key": job_key, "result": result})
+        self.jobs[job_key] = result
+
+    # Method to open the candidate journal of a job
+    def candidates(self, job_key):
+        return CandidateJournal(os.path.join(self.checkpoint_dir, f"{job_key}.jsonl"))
+
+    # Method to discard every checkpoint of the sweep
+    def clear(self):
+        shutil.rmtree(self.checkpoint_dir, ignore_errors=True)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self.jobs = {}
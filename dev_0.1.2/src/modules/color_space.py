@@ -0,0 +1,116 @@
+import numpy as np
+
+
+# Names of the features produced for each color space, in model input order
+FEATURE_NAMES = {
+    "rgb": ["Red", "Green", "Blue"],
+    "hsl": ["Hue", "Saturation", "Lightness"],
+    "hsv": ["Hue", "Saturation", "Value"],
+    "cmyk": ["Cyan", "Magenta", "Yellow", "Black"],
+    "lab": ["L", "a", "b"],
+}
+
+
+# Vectorized color conversions.
+# All functions take an array of RGB values in [0, 255] with shape (..., 3) and
+# return an array of shape (..., n_features). They reproduce the scalar
+# conversions used in the model training notebooks so that the features match
+# the ones the saved models were trained on.
+
+# Method to split and normalize an RGB array
+def _split_rgb(rgb):
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    return rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+# Method to convert RGB to RGB (identity, as float array)
+def rgb_to_rgb(rgb):
+    return np.asarray(rgb, dtype=np.float64).copy()
+
+# Method to convert RGB to HSL
+def rgb_to_hsl(rgb):
+    r, g, b = _split_rgb(rgb)
+    max_val = np.maximum(np.maximum(r, g), b)
+    min_val = np.minimum(np.minimum(r, g), b)
+    diff = max_val - min_val
+    l = (max_val + min_val) / 2
+    chromatic = diff != 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Saturation calculation
+        s = np.where(l > 0.5, diff / (2 - max_val - min_val), diff / (max_val + min_val))
+
+        # Hue calculation
+        h = np.where(max_val == r, (g - b) / diff + (g < b) * 6,
+            np.where(max_val == g, (b - r) / diff + 2, (r - g) / diff + 4))
+        h = h / 6
+
+    h = np.where(chromatic, h, 0.0)
+    s = np.where(chromatic, s, 0.0)
+    return np.stack([h, s, l], axis=-1)
+
+# Method to convert RGB to HSV (hue scaled to [0, 1])
+def rgb_to_hsv(rgb):
+    r, g, b = _split_rgb(rgb)
+    max_val = np.maximum(np.maximum(r, g), b)
+    min_val = np.minimum(np.minimum(r, g), b)
+    diff = max_val - min_val
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = np.where(max_val == r, (60 * ((g - b) / diff) + 360) % 360,
+            np.where(max_val == g, (60 * ((b - r) / diff) + 120) % 360, (60 * ((r - g) / diff) + 240) % 360))
+        h = h / 360.0
+        s = diff / max_val
+
+    h = np.where(diff != 0, h, 0.0)
+    s = np.where(max_val != 0, s, 0.0)
+    return np.stack([h, s, max_val], axis=-1)
+
+# Method to convert RGB to CMYK
+def rgb_to_cmyk(rgb):
+    r, g, b = _split_rgb(rgb)
+    k = 1 - np.maximum(np.maximum(r, g), b)
+    black = k == 1
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        c = np.where(black, 0.0, (1 - r - k) / (1 - k))
+        m = np.where(black, 0.0, (1 - g - k) / (1 - k))
+        y = np.where(black, 0.0, (1 - b - k) / (1 - k))
+
+    return np.stack([c, m, y, k], axis=-1)
+
+# Method to convert RGB to CIELAB (sRGB, D65 illuminant)
+def rgb_to_lab(rgb):
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+
+    # Gamma correction
+    rgb = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    # RGB to CIEXYZ, normalized for D65 illuminant
+    X = (0.4124 * r + 0.3576 * g + 0.1805 * b) / 0.95047
+    Y = (0.2126 * r + 0.7152 * g + 0.0722 * b) / 1.00000
+    Z = (0.0193 * r + 0.1192 * g + 0.9505 * b) / 1.08883
+
+    xyz = np.stack([X, Y, Z], axis=-1)
+    xyz = np.where(xyz > 0.008856, xyz ** (1 / 3), 7.787 * xyz + 16 / 116)
+
+    L = 116.0 * xyz[..., 1] - 16.0
+    a = 500.0 * (xyz[..., 0] - xyz[..., 1])
+    b = 200.0 * (xyz[..., 1] - xyz[..., 2])
+    return np.stack([L, a, b], axis=-1)
+
+
+CONVERTERS = {
+    "rgb": rgb_to_rgb,
+    "hsl": rgb_to_hsl,
+    "hsv": rgb_to_hsv,
+    "cmyk": rgb_to_cmyk,
+    "lab": rgb_to_lab,
+}
+
+# Define a function to convert an RGB array to the given color space
+def convert_color_space(rgb, color_space_name="rgb"):
+    color_space_name = color_space_name.lower()
+    if color_space_name not in CONVERTERS:
+        raise ValueError(f"Color space {color_space_name} is not available. Please select among {list(CONVERTERS)}.")
+    return CONVERTERS[color_space_name](rgb)
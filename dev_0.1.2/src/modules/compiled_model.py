@@ -0,0 +1,22 @@
+import numpy as np
+from modules.tree_ensemble import TreeEnsemble
+from modules.numpy_mlp import NumpyMLP
+from modules.svr_compression import CompressedSVR
+
+
+# Runtimes of the exported model formats, keyed by the "format" entry of the .npz file
+RUNTIMES = {
+    "tree_ensemble": TreeEnsemble,
+    "mlp": NumpyMLP,
+    "svr": CompressedSVR,
+}
+
+
+# Define a function to load an exported model (.npz) with the matching NumPy runtime
+def load_compiled_model(path):
+    with np.load(path) as data:
+        arrays = {key: data[key] for key in data.files}
+    model_format = str(arrays.get("format", ""))
+    if model_format not in RUNTIMES:
+        raise ValueError(f"Unknown exported model format '{model_format}' in: {path}")
+    return RUNTIMES[model_format](arrays)
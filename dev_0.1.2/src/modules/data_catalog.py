@@ -0,0 +1,257 @@
+import os
+import re
+import json
+import sqlite3
+from datetime import datetime
+from modules.model_registry import file_hash
+
+
+# Data catalog.
+# data/catalog.sqlite indexes the files of the data directory (datasets,
+# sessions, calibrations, models, metrics and validation sheets) with their
+# kind, content hash, row count and lineage (which files a file was made from).
+# Scripts ask the catalog for files (e.g. the latest dataset, every corrected
+# reference file) with indexed queries instead of listing directories, and
+# register the files they write. A scan only re-hashes files whose size or
+# modification time changed, so it stays cheap as sessions pile up; a refresh
+# does the same for a single directory (e.g. before asking for the latest
+# dataset), so files written without registering them are not missed.
+
+CATALOG_FILE = "catalog.sqlite"
+CATALOG_VERSION = 1
+
+# Kinds of files by their path relative to the data directory (first match wins)
+KIND_PATTERNS = [
+    ("journal", r"^sessions/.*\.journal\.csv$"),
+    ("session", r"^sessions/.*\.parquet$"),
+    ("reference_corrected", r"^training/reference_corrected_.*\.csv$"),
+    ("reference", r"^training/reference_.*\.csv$"),
+    ("test_corrected", r"^tests/.*_corrected\.csv$"),
+    ("test", r"^tests/.*\.csv$"),
+    ("model", r"^models/.*\.(joblib|npz)$"),
+    ("manifest", r"^models/manifest\.json$"),
+    ("metrics", r"^metrics/.*\.(csv|xlsx)$"),
+    ("validation", r"^validations/.*\.(xls|xlsx)$"),
+    ("calibration", r"^calibration\.(json|txt)$"),
+    ("base_length", r"^base_length\.csv$"),
+    ("dataset", r"^[^/]*\.csv$"),
+]
+
+# Directories that are not indexed (derived data)
+SKIPPED_DIRECTORIES = {"cache", "monitoring", "versions"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    dataset TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    sha256 TEXT NOT NULL,
+    rows INTEGER,
+    metadata TEXT,
+    indexed TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_kind_mtime ON files (kind, mtime_ns);
+CREATE INDEX IF NOT EXISTS files_directory_mtime ON files (directory, mtime_ns);
+CREATE INDEX IF NOT EXISTS files_dataset ON files (dataset);
+CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256);
+CREATE TABLE IF NOT EXISTS lineage (
+    path TEXT NOT NULL,
+    parent TEXT NOT NULL,
+    relation TEXT NOT NULL,
+    PRIMARY KEY (path, parent)
+);
+CREATE INDEX IF NOT EXISTS lineage_parent ON lineage (parent);
+"""
+
+
+# Define a function to get the kind of a file from its path relative to the data directory
+def get_kind(relative_path):
+    for kind, pattern in KIND_PATTERNS:
+        if re.match(pattern, relative_path):
+            return kind
+    return None
+
+# Define a function to get the dataset name of a file (e.g. BCA-200uL-2 for training/reference_corrected_BCA-200uL-2.csv)
+def get_dataset(relative_path):
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    match = re.match(r"^(?:reference_corrected|reference|metrics_[a-z]+|prediction_[a-z]+)_(.+)$", stem)
+    return match.group(1) if match else None
+
+# Define a function to count the rows of a data file (None if it is not a table that can be counted cheaply)
+def count_rows(path):
+    if path.endswith(".csv"):
+        with open(path, "rb") as file:
+            lines = sum(chunk.count(b"\n") for chunk in iter(lambda: file.read(1 << 20), b""))
+            if file.tell() > 0:
+                file.seek(-1, os.SEEK_END)
+                lines += file.read(1) != b"\n" # Last line without a newline
+        return max(lines - 1, 0)
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            return None
+        return pq.ParquetFile(path).metadata.num_rows
+    return None
+
+
+class DataCatalog:
+    """SQLite index of the files in the data directory"""
+    def __init__(self, data_path, catalog_file=CATALOG_FILE):
+        self.data_path = os.path.abspath(data_path)
+        self.catalog_path = os.path.join(self.data_path, catalog_file)
+        new_catalog = not os.path.exists(self.catalog_path)
+        self.connection = sqlite3.connect(self.catalog_path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.execute(f"PRAGMA user_version={CATALOG_VERSION}")
+        if new_catalog:
+            print(f"Building the data catalog at: {self.catalog_path}")
+            self.scan()
+
+    # Method to get the path of a file relative to the data directory
+    def relative(self, path):
+        return os.path.relpath(os.path.abspath(path), self.data_path).replace(os.sep, "/")
+
+    # Method to get the absolute path of a catalog entry
+    def absolute(self, relative_path):
+        return os.path.join(self.data_path, *relative_path.split("/"))
+
+    # Method to add or update a file (hashed again only if its size or modification time changed)
+    def add(self, path, metadata=None, parents=None, commit=True):
+        relative_path = self.relative(path)
+        kind = get_kind(relative_path)
+        if kind is None:
+            return None
+        stat = os.stat(path)
+        row = self.connection.execute("SELECT size, mtime_ns FROM files WHERE path = ?", (relative_path,)).fetchone()
+        if row is None or (row["size"], row["mtime_ns"]) != (stat.st_size, stat.st_mtime_ns) or metadata is not None:
+            directory, name = os.path.split(relative_path)
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (relative_path, directory, name, kind, get_dataset(relative_path), stat.st_size, stat.st_mtime_ns,
+                 file_hash(path), count_rows(path), json.dumps(metadata) if metadata is not None else None,
+                 datetime.now().isoformat(timespec="seconds")))
+            self._add_lineage(relative_path, kind, parents)
+        if commit:
+            self.connection.commit()
+        return relative_path
+
+    # Method to record the files a file was made from (given, or derived from the naming conventions of the repo)
+    def _add_lineage(self, relative_path, kind, parents=None):
+        links = [(self.relative(parent), relation) for parent, relation in (parents or {}).items()]
+        dataset = get_dataset(relative_path)
+        name = os.path.basename(relative_path)
+        if kind == "reference_corrected":
+            links += [(f"training/reference_{dataset}.csv", "corrected_from"), ("base_length.csv", "base_length")]
+        elif kind == "test_corrected":
+            links += [(f"tests/{name.replace('_corrected.csv', '.csv')}", "corrected_from"), ("base_length.csv", "base_length")]
+        elif kind == "metrics" and dataset:
+            links += [(f"training/reference_corrected_{dataset}.csv", "evaluated_on")]
+        elif kind == "session":
+            links += [("calibration.json", "calibrated_with")]
+        elif kind == "model":
+            entry = self._manifest_entry(name)
+            if entry and entry.get("dataset"):
+                links += [(f"training/reference_corrected_{entry['dataset']}.csv", "trained_on")]
+            if entry and (entry.get("update") or {}).get("reference_file"):
+                links += [(f"training/{entry['update']['reference_file']}", "updated_with")]
+        self.connection.execute("DELETE FROM lineage WHERE path = ?", (relative_path,))
+        self.connection.executemany("INSERT OR REPLACE INTO lineage VALUES (?, ?, ?)",
+                                    [(relative_path, parent, relation) for parent, relation in links
+                                     if os.path.exists(self.absolute(parent))])
+
+    # Method to get the manifest entry of a model file (None if it is not registered)
+    def _manifest_entry(self, model_file):
+        manifest_path = os.path.join(self.data_path, "models", "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r") as file:
+            models = json.load(file).get("models", {})
+        return next((entry for entry in models.values() if entry["file"] == model_file), None)
+
+    # Method to bring the catalog up to date with the data directory (returns the numbers of added/updated and removed files)
+    def scan(self):
+        seen = set()
+        before = {row["path"]: (row["size"], row["mtime_ns"]) for row in self.connection.execute("SELECT path, size, mtime_ns FROM files")}
+        changed = 0
+        for root, directories, files in os.walk(self.data_path):
+            directories[:] = [directory for directory in directories if directory not in SKIPPED_DIRECTORIES]
+            for file in files:
+                path = os.path.join(root, file)
+                relative_path = self.relative(path)
+                if get_kind(relative_path) is None:
+                    continue
+                seen.add(relative_path)
+                stat = os.stat(path)
+                if before.get(relative_path) != (stat.st_size, stat.st_mtime_ns):
+                    self.add(path, commit=False)
+                    changed += 1
+        removed = [path for path in before if path not in seen]
+        self.connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+        self.connection.executemany("DELETE FROM lineage WHERE path = ?", [(path,) for path in removed])
+        self.connection.commit()
+        return changed, len(removed)
+
+    # Method to bring the entries of one directory up to date (a listing and stat calls; only changed files are hashed)
+    def refresh(self, directory=""):
+        before = {row["path"]: (row["size"], row["mtime_ns"]) for row in
+                  self.connection.execute("SELECT path, size, mtime_ns FROM files WHERE directory = ?", (directory,))}
+        seen = set()
+        with os.scandir(self.absolute(directory) if directory else self.data_path) as entries:
+            for entry in entries:
+                relative_path = self.relative(entry.path)
+                if not entry.is_file() or get_kind(relative_path) is None:
+                    continue
+                seen.add(relative_path)
+                stat = entry.stat()
+                if before.get(relative_path) != (stat.st_size, stat.st_mtime_ns):
+                    self.add(entry.path, commit=False)
+        removed = [path for path in before if path not in seen]
+        self.connection.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+        self.connection.executemany("DELETE FROM lineage WHERE path = ?", [(path,) for path in removed])
+        self.connection.commit()
+
+    # Method to find files by kind, directory and/or dataset (newest first)
+    def find(self, kind=None, directory=None, dataset=None, limit=None):
+        conditions, values = [], []
+        for column, value in (("kind", kind), ("directory", directory), ("dataset", dataset)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(value)
+        query = "SELECT * FROM files" + (f" WHERE {' AND '.join(conditions)}" if conditions else "") + " ORDER BY mtime_ns DESC"
+        if limit is not None:
+            query += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.connection.execute(query, values)]
+
+    # Method to get the absolute path of the newest file of a kind (None if there is none, entries of deleted files are dropped)
+    def latest(self, kind=None, directory=None, dataset=None):
+        while True:
+            rows = self.find(kind, directory, dataset, limit=1)
+            if not rows:
+                return None
+            path = self.absolute(rows[0]["path"])
+            if os.path.exists(path):
+                return path
+            self.connection.execute("DELETE FROM files WHERE path = ?", (rows[0]["path"],))
+            self.connection.commit()
+
+    # Method to get a file by its content hash
+    def by_hash(self, sha256):
+        return [dict(row) for row in self.connection.execute("SELECT * FROM files WHERE sha256 = ?", (sha256,))]
+
+    # Method to get the lineage of a file (parents, or children with children=True)
+    def lineage(self, path, children=False):
+        relative_path = self.relative(path) if os.path.isabs(path) else path
+        column, other = ("parent", "path") if children else ("path", "parent")
+        query = f"SELECT {other} AS path, relation FROM lineage WHERE {column} = ?"
+        return [dict(row) for row in self.connection.execute(query, (relative_path,))]
+
+    # Method to close the catalog
+    def close(self):
+        self.connection.close()
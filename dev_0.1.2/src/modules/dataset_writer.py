@@ -0,0 +1,113 @@
+import os
+import csv
+import glob
+import json
+import hashlib
+
+
+# Crash-safe dataset writes.
+# Full saves are written to a temporary file, fsynced and renamed over the
+# target, so the target is always either the old or the new file. Appends only
+# write the new rows: they are first recorded in a checksummed journal next to
+# the target (the rows, aligned to the header of the file, and the size of the
+# file before the append), then written at that offset. A journal left behind
+# by a power cut is replayed on the next start: the file is cut back to the
+# recorded size and the rows are written again, so an append is applied
+# exactly once. A torn journal (bad checksum) means the file was not touched.
+
+APPEND_JOURNAL_SUFFIX = ".append-journal"
+
+
+# Define a function to fsync a directory (makes a rename durable)
+def _fsync_directory(path):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return # e.g. on Windows
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+# Define a function to get the checksum of an append record
+def _checksum(target, offset, data):
+    return hashlib.sha256(f"{target}\n{offset}\n{data}".encode("utf-8")).hexdigest()
+
+# Define a function to write a DataFrame to a .csv file atomically (temporary file, fsync, rename)
+def write_atomic(dataframe, path):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", newline="") as file:
+        dataframe.to_csv(file, index=False)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+    _fsync_directory(path)
+    return path
+
+# Define a function to read the header of a .csv file
+def read_header(path):
+    with open(path, "r", newline="") as file:
+        return next(csv.reader(file), [])
+
+# Define a function to write the rows of an append record at its offset (safe to repeat)
+def _apply_append(path, offset, data):
+    with open(path, "r+b") as file:
+        file.truncate(offset)
+        file.seek(offset)
+        file.write(data.encode("utf-8"))
+        file.flush()
+        os.fsync(file.fileno())
+
+# Define a function to append the rows of a DataFrame to a .csv file through the append journal
+def append_rows(dataframe, path):
+    header = read_header(path)
+    columns = [str(column).strip() for column in dataframe.columns]
+    unknown_columns = [column for column in columns if column not in header]
+    if unknown_columns:
+        raise ValueError(f"Columns {unknown_columns} are not in the header of {os.path.basename(path)}: {header}")
+    dataframe = dataframe.set_axis(columns, axis=1).reindex(columns=header) # Same column order as the file
+
+    offset = os.path.getsize(path)
+    data = dataframe.to_csv(index=False, header=False, lineterminator="\n")
+    if offset > 0:
+        with open(path, "rb") as file:
+            file.seek(offset - 1)
+            if file.read(1) != b"\n":
+                data = "\n" + data # Last line of the file has no line break
+
+    # Journal first, then the file
+    journal_path = f"{path}{APPEND_JOURNAL_SUFFIX}"
+    record = {"target": os.path.basename(path), "offset": offset, "data": data, "sha256": _checksum(os.path.basename(path), offset, data)}
+    with open(journal_path, "w") as file:
+        json.dump(record, file)
+        file.flush()
+        os.fsync(file.fileno())
+    _fsync_directory(journal_path) # The journal must survive a power cut before the file is touched
+    _apply_append(path, offset, data)
+    os.remove(journal_path)
+    return len(dataframe)
+
+# Define a function to replay the append journals left in a directory by an interrupted append (returns the replayed files)
+def replay_journals(directory):
+    replayed = []
+    for journal_path in sorted(glob.glob(os.path.join(directory, f"*{APPEND_JOURNAL_SUFFIX}"))):
+        path = journal_path[:-len(APPEND_JOURNAL_SUFFIX)]
+        try:
+            with open(journal_path, "r") as file:
+                record = json.load(file)
+            valid = record["sha256"] == _checksum(record["target"], record["offset"], record["data"])
+        except (ValueError, KeyError):
+            valid = False
+        if not valid:
+            print(f"Torn append journal removed (the data file was not changed): {os.path.abspath(journal_path)}")
+            os.remove(journal_path)
+            continue
+        if not os.path.exists(path) or os.path.getsize(path) < record["offset"]:
+            os.replace(journal_path, f"{journal_path}.orphan")
+            print(f"Append journal does not match {os.path.basename(path)}, kept at: {os.path.abspath(journal_path)}.orphan")
+            continue
+        _apply_append(path, record["offset"], record["data"])
+        os.remove(journal_path)
+        print(f"Interrupted append replayed: {record['data'].count(chr(10))} rows at {os.path.abspath(path)}")
+        replayed.append(path)
+    return replayed
@@ -0,0 +1,105 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from modules.tree_ensemble import TreeEnsemble
+from modules.prediction_cache import feature_steps
+
+
+# Model ensemble with uncertainty.
+# A configured set of registered models is evaluated on the same reading in a
+# thread pool (the heavy work happens in NumPy and releases the GIL), and the
+# result carries the mean, the spread across models and every model's value.
+# Random forests are loaded by the registry as a TreeEnsemble over memory-mapped
+# node arrays (the sklearn forest is not kept), so the spread across their
+# trees comes out of the same traversal as the prediction.
+
+FOREST_TYPES = ("RandomForestRegressor", "ExtraTreesRegressor")
+
+
+# Define a function to load a model as the device evaluates it (forests as a TreeEnsemble over memory-mapped node arrays)
+def load_ensemble_model(registry, model_id):
+    if registry.get(model_id).get("model_type") in FOREST_TYPES:
+        # Flattened forests return the leaf value of every tree at no extra cost
+        return registry.load_tree_ensemble(model_id)
+    return registry.load(model_id)
+
+
+class EnsemblePredictor:
+    """Concurrent evaluation of several registered models on the same readings"""
+    def __init__(self, registry, model_ids, max_workers=None, cache=None, rgb_resolution=1.0):
+        if not model_ids:
+            raise ValueError("An ensemble needs at least one model id.")
+        self.registry = registry
+        self.model_ids = list(model_ids)
+        self.color_spaces = {model_id: registry.get(model_id)["pipeline"]["color_space"] for model_id in self.model_ids}
+        self.models = {}
+        for model_id in self.model_ids:
+            self.models[model_id] = load_ensemble_model(registry, model_id)
+        # Optional prediction cache, versioned by the hashes of the loaded models
+        self.cache = cache
+        self.model_version = tuple((model_id, registry.get(model_id)["sha256"]) for model_id in self.model_ids)
+        self.steps = {color_space: feature_steps(color_space, rgb_resolution)
+                      for color_space in dict.fromkeys(self.color_spaces.values())} if cache is not None else {}
+
+        self.executor = None
+        if len(self.model_ids) > 1:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers or len(self.model_ids),
+                                               thread_name_prefix="ensemble")
+
+    # Method to predict with one model, returning its values and the spread across its trees (or None)
+    def _predict_model(self, model_id, X):
+        model = self.models[model_id]
+        if isinstance(model, TreeEnsemble):
+            return model.predict_with_std(X)
+        return np.asarray(model.predict(X), dtype=np.float64).ravel(), None
+
+    # Method to predict RGB readings with every model of the ensemble (calibration versions the cache)
+    def predict(self, rgb, calibration=None):
+        # Featurize once per color space
+        features = {}
+        for model_id, color_space in self.color_spaces.items():
+            if color_space not in features:
+                features[color_space] = self.registry.featurize(model_id, rgb)
+
+        # Single readings are looked up in the cache by their quantized features
+        key = None
+        version = (self.model_version, calibration)
+        if self.cache is not None and len(next(iter(features.values()))) == 1:
+            key = self.cache.key(features.values(), [self.steps[color_space] for color_space in features])
+            result = self.cache.get(key, version)
+            if result is not None:
+                return dict(result, features=features, cached=True)
+
+        if self.executor is None:
+            results = [self._predict_model(model_id, features[self.color_spaces[model_id]]) for model_id in self.model_ids]
+        else:
+            futures = [self.executor.submit(self._predict_model, model_id, features[self.color_spaces[model_id]])
+                       for model_id in self.model_ids]
+            results = [future.result() for future in futures]
+
+        values = np.column_stack([value for value, _ in results])
+        result = {
+            "mean": values.mean(axis=1),
+            "std": values.std(axis=1),
+            "values": dict(zip(self.model_ids, values.T)),
+            "tree_std": {model_id: tree_std for model_id, (_, tree_std) in zip(self.model_ids, results) if tree_std is not None},
+            "features": features,
+            "cached": False,
+        }
+        if key is not None:
+            self.cache.put(key, result, version)
+        return result
+
+    # Method to return a single spread figure: across models, or across trees for a single forest
+    @staticmethod
+    def spread(result):
+        if len(result["values"]) > 1:
+            return result["std"]
+        if result["tree_std"]:
+            return next(iter(result["tree_std"].values()))
+        return None
+
+    # Method to stop the worker threads
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
@@ -0,0 +1,65 @@
+import os
+import json
+import shutil
+import numpy as np
+from modules.model_registry import file_hash
+
+
+# Content-addressed feature cache.
+# The featurized arrays of a training file are stored under a key made of the
+# file's content hash, the color space and the preprocessing version, as raw
+# .npy files that are memory-mapped when loaded. A changed file gets a new
+# hash and thus a new entry, so entries never need to be invalidated; bump
+# PREPROCESSING_VERSION whenever the featurization itself changes.
+
+PREPROCESSING_VERSION = 1
+
+
+class FeatureCache:
+    """Featurized datasets cached on disk by (file hash, color space, preprocessing version)"""
+    def __init__(self, cache_dir, version=PREPROCESSING_VERSION):
+        self.cache_dir = cache_dir
+        self.version = version
+
+    # Method to get the cache key of a source file in a color space
+    def key(self, source_file, color_space_name):
+        return f"{file_hash(source_file)[:32]}_{color_space_name}_v{self.version}"
+
+    # Method to return cached arrays (memory-mapped), or None on a miss
+    def get(self, key, mmap_mode="r"):
+        entry_dir = os.path.join(self.cache_dir, key)
+        if not os.path.exists(os.path.join(entry_dir, "meta.json")):
+            return None
+        with open(os.path.join(entry_dir, "meta.json"), "r") as file:
+            names = json.load(file)["arrays"]
+        return tuple(np.load(os.path.join(entry_dir, f"{name}.npy"), mmap_mode=mmap_mode) for name in names)
+
+    # Method to store arrays under a key (written to a temporary directory, then renamed into place)
+    def put(self, key, metadata=None, **arrays):
+        entry_dir = os.path.join(self.cache_dir, key)
+        temp_dir = f"{entry_dir}.tmp{os.getpid()}"
+        os.makedirs(temp_dir, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(temp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(temp_dir, "meta.json"), "w") as file:
+            json.dump({"arrays": list(arrays), "version": self.version, "metadata": metadata or {}}, file, indent=4)
+        try:
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process stored the same entry first
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    # Method to load a featurized dataset, computing and storing it on a miss
+    def load(self, source_file, color_space_name, featurize):
+        key = self.key(source_file, color_space_name)
+        arrays = self.get(key)
+        if arrays is None:
+            X, Y = featurize(source_file, color_space_name)
+            self.put(key, {"source_file": os.path.basename(source_file), "color_space": color_space_name}, X=X, Y=Y)
+            arrays = self.get(key)
+        return arrays
+
+    # Method to remove every entry of the cache
+    def clear(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
@@ -0,0 +1,117 @@
+import os
+from modules.startup import BackgroundTask
+from modules.calibration_store import get_store, get_sensor_config
+
+
+# Hot reload of the calibration and the models.
+# Between two readings the device loop asks the reloader for the current
+# (calibration, ensemble) pair. The calibration store and the model manifest
+# are watched by their modification time and size: a new calibration is read
+# straight away (it is a few numbers), new models are loaded in a background
+# thread while the old ones keep serving readings. Both are swapped by
+# replacing one tuple, so a reading always uses one complete calibration and
+# one complete set of models.
+
+
+class FileWatcher:
+    """Detect changes of files by polling their modification time and size"""
+    def __init__(self, paths):
+        self.stamps = {path: self.stamp(path) for path in paths}
+
+    # Method to get the modification time and size of a file (None if it does not exist)
+    @staticmethod
+    def stamp(path):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    # Method to return the files that changed since the last call
+    def changed(self):
+        changed = []
+        for path, stamp in self.stamps.items():
+            new_stamp = self.stamp(path)
+            if new_stamp != stamp:
+                self.stamps[path] = new_stamp
+                changed.append(path)
+        return changed
+
+
+class HotReloader:
+    """Current calibration and models of the device loop, reloaded when their files change"""
+    def __init__(self, data_path, sensor, ensemble, load_model):
+        self.store = get_store(data_path)
+        self.sensor = sensor
+        self.load_model = load_model
+        self.model_task = None
+        self.model_pending = False
+        self.sensor_config = get_sensor_config(sensor)
+        self.state = (self.store.get(self.sensor_config), ensemble)
+        self.watcher = FileWatcher([self.store.path, ensemble.registry.manifest_path])
+
+    # Method to return the (calibration, ensemble) pair to use for the next reading
+    def current(self):
+        return self.state
+
+    # Method to get the versions shown on the LCD (e.g. "Cal v2 Mdl v3")
+    def versions(self):
+        calibration, ensemble = self.state
+        model_version = ensemble.registry.get(ensemble.model_ids[0]).get("version", 1)
+        return f"Cal v{calibration['version'] if calibration else '-'} Mdl v{model_version}"
+
+    # Method to check for changes between readings (returns the names of what was swapped)
+    def check(self):
+        swapped = []
+        calibration, ensemble = self.state
+        changed = self.watcher.changed()
+
+        # Calibration: read the whole new version first, then swap
+        sensor_config = get_sensor_config(self.sensor)
+        if self.store.path in changed or sensor_config != self.sensor_config:
+            try:
+                new_calibration = self.store.get(sensor_config)
+            except Exception as e:
+                print(f"Calibration reload error occurred: {e}. Keeping profile {calibration and calibration['profile']}.")
+            else:
+                if new_calibration is not None:
+                    self.sensor_config = sensor_config
+                    self.state = calibration, ensemble = (new_calibration, ensemble)
+                    print(f"Calibration reloaded: profile {new_calibration['profile']}, version {new_calibration['version']}")
+                    swapped.append("calibration")
+
+        # Models: load in the background, swap when loaded
+        if ensemble.registry.manifest_path in changed:
+            self.model_pending = True
+        if self.model_pending and self.model_task is None:
+            print("Model manifest changed. Loading models in the background...")
+            self.model_pending = False
+            self.model_task = BackgroundTask(self.load_model, ensemble.model_ids)
+        if self.model_task is not None and self.model_task.done():
+            try:
+                new_ensemble = self.model_task.result()
+            except Exception as e:
+                new_ensemble = None
+                print(f"Model reload error occurred: {e}")
+            seconds, self.model_task = self.model_task.seconds, None
+            if new_ensemble is None:
+                print("Keeping the current models.")
+            elif new_ensemble.model_version == ensemble.model_version:
+                new_ensemble.close()
+            else:
+                self.state = (calibration, new_ensemble)
+                ensemble.close()
+                print(f"Models reloaded in {seconds:.2f} s: {', '.join(new_ensemble.model_ids)}")
+                swapped.append("model")
+        return swapped
+
+    # Method to close the models (and models that are still loading)
+    def close(self):
+        if self.model_task is not None:
+            try:
+                new_ensemble = self.model_task.result()
+            except Exception:
+                new_ensemble = None
+            if new_ensemble is not None:
+                new_ensemble.close()
+        self.state[1].close()
@@ -0,0 +1,153 @@
+import os
+import shutil
+import numpy as np
+from datetime import datetime
+
+
+# Incremental model updates.
+# A deployed model is updated from newly labeled reference rows instead of
+# being retrained from scratch:
+#   forests           - warm start: new trees are grown on all rows and added to the forest,
+#                       the oldest trees are dropped once the forest reaches MAX_ESTIMATORS
+#   gradient boosting - warm start: new stages are fitted to the residuals of all rows,
+#                       refitted from scratch at its current size once it reaches MAX_ESTIMATORS
+#   MLP               - partial_fit on the new rows, mixed with a replay sample of older rows
+#   other models      - refitted on all rows with the same parameters (SVRs refit in milliseconds)
+# Every update is a new version of the model in the registry, and the files of
+# earlier versions are kept in models/versions/<model id>/ for rollback.
+
+VERSIONS_DIRECTORY = "versions"
+WARM_START_FRACTION = 0.1 # Trees/stages added per update, as a fraction of the current ensemble
+MAX_ESTIMATORS = 1000 # Size cap of updated ensembles (latency and memory grow with every tree)
+PARTIAL_FIT_EPOCHS = 20
+RANDOM_STATE = 2
+
+
+# Define a function to update a fitted model with new rows (X_all/Y_all hold every row, new ones included)
+def update_model(model, X_new, Y_new, X_all, Y_all, warm_start_fraction=WARM_START_FRACTION,
+                 epochs=PARTIAL_FIT_EPOCHS, random_state=RANDOM_STATE, max_estimators=MAX_ESTIMATORS):
+    # Pipelines are updated through their last step, on transformed features
+    if hasattr(model, "steps"):
+        preprocess, estimator = model[:-1], model.steps[-1][1]
+        updated, method = update_model(estimator, preprocess.transform(X_new), Y_new, preprocess.transform(X_all), Y_all,
+                                       warm_start_fraction, epochs, random_state, max_estimators)
+        model.steps[-1] = (model.steps[-1][0], updated)
+        return model, method
+
+    model_type = type(model).__name__
+    if model_type in ("RandomForestRegressor", "ExtraTreesRegressor", "GradientBoostingRegressor"):
+        n_estimators = len(model.estimators_)
+        n_added = max(1, int(n_estimators * warm_start_fraction))
+        limit = max(max_estimators, n_estimators) # A model that is already larger keeps its size
+        if model_type == "GradientBoostingRegressor" and n_estimators + n_added > limit:
+            # Each stage fits the residuals of the ones before it, so old stages cannot be dropped
+            from sklearn.base import clone
+            return clone(model).set_params(n_estimators=n_estimators).fit(X_all, Y_all), "refit"
+        model.set_params(warm_start=True, n_estimators=n_estimators + n_added)
+        if model_type == "GradientBoostingRegressor" and model.n_iter_no_change is not None:
+            # Early stopping would drop the stages of the previous fits
+            model.set_params(n_iter_no_change=None)
+        model.fit(X_all, Y_all)
+        model.set_params(warm_start=False)
+        if len(model.estimators_) > limit:
+            # Trees of a forest are independent: the new ones replace the oldest ones
+            model.estimators_ = model.estimators_[len(model.estimators_) - limit:]
+            model.set_params(n_estimators=limit)
+        return model, "warm_start"
+
+    if hasattr(model, "partial_fit"):
+        # Replay as many older rows as there are new ones, so the model does not forget them
+        rng = np.random.RandomState(random_state)
+        X_old, Y_old = X_all[:len(X_all) - len(X_new)], Y_all[:len(Y_all) - len(Y_new)]
+        for _ in range(epochs):
+            replay = rng.choice(len(X_old), size=min(len(X_old), len(X_new)), replace=False) if len(X_old) else []
+            X_epoch = np.concatenate([X_new, X_old[replay]])
+            Y_epoch = np.concatenate([Y_new, Y_old[replay]])
+            order = rng.permutation(len(X_epoch))
+            model.partial_fit(X_epoch[order], Y_epoch[order])
+        return model, "partial_fit"
+
+    from sklearn.base import clone
+    return clone(model).fit(X_all, Y_all), "refit"
+
+
+class ModelVersions:
+    """Versioned updates of registered models with rollback"""
+    def __init__(self, registry):
+        self.registry = registry
+        self.versions_dir = os.path.join(registry.models_dir, VERSIONS_DIRECTORY)
+
+    # Method to return the version history of a model (oldest first)
+    def history(self, model_id):
+        return self.registry.get(model_id).get("history", [])
+
+    # Method to return the current version number of a model (1 for a model that was never updated)
+    def version(self, model_id):
+        return self.registry.get(model_id).get("version", 1)
+
+    # Method to re-register a model file under its id, keeping the metadata of its entry
+    def _register(self, model_id, entry, **changes):
+        metadata = {key: value for key, value in entry.items() if key not in ("file", "format", "sha256", "size", "created")}
+        metadata.update(changes)
+        self.registry.register(os.path.join(self.registry.models_dir, entry["file"]), model_id=model_id, **metadata)
+
+    # Method to copy the current model file into the versions directory
+    def _snapshot(self, model_id):
+        entry = self.registry.get(model_id)
+        snapshot_dir = os.path.join(self.versions_dir, model_id)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        version = entry.get("version", 1)
+        snapshot_file = os.path.join(snapshot_dir, f"v{version:04d}_{entry['sha256'][:12]}.joblib")
+        if not os.path.exists(snapshot_file):
+            shutil.copy2(os.path.join(self.registry.models_dir, entry["file"]), snapshot_file)
+        return {
+            "version": version,
+            "sha256": entry["sha256"],
+            "file": os.path.relpath(snapshot_file, self.registry.models_dir).replace(os.sep, "/"),
+            "metadata": entry.get("update"),
+        }
+
+    # Method to save an updated model as the next version of a registered model
+    def commit(self, model_id, model, **update):
+        import joblib
+        entry = self.registry.get(model_id)
+        if entry["format"] != "joblib":
+            raise ValueError(f"Only joblib models can be updated, {model_id} is {entry['format']}.")
+        history = sorted(self.history(model_id) + [self._snapshot(model_id)], key=lambda record: record["version"])
+
+        # Write the new version next to the model file, then swap it in
+        model_file = os.path.join(self.registry.models_dir, entry["file"])
+        temp_file = f"{model_file}.tmp"
+        joblib.dump(model, temp_file)
+        os.replace(temp_file, model_file)
+
+        # Versions are never reused, also not after a rollback
+        update["updated"] = datetime.now().isoformat(timespec="seconds")
+        version = max(record["version"] for record in history) + 1
+        self._register(model_id, entry, version=version, history=history, update=update)
+        return self.version(model_id)
+
+    # Method to restore an earlier version of a model (the one before the current version by default)
+    def rollback(self, model_id, version=None):
+        entry = self.registry.get(model_id)
+        history = self.history(model_id)
+        if version is None:
+            version = max((record["version"] for record in history if record["version"] < entry.get("version", 1)), default=None)
+            if version is None:
+                raise ValueError(f"{model_id} has no version before version {entry.get('version', 1)}.")
+        matches = [i for i, record in enumerate(history) if record["version"] == version]
+        if not matches:
+            raise ValueError(f"{model_id} has no version {version}. Versions: {[record['version'] for record in history]}")
+        record = history[matches[0]]
+
+        # Keep the current version, so a rollback can be undone
+        current = self._snapshot(model_id)
+        history = history[:matches[0]] + [current] + history[matches[0] + 1:]
+        history.sort(key=lambda item: item["version"])
+
+        model_file = os.path.join(self.registry.models_dir, entry["file"])
+        temp_file = f"{model_file}.tmp"
+        shutil.copy2(os.path.join(self.registry.models_dir, record["file"]), temp_file)
+        os.replace(temp_file, model_file)
+        self._register(model_id, entry, version=record["version"], history=history, update=record["metadata"])
+        return record["version"]
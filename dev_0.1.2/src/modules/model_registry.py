@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import glob
+import shutil
+import hashlib
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from modules.color_space import FEATURE_NAMES, convert_color_space
+from modules.tree_ensemble import TreeEnsemble, export_tree_ensemble, save_tree_arrays, load_tree_arrays
+
+
+# Model registry.
+# data/models/manifest.json records, for every model, its file, content
+# hash, model type, the feature pipeline it expects (input and color space)
+# and where it came from (dataset, calibration). Models are looked up by id
+# instead of by building file names and kept in an in-process LRU cache so
+# switching between models does not reload them. joblib memory-maps plain
+# NumPy arrays (e.g. SVR support vectors), but sklearn copies the node arrays
+# of every tree when a forest is unpickled; tree ensembles are therefore
+# flattened once into .npy files under data/models/arrays and memory-mapped
+# read-only from there, so every process on the device shares the same pages.
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+MODEL_NAMES = ["random_forest", "gradient_boosting", "svm", "mlp", "neural_network"]
+ARRAYS_DIRECTORY = "arrays"
+TREE_TYPES = ("RandomForestRegressor", "ExtraTreesRegressor", "GradientBoostingRegressor")
+
+
+# Define a function to compute the SHA-256 hash of a file
+def file_hash(path, chunk_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+# Define a function to split a model id (e.g. "random_forest_hsl") into model name and color space
+def parse_model_id(model_id):
+    base_id = model_id.split(":")[0]
+    for model_name in MODEL_NAMES:
+        if base_id.startswith(f"{model_name}_"):
+            color_space = base_id[len(model_name) + 1:].split("_")[0]
+            dataset = base_id[len(model_name) + len(color_space) + 2:] or None
+            return model_name, color_space, dataset
+    parts = base_id.split("_")
+    return "_".join(parts[:-1]), parts[-1], None
+
+
+class ModelRegistry:
+    """Manifest of trained models with metadata, checksums and cached loading"""
+    def __init__(self, models_dir, manifest_file=MANIFEST_FILE, cache_size=4):
+        self.models_dir = models_dir
+        self.manifest_path = os.path.join(models_dir, manifest_file)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.manifest = self.load_manifest()
+
+    # Method to read the manifest (an empty one if the file does not exist)
+    def load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {"version": MANIFEST_VERSION, "models": {}}
+        with open(self.manifest_path, "r") as file:
+            manifest = json.load(file)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version {manifest.get('version')} in: {self.manifest_path}")
+        return manifest
+
+    # Method to write the manifest atomically
+    def save_manifest(self):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, "w") as file:
+            json.dump(self.manifest, file, indent=4, sort_keys=True)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.manifest_path)
+
+    # Method to list registered model ids
+    def model_ids(self):
+        return sorted(self.manifest["models"])
+
+    # Method to return the manifest entry of a model
+    def get(self, model_id):
+        if model_id not in self.manifest["models"]:
+            raise KeyError(f"Model {model_id} is not registered in: {self.manifest_path}")
+        return self.manifest["models"][model_id]
+
+    # Method to find a model id by model name, color space and (optionally) dataset
+    def find(self, model_name, color_space, dataset=None, model_format="joblib"):
+        matches = [
+            model_id for model_id, entry in self.manifest["models"].items()
+            if entry["model_name"] == model_name and entry["pipeline"]["color_space"] == color_space
+            and (dataset is None or entry.get("dataset") == dataset) and entry["format"] == model_format
+        ]
+        if not matches:
+            raise KeyError(f"No {model_format} model {model_name} for color space {color_space}"
+                           f"{f' and dataset {dataset}' if dataset else ''} is registered.")
+        # Prefer the most recently registered model
+        return max(matches, key=lambda model_id: self.manifest["models"][model_id]["created"])
+
+    # Method to add or update a model in the manifest
+    def register(self, model_file, model_id=None, model_name=None, color_space=None, dataset=None,
+                 calibration=None, model_type=None, n_features=None, save=True, **metadata):
+        path = model_file if os.path.isabs(model_file) else os.path.join(self.models_dir, model_file)
+        relative_path = os.path.relpath(path, self.models_dir).replace(os.sep, "/")
+        model_format = "npz" if path.endswith(".npz") else "joblib"
+        if model_id is None:
+            model_id = os.path.splitext(os.path.basename(path))[0]
+            if model_format == "npz":
+                model_id = f"{model_id}:compiled"
+        parsed_name, parsed_color_space, parsed_dataset = parse_model_id(model_id)
+        color_space = (color_space or parsed_color_space).lower()
+
+        entry = {
+            "file": relative_path,
+            "format": model_format,
+            "sha256": file_hash(path),
+            "size": os.path.getsize(path),
+            "model_name": model_name or parsed_name,
+            "model_type": model_type,
+            "n_features": n_features,
+            "pipeline": {
+                "input": "rgb",
+                "color_space": color_space,
+                "features": FEATURE_NAMES.get(color_space),
+            },
+            "dataset": dataset or parsed_dataset,
+            "calibration": calibration,
+            "created": datetime.fromtimestamp(os.path.getmtime(path)).isoformat(timespec="seconds"),
+        }
+        entry.update(metadata)
+        with self.lock:
+            self.manifest["models"][model_id] = entry
+            for key in [key for key in self.cache if key[0] == model_id]:
+                del self.cache[key]
+        if save:
+            self.save_manifest()
+        return model_id
+
+    # Method to update metadata fields of a registered model (e.g. its dataset or calibration)
+    def update(self, model_id, save=True, **fields):
+        with self.lock:
+            self.get(model_id).update(fields)
+        if save:
+            self.save_manifest()
+
+    # Method to register every model file in the models directory that is not in the manifest yet
+    def scan(self, inspect=True):
+        registered_files = {entry["file"] for entry in self.manifest["models"].values()}
+        model_files = sorted(glob.glob(os.path.join(self.models_dir, "*.joblib")))
+        model_files += sorted(glob.glob(os.path.join(self.models_dir, "compiled", "*.npz")))
+
+        new_ids = []
+        for path in model_files:
+            relative_path = os.path.relpath(path, self.models_dir).replace(os.sep, "/")
+            if relative_path in registered_files:
+                continue
+            model_type, n_features = None, None
+            if inspect:
+                # Loading the model records its type and number of input features
+                model = self._load_file(path, None)
+                model_type = type(model).__name__
+                n_features = getattr(model, "n_features_in_", getattr(model, "n_features", None))
+                n_features = int(n_features) if n_features is not None else None
+            new_ids.append(self.register(path, model_type=model_type, n_features=n_features, save=False))
+        if new_ids:
+            self.save_manifest()
+        return new_ids
+
+    # Method to check a model file against its recorded hash
+    def verify(self, model_id):
+        entry = self.get(model_id)
+        path = os.path.join(self.models_dir, entry["file"])
+        return os.path.exists(path) and file_hash(path) == entry["sha256"]
+
+    # Method to load a model file (.joblib with its NumPy arrays memory-mapped, .npz with the NumPy runtimes)
+    @staticmethod
+    def _load_file(path, mmap_mode):
+        if path.endswith(".npz"):
+            from modules.compiled_model import load_compiled_model
+            return load_compiled_model(path)
+        import joblib
+        return joblib.load(path, mmap_mode=mmap_mode)
+
+    # Method to get a model from the LRU cache (None on a miss)
+    def _cache_get(self, key):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+        return None
+
+    # Method to put a model into the LRU cache
+    def _cache_put(self, key, model):
+        with self.lock:
+            self.cache[key] = model
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    # Method to load a model, served from the LRU cache when possible
+    def load(self, model_id, mmap_mode="r", verify=False):
+        entry = self.get(model_id)
+        key = (model_id, entry["sha256"])
+        model = self._cache_get(key)
+        if model is not None:
+            return model
+
+        if verify and not self.verify(model_id):
+            raise ValueError(f"Model file of {model_id} does not match its recorded hash.")
+        path = os.path.join(self.models_dir, entry["file"])
+        model = self._load_file(path, mmap_mode)
+        self._cache_put(key, model)
+        return model
+
+    # Method to check whether a model is a tree ensemble that can be loaded as flattened node arrays
+    def is_tree_ensemble(self, model_id):
+        entry = self.get(model_id)
+        return entry["format"] == "joblib" and entry.get("model_type") in TREE_TYPES
+
+    # Method to get the directory of the flattened node arrays of a model (one per model file hash)
+    def arrays_path(self, model_id):
+        return os.path.join(self.models_dir, ARRAYS_DIRECTORY, f"{model_id}_{self.get(model_id)['sha256'][:16]}")
+
+    # Method to load a tree ensemble as a TreeEnsemble over memory-mapped node arrays (only the flattened form is cached)
+    def load_tree_ensemble(self, model_id, verify=False):
+        if not self.is_tree_ensemble(model_id):
+            return self.load(model_id, verify=verify)
+        entry = self.get(model_id)
+        key = (model_id, entry["sha256"], "arrays")
+        model = self._cache_get(key)
+        if model is not None:
+            return model
+
+        directory = self.arrays_path(model_id)
+        if not os.path.isdir(directory):
+            if verify and not self.verify(model_id):
+                raise ValueError(f"Model file of {model_id} does not match its recorded hash.")
+            # The sklearn model is only loaded to flatten it once, and is not kept
+            forest = self._load_file(os.path.join(self.models_dir, entry["file"]), None)
+            save_tree_arrays(export_tree_ensemble(forest), directory)
+            del forest
+            # Remove the arrays of earlier versions of the model
+            for path in glob.glob(f"{directory[:-16]}*"):
+                if path != directory and re.fullmatch(re.escape(directory[:-16]) + r"[0-9a-f]{16}", path):
+                    shutil.rmtree(path, ignore_errors=True)
+        model = TreeEnsemble(load_tree_arrays(directory))
+        self._cache_put(key, model)
+        return model
+
+    # Method to convert RGB values into the features a model expects
+    def featurize(self, model_id, rgb):
+        return convert_color_space(rgb, self.get(model_id)["pipeline"]["color_space"])
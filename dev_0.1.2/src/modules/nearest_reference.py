@@ -0,0 +1,157 @@
+import csv
+import numpy as np
+from scipy.spatial import cKDTree
+from modules.color_space import rgb_to_lab
+
+
+# Define a function to compute CIE76 color difference (Euclidean distance in CIELAB)
+def delta_e_cie76(lab1, lab2):
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    return np.sqrt(np.sum((lab1 - lab2) ** 2, axis=-1))
+
+# Define a function to compute CIEDE2000 color difference (vectorized, broadcasting)
+def delta_e_ciede2000(lab1, lab2, kL=1.0, kC=1.0, kH=1.0):
+    lab1 = np.asarray(lab1, dtype=np.float64)
+    lab2 = np.asarray(lab2, dtype=np.float64)
+    L1, a1, b1 = lab1[..., 0], lab1[..., 1], lab1[..., 2]
+    L2, a2, b2 = lab2[..., 0], lab2[..., 1], lab2[..., 2]
+
+    # Chroma adjustment of a*
+    C1 = np.hypot(a1, b1)
+    C2 = np.hypot(a2, b2)
+    C_bar7 = ((C1 + C2) / 2) ** 7
+    G = 0.5 * (1 - np.sqrt(C_bar7 / (C_bar7 + 25.0 ** 7)))
+    a1p = (1 + G) * a1
+    a2p = (1 + G) * a2
+    C1p = np.hypot(a1p, b1)
+    C2p = np.hypot(a2p, b2)
+    h1p = np.degrees(np.arctan2(b1, a1p)) % 360
+    h2p = np.degrees(np.arctan2(b2, a2p)) % 360
+
+    # Differences in lightness, chroma and hue
+    dLp = L2 - L1
+    dCp = C2p - C1p
+    dhp = h2p - h1p
+    dhp = np.where(dhp > 180, dhp - 360, dhp)
+    dhp = np.where(dhp < -180, dhp + 360, dhp)
+    dhp = np.where(C1p * C2p == 0, 0.0, dhp)
+    dHp = 2 * np.sqrt(C1p * C2p) * np.sin(np.radians(dhp / 2))
+
+    # Mean values
+    Lp_bar = (L1 + L2) / 2
+    Cp_bar = (C1p + C2p) / 2
+    hp_sum = h1p + h2p
+    hp_bar = np.where(np.abs(h1p - h2p) > 180, (hp_sum + 360) / 2, hp_sum / 2)
+    hp_bar = np.where(hp_bar >= 360, hp_bar - 360, hp_bar)
+    hp_bar = np.where(C1p * C2p == 0, hp_sum, hp_bar)
+
+    # Weighting functions
+    T = (1 - 0.17 * np.cos(np.radians(hp_bar - 30))
+         + 0.24 * np.cos(np.radians(2 * hp_bar))
+         + 0.32 * np.cos(np.radians(3 * hp_bar + 6))
+         - 0.20 * np.cos(np.radians(4 * hp_bar - 63)))
+    d_theta = 30 * np.exp(-(((hp_bar - 275) / 25) ** 2))
+    Cp_bar7 = Cp_bar ** 7
+    R_C = 2 * np.sqrt(Cp_bar7 / (Cp_bar7 + 25.0 ** 7))
+    S_L = 1 + (0.015 * (Lp_bar - 50) ** 2) / np.sqrt(20 + (Lp_bar - 50) ** 2)
+    S_C = 1 + 0.045 * Cp_bar
+    S_H = 1 + 0.015 * Cp_bar * T
+    R_T = -np.sin(np.radians(2 * d_theta)) * R_C
+
+    dL = dLp / (kL * S_L)
+    dC = dCp / (kC * S_C)
+    dH = dHp / (kH * S_H)
+    return np.sqrt(dL ** 2 + dC ** 2 + dH ** 2 + R_T * dC * dH)
+
+
+DELTA_E_FUNCTIONS = {
+    "cie76": delta_e_cie76,
+    "ciede2000": delta_e_ciede2000,
+}
+
+
+class NearestReference:
+    """k-nearest-neighbour predictor over reference colors in CIELAB"""
+    def __init__(self, k=4, delta_e="cie76", candidates=3, power=1.0, leafsize=16):
+        if delta_e not in DELTA_E_FUNCTIONS:
+            raise ValueError(f"Delta-E formula {delta_e} is not available. Please select among {list(DELTA_E_FUNCTIONS)}.")
+        self.k = k                      # number of neighbours used for interpolation
+        self.delta_e = delta_e          # color difference formula used for weighting
+        self.candidates = candidates    # CIEDE2000 re-ranks k * candidates KD-tree neighbours
+        self.power = power              # inverse-distance weighting exponent
+        self.leafsize = leafsize
+        self.lab = None
+        self.labels = None
+        self.tree = None
+
+    # Method to build the KD-tree over reference colors
+    def fit(self, rgb, labels):
+        self.lab = rgb_to_lab(np.asarray(rgb, dtype=np.float64).reshape(-1, 3))
+        self.labels = np.asarray(labels, dtype=np.float64).ravel()
+        if len(self.lab) != len(self.labels):
+            raise ValueError("Number of reference colors and labels do not match.")
+        self.tree = cKDTree(self.lab, leafsize=self.leafsize)
+        return self
+
+    # Method to find the k nearest references of CIELAB colors and their Delta-E
+    def kneighbors(self, lab):
+        lab = np.asarray(lab, dtype=np.float64).reshape(-1, 3)
+        k = min(self.k, len(self.labels))
+
+        if self.delta_e == "cie76":
+            # Euclidean distance in CIELAB is exactly CIE76
+            distances, indices = self.tree.query(lab, k=k)
+        else:
+            # KD-tree preselects candidates, CIEDE2000 re-ranks them
+            n_candidates = min(k * self.candidates, len(self.labels))
+            _, indices = self.tree.query(lab, k=n_candidates)
+            indices = indices.reshape(len(lab), -1)
+            distances = delta_e_ciede2000(lab[:, None, :], self.lab[indices])
+            order = np.argsort(distances, axis=1)[:, :k]
+            distances = np.take_along_axis(distances, order, axis=1)
+            indices = np.take_along_axis(indices, order, axis=1)
+
+        return distances.reshape(len(lab), -1), indices.reshape(len(lab), -1)
+
+    # Method to predict labels of RGB colors by Delta-E weighted interpolation
+    def predict(self, rgb):
+        if self.tree is None:
+            raise Exception("NearestReference is not fitted. Call fit() or load() first.")
+        lab = rgb_to_lab(np.asarray(rgb, dtype=np.float64).reshape(-1, 3))
+        distances, indices = self.kneighbors(lab)
+
+        # Exact matches take the reference label, others are weighted by 1 / Delta-E
+        exact = distances < 1e-9
+        with np.errstate(divide="ignore"):
+            weights = np.where(exact, 1.0, 1.0 / distances ** self.power)
+        weights = np.where(exact.any(axis=1, keepdims=True), exact.astype(np.float64), weights)
+        return np.sum(weights * self.labels[indices], axis=1) / np.sum(weights, axis=1)
+
+    # Method to build the predictor from a reference .csv file (Red, Green, Blue, Label)
+    @classmethod
+    def from_csv(cls, reference_file, label_column="Label", **kwargs):
+        rgb = []
+        labels = []
+        with open(reference_file, "r", newline="") as file:
+            for row in csv.DictReader(file):
+                rgb.append([float(row["Red"]), float(row["Green"]), float(row["Blue"])])
+                labels.append(float(row[label_column]))
+        return cls(**kwargs).fit(rgb, labels)
+
+    # Method to save the reference table and parameters to a .npz file
+    def save(self, path):
+        np.savez(path, lab=self.lab, labels=self.labels, k=self.k, delta_e=self.delta_e,
+                 candidates=self.candidates, power=self.power, leafsize=self.leafsize)
+        print(f"Nearest reference model saved at: {path}")
+
+    # Method to load the reference table and parameters from a .npz file
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            predictor = cls(k=int(data["k"]), delta_e=str(data["delta_e"]), candidates=int(data["candidates"]),
+                            power=float(data["power"]), leafsize=int(data["leafsize"]))
+            predictor.lab = data["lab"]
+            predictor.labels = data["labels"]
+        predictor.tree = cKDTree(predictor.lab, leafsize=predictor.leafsize)
+        return predictor
@@ -0,0 +1,133 @@
+import numpy as np
+
+
+# MLP regressors exported to plain NumPy arrays.
+# The export stores the weights and biases of every layer, the hidden and
+# output activations, and the parameters of an optional input scaler (when
+# the model is a Pipeline of a scaler and an MLPRegressor). The runtime only
+# needs NumPy, so the device does not have to import sklearn to predict.
+
+FORMAT_NAME = "mlp"
+
+
+# Hidden and output activations of sklearn's MLPRegressor, applied in place
+def _identity(X):
+    return X
+
+def _logistic(X):
+    np.negative(X, out=X)
+    np.exp(X, out=X)
+    X += 1
+    np.reciprocal(X, out=X)
+    return X
+
+def _tanh(X):
+    return np.tanh(X, out=X)
+
+def _relu(X):
+    return np.maximum(X, 0, out=X)
+
+
+ACTIVATIONS = {
+    "identity": _identity,
+    "logistic": _logistic,
+    "tanh": _tanh,
+    "relu": _relu,
+}
+
+
+# Define a function to export the parameters of a fitted MLPRegressor (optionally in a Pipeline)
+def export_mlp(model):
+    scaler = None
+    if hasattr(model, "steps"):
+        if len(model.steps) > 2:
+            raise ValueError("Only pipelines of one scaler and an MLPRegressor can be exported.")
+        if len(model.steps) == 2:
+            scaler = model.steps[0][1]
+        model = model.steps[-1][1]
+
+    if type(model).__name__ != "MLPRegressor":
+        raise ValueError(f"Model type {type(model).__name__} is not an MLPRegressor.")
+
+    arrays = {
+        "format": FORMAT_NAME,
+        "activation": model.activation,
+        "out_activation": model.out_activation_,
+        "n_layers": len(model.coefs_),
+        "n_features": int(model.n_features_in_),
+        "scaler": "none",
+    }
+    for i, (coef, intercept) in enumerate(zip(model.coefs_, model.intercepts_)):
+        arrays[f"coef_{i}"] = coef
+        arrays[f"intercept_{i}"] = intercept
+
+    # Scaler parameters
+    scaler_type = type(scaler).__name__ if scaler is not None else None
+    if scaler_type == "StandardScaler":
+        arrays["scaler"] = "standard"
+        arrays["scaler_mean"] = scaler.mean_ if scaler.with_mean else np.zeros(model.n_features_in_)
+        arrays["scaler_scale"] = scaler.scale_ if scaler.with_std else np.ones(model.n_features_in_)
+    elif scaler_type == "MinMaxScaler":
+        arrays["scaler"] = "minmax"
+        arrays["scaler_scale"] = scaler.scale_
+        arrays["scaler_min"] = scaler.min_
+    elif scaler is not None:
+        raise ValueError(f"Scaler type {scaler_type} cannot be exported.")
+
+    return arrays
+
+# Define a function to save an exported MLP to a .npz file
+def save_mlp(model, path):
+    np.savez(path, **export_mlp(model))
+    print(f"MLP exported to: {path}")
+
+
+class NumpyMLP:
+    """Forward pass of an exported MLPRegressor with NumPy only"""
+    def __init__(self, arrays):
+        if str(arrays["format"]) != FORMAT_NAME:
+            raise ValueError(f"Arrays are not in the {FORMAT_NAME} format.")
+        self.activation = str(arrays["activation"])
+        self.out_activation = str(arrays["out_activation"])
+        self.n_features = int(arrays["n_features"])
+        n_layers = int(arrays["n_layers"])
+        self.coefs = [np.asarray(arrays[f"coef_{i}"]) for i in range(n_layers)]
+        self.intercepts = [np.asarray(arrays[f"intercept_{i}"]) for i in range(n_layers)]
+
+        self.scaler = str(arrays["scaler"])
+        if self.scaler == "standard":
+            self.scaler_mean = np.asarray(arrays["scaler_mean"])
+            self.scaler_scale = np.asarray(arrays["scaler_scale"])
+        elif self.scaler == "minmax":
+            self.scaler_scale = np.asarray(arrays["scaler_scale"])
+            self.scaler_min = np.asarray(arrays["scaler_min"])
+
+    # Method to load an exported MLP from a .npz file
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    # Method to apply the input scaler
+    def transform(self, X):
+        if self.scaler == "standard":
+            return (X - self.scaler_mean) / self.scaler_scale
+        if self.scaler == "minmax":
+            return X * self.scaler_scale + self.scaler_min
+        return X
+
+    # Method to predict values of a batch of inputs, shape (n_samples, n_features)
+    def predict(self, X):
+        activation = self.transform(np.asarray(X, dtype=np.float64).reshape(-1, self.n_features))
+        hidden_activation = ACTIVATIONS[self.activation]
+
+        for i, (coef, intercept) in enumerate(zip(self.coefs, self.intercepts)):
+            activation = activation @ coef
+            activation += intercept
+            if i != len(self.coefs) - 1:
+                hidden_activation(activation)
+        ACTIVATIONS[self.out_activation](activation)
+
+        if activation.shape[1] == 1:
+            return activation.ravel()
+        return activation
@@ -0,0 +1,85 @@
+import threading
+import numpy as np
+from collections import OrderedDict
+from modules.color_space import convert_color_space
+
+
+# Prediction cache.
+# In monitoring mode the same strip is read again and again, and its features
+# only move within the sensor noise. Feature vectors are quantized to a step
+# that corresponds to the sensor resolution in RGB units, and the quantized
+# vector is used as the key of a bounded LRU cache. Every lookup carries a
+# version (model hashes, calibration); a new version clears the cache.
+
+
+# Define a function to get the quantization step of each feature for a resolution in RGB units
+def feature_steps(color_space_name, rgb_resolution=1.0, steps=16):
+    # The span of each feature over the RGB cube, spread over the 255 sensor levels
+    axis = np.linspace(0, 255, steps)
+    rgb = np.array(np.meshgrid(axis, axis, axis, indexing="ij")).reshape(3, -1).T
+    features = convert_color_space(rgb, color_space_name)
+    return (features.max(axis=0) - features.min(axis=0)) / 255.0 * rgb_resolution
+
+
+class PredictionCache:
+    """Bounded LRU cache of predictions keyed by quantized feature vectors"""
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.lock = threading.Lock()
+
+    # Method to build a cache key from feature vectors and their quantization steps
+    @staticmethod
+    def key(features, steps):
+        return tuple(
+            tuple(np.round(np.asarray(X, dtype=np.float64).ravel() / step).astype(np.int64).tolist())
+            for X, step in zip(features, steps)
+        )
+
+    # Method to clear the cache when the version (model or calibration) has changed
+    def _check_version(self, version):
+        if version != self.version:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    # Method to return a cached prediction (None on a miss)
+    def get(self, key, version=None):
+        with self.lock:
+            self._check_version(version)
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return None
+
+    # Method to store a prediction
+    def put(self, key, value, version=None):
+        with self.lock:
+            self._check_version(version)
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    # Method to empty the cache
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    # Method to return the hit/miss statistics
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+        }
@@ -0,0 +1,91 @@
+import os
+import json
+import numpy as np
+
+
+# Prediction surfaces: a model evaluated once over a dense regular grid of
+# its input space. The grid values are stored as a raw .npy array that is
+# memory-mapped at runtime, with a .json file holding the grid bounds and
+# the model metadata. Predictions are answered by multilinear interpolation
+# between the 2^d grid points around each input, so their cost does not
+# depend on the model that produced the surface.
+
+FORMAT_NAME = "prediction_surface"
+
+
+# Define a function to evaluate a model over a regular grid
+def build_surface(predict, lower, upper, resolution, batch_size=65536, dtype=np.float32):
+    lower = np.asarray(lower, dtype=np.float64)
+    upper = np.asarray(upper, dtype=np.float64)
+    n_features = len(lower)
+    shape = (resolution,) * n_features if np.isscalar(resolution) else tuple(int(n) for n in resolution)
+    axes = [np.linspace(lo, hi, n) for lo, hi, n in zip(lower, upper, shape)]
+
+    # Evaluate the grid in batches to bound memory use
+    values = np.empty(int(np.prod(shape)), dtype=dtype)
+    for start in range(0, len(values), batch_size):
+        index = np.unravel_index(np.arange(start, min(start + batch_size, len(values))), shape)
+        X = np.column_stack([axis[i] for axis, i in zip(axes, index)])
+        values[start:start + len(X)] = predict(X)
+
+    return values.reshape(shape), lower, upper
+
+# Define a function to save a prediction surface (.npy grid and .json metadata)
+def save_surface(path, values, lower, upper, metadata=None):
+    base_path = os.path.splitext(path)[0]
+    np.save(f"{base_path}.npy", values)
+    header = {
+        "format": FORMAT_NAME,
+        "shape": list(values.shape),
+        "dtype": str(values.dtype),
+        "lower": [float(v) for v in lower],
+        "upper": [float(v) for v in upper],
+        "metadata": metadata or {},
+    }
+    with open(f"{base_path}.json", "w") as file:
+        json.dump(header, file, indent=4)
+    print(f"Prediction surface saved at: {base_path}.npy")
+
+
+class PredictionSurface:
+    """Multilinear interpolation over a precomputed prediction grid"""
+    def __init__(self, values, lower, upper, metadata=None):
+        self.values = values
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.metadata = metadata or {}
+        self.shape = np.array(values.shape)
+        self.n_features = values.ndim
+        self.step = (self.upper - self.lower) / (self.shape - 1)
+        self.flat_values = values.reshape(-1)
+        self.strides = np.array([int(np.prod(values.shape[i + 1:])) for i in range(self.n_features)])
+
+        # Offsets of the 2^d corners of a grid cell in the flattened grid
+        corners = np.array(np.meshgrid(*[[0, 1]] * self.n_features, indexing="ij")).reshape(self.n_features, -1).T
+        self.corners = corners
+        self.corner_offsets = corners @ self.strides
+
+    # Method to load a prediction surface, memory-mapping the grid values
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        base_path = os.path.splitext(path)[0]
+        with open(f"{base_path}.json", "r") as file:
+            header = json.load(file)
+        if header.get("format") != FORMAT_NAME:
+            raise ValueError(f"{base_path}.json is not a prediction surface.")
+        values = np.load(f"{base_path}.npy", mmap_mode=mmap_mode)
+        return cls(values, header["lower"], header["upper"], header["metadata"])
+
+    # Method to predict values by multilinear interpolation (inputs are clipped to the grid)
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        position = (np.clip(X, self.lower, self.upper) - self.lower) / self.step
+
+        # Lower corner of the enclosing cell and the position inside it
+        cell = np.minimum(np.floor(position).astype(np.int64), self.shape - 2)
+        fraction = position - cell
+
+        # Weight of each corner is the product of per-axis weights
+        weights = np.where(self.corners[None, :, :] == 1, fraction[:, None, :], 1 - fraction[:, None, :]).prod(axis=2)
+        values = self.flat_values[(cell @ self.strides)[:, None] + self.corner_offsets[None, :]]
+        return np.sum(weights * values, axis=1)
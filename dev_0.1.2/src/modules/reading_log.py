@@ -0,0 +1,157 @@
+import os
+import time
+import numpy as np
+
+
+# Memory-mapped ring buffer of readings.
+# The log is a fixed-size file: a small header followed by `capacity` fixed-size
+# records. The writer (main.py) overwrites the oldest record once the file is
+# full, so the file never grows, and it continues from where it stopped after a
+# restart. Other processes map the same file read-only and can tail it at any
+# time without locks. Every record carries its sequence number twice, as a
+# seqlock: the writer sets `seq` before the data and `commit` after it, and the
+# reader reads `commit` before copying the record and `seq` again after it. A
+# record that was being written or overwritten while it was copied has a
+# different `seq` afterwards, and is skipped. There must be only one writer.
+
+MAGIC = b"RDGLOG01"
+LOG_VERSION = 1
+HEADER_SIZE = 64
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("capacity", "<u4"),
+    ("record_size", "<u4"),
+    ("reserved", "<u4"),
+    ("write_seq", "<u8"), # Number of records ever written
+    ("created", "<f8"),
+])
+
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"), # Sequence number + 1, written before the data (0: empty)
+    ("timestamp", "<f8"), # Unix time of the reading
+    ("red", "<f8"),
+    ("green", "<f8"),
+    ("blue", "<f8"),
+    ("value", "<f8"), # Predicted value
+    ("spread", "<f8"), # Spread across models or trees (NaN if not available)
+    ("cached", "<u8"), # 1 if the prediction came from the prediction cache
+    ("commit", "<u8"), # Sequence number + 1, written after the data
+])
+
+# Fields returned to readers
+FIELDS = ["timestamp", "red", "green", "blue", "value", "spread", "cached"]
+
+
+class ReadingLog:
+    """Fixed-size, memory-mapped ring buffer of timestamped readings and predictions"""
+    def __init__(self, path, capacity=None, writable=False, flush_every=16):
+        self.path = path
+        self.writable = writable
+        self.flush_every = flush_every
+        self.unflushed = 0
+
+        if writable and not os.path.exists(path):
+            self._create(path, capacity or 100_000)
+        mode = "r+" if writable else "r"
+        self.header = np.memmap(path, dtype=HEADER_DTYPE, mode=mode, offset=0, shape=(1,))
+        if bytes(self.header["magic"][0]) != MAGIC or int(self.header["record_size"][0]) != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} is not a reading log (version {LOG_VERSION}).")
+        self.capacity = int(self.header["capacity"][0])
+        if writable and capacity is not None and capacity != self.capacity:
+            print(f"Reading log at {os.path.abspath(path)} keeps its capacity of {self.capacity} records (requested: {capacity}).")
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode=mode, offset=HEADER_SIZE, shape=(self.capacity,))
+
+    # Method to create an empty log file of a fixed size
+    @staticmethod
+    def _create(path, capacity):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as file:
+            file.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        header = np.memmap(temp_path, dtype=HEADER_DTYPE, mode="r+", offset=0, shape=(1,))
+        header[0] = (MAGIC, LOG_VERSION, capacity, RECORD_DTYPE.itemsize, 0, 0, time.time())
+        header.flush()
+        del header
+        os.replace(temp_path, path)
+
+    # Method to open the log of a monitoring process for writing (created if it does not exist)
+    @classmethod
+    def open_writer(cls, path, capacity=100_000, flush_every=16):
+        return cls(path, capacity=capacity, writable=True, flush_every=flush_every)
+
+    # Method to get the number of records ever written
+    @property
+    def write_seq(self):
+        return int(self.header["write_seq"][0])
+
+    # Method to append a reading
+    def append(self, rgb, value, spread=None, cached=False, timestamp=None):
+        seq = self.write_seq
+        record = self.records[seq % self.capacity:seq % self.capacity + 1]
+        record["seq"] = seq + 1 # Readers skip the record from here on
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        record["red"], record["green"], record["blue"] = rgb
+        record["value"] = value
+        record["spread"] = np.nan if spread is None else spread
+        record["cached"] = int(bool(cached))
+        record["commit"] = seq + 1 # The record is valid again
+        self.header["write_seq"] = seq + 1
+
+        # The data is visible to readers straight away, flushing only bounds the loss on a power cut
+        self.unflushed += 1
+        if self.unflushed >= self.flush_every:
+            self.flush()
+        return seq
+
+    # Method to write the mapped pages to disk
+    def flush(self):
+        if self.writable:
+            self.records.flush()
+            self.header.flush()
+        self.unflushed = 0
+
+    # Method to read the records from a sequence number on (returns the records and the next sequence number to read)
+    def read(self, since=0, limit=None):
+        head = self.write_seq
+        start = max(since, head - self.capacity)
+        if limit is not None:
+            start = max(start, head - limit)
+        if start >= head:
+            return np.empty(0, dtype=RECORD_DTYPE), head
+
+        sequence = np.arange(start, head, dtype=np.uint64)
+        slots = sequence % self.capacity
+        commit = self.records["commit"][slots] # Read before the data: the record was complete
+        records = self.records[slots].copy()
+        seq = self.records["seq"][slots] # Read again after the data: no writer started on the record meanwhile
+
+        # Keep the records that were complete and not overwritten while they were copied
+        expected = sequence + 1
+        valid = (commit == expected) & (seq == expected) & (records["seq"] == expected) & (records["commit"] == expected)
+        return records[valid], head
+
+    # Method to read the last records as a DataFrame
+    def to_dataframe(self, since=0, limit=None):
+        import pandas as pd
+        records, _ = self.read(since, limit)
+        dataframe = pd.DataFrame({field: records[field] for field in FIELDS})
+        dataframe.insert(0, "seq", records["seq"].astype(np.int64) - 1)
+        dataframe["timestamp"] = pd.to_datetime(dataframe["timestamp"], unit="s")
+        return dataframe
+
+    # Method to follow the log, yielding new records as they are written
+    def follow(self, since=None, poll_seconds=0.5):
+        next_seq = self.write_seq if since is None else since
+        while True:
+            records, next_seq = self.read(next_seq)
+            if len(records):
+                yield records
+            else:
+                time.sleep(poll_seconds)
+
+    # Method to close the log
+    def close(self):
+        self.flush()
+        self.header = self.records = None # The file is unmapped when the arrays are released
@@ -0,0 +1,115 @@
+import os
+import json
+from datetime import datetime
+import numpy as np
+
+
+# Columnar session storage.
+# Sessions are stored as Parquet files with one fixed, typed schema for every
+# script (reference, prediction and test data), and with their provenance
+# (calibration, sensor settings, model id, timestamps) embedded in the file
+# metadata. Reads can be limited to the columns that are needed, which is
+# all that training and analysis use. pyarrow is an optional dependency and
+# is only imported when sessions are written or read.
+
+SCHEMA_VERSION = 1
+METADATA_KEY = b"color_sensor.session"
+
+# Columns of a session, in file order, with their types
+SESSION_COLUMNS = {
+    "Label_Name": "string",
+    "Label": "float64",
+    "Well_Row": "string",
+    "Red_Frequency": "float64",
+    "Green_Frequency": "float64",
+    "Blue_Frequency": "float64",
+    "Clear_Frequency": "float64",
+    "Normalized_RGB_Mean": "float64",
+    "Normalization_Factor": "float64",
+    "Red": "float64",
+    "Green": "float64",
+    "Blue": "float64",
+    "Predicted_Label": "float64",
+}
+
+# Column names used by older files for the same data
+COLUMN_ALIASES = {
+    "Row": "Well_Row",
+    "concentration (mg/mL)": "Label",
+}
+
+
+# Define a function to import pyarrow (optional dependency)
+def _import_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Session storage requires pyarrow. Install it with: pip install pyarrow")
+    return pa, pq
+
+# Define a function to get the Arrow schema of a session
+def get_schema(metadata=None):
+    pa, _ = _import_pyarrow()
+    types = {"string": pa.string(), "float64": pa.float64()}
+    schema = pa.schema([pa.field(name, types[dtype]) for name, dtype in SESSION_COLUMNS.items()])
+    return schema.with_metadata({METADATA_KEY: json.dumps(metadata or {}, default=str).encode("utf-8")})
+
+# Define a function to bring a session DataFrame from any script to the fixed schema (returns it and the dropped columns)
+def normalize_session(dataframe):
+    import pandas as pd
+    dataframe = dataframe.rename(columns=lambda column: str(column).strip())
+    dataframe = dataframe.rename(columns={alias: name for alias, name in COLUMN_ALIASES.items() if name not in dataframe.columns})
+
+    # Text labels (e.g. "1_D1" in the test files) are label names, not values
+    if "Label" in dataframe.columns and "Label_Name" not in dataframe.columns \
+            and pd.to_numeric(dataframe["Label"], errors="coerce").isna().any() and dataframe["Label"].notna().all():
+        dataframe = dataframe.rename(columns={"Label": "Label_Name"})
+        if "concentration (mg/mL)" in dataframe.columns:
+            dataframe = dataframe.rename(columns={"concentration (mg/mL)": "Label"})
+
+    dropped = [column for column in dataframe.columns if column not in SESSION_COLUMNS]
+    normalized = pd.DataFrame(index=range(len(dataframe)))
+    for name, dtype in SESSION_COLUMNS.items():
+        if name not in dataframe.columns:
+            normalized[name] = None if dtype == "string" else np.nan
+        elif dtype == "string":
+            normalized[name] = [None if pd.isna(value) else str(value) for value in dataframe[name]]
+        else:
+            normalized[name] = pd.to_numeric(dataframe[name], errors="coerce").to_numpy(dtype=np.float64)
+    return normalized, dropped
+
+# Define a function to write a session to a Parquet file with its metadata (written to a temporary file, then renamed)
+def write_session(path, dataframe, metadata=None, compression="zstd"):
+    pa, pq = _import_pyarrow()
+    normalized, dropped = normalize_session(dataframe)
+    metadata = dict(metadata or {})
+    metadata.setdefault("created", datetime.now().isoformat(timespec="seconds"))
+    metadata.update(schema_version=SCHEMA_VERSION, rows=len(normalized), dropped_columns=dropped)
+
+    table = pa.Table.from_pandas(normalized, schema=get_schema(metadata), preserve_index=False)
+    temp_path = f"{path}.tmp"
+    pq.write_table(table, temp_path, compression=compression)
+    os.replace(temp_path, path)
+    return path
+
+# Define a function to read the embedded metadata of a session (only the file footer is read)
+def read_session_metadata(path):
+    _, pq = _import_pyarrow()
+    metadata = pq.read_schema(path).metadata or {}
+    return json.loads(metadata[METADATA_KEY]) if METADATA_KEY in metadata else {}
+
+# Define a function to read a session, optionally only some of its columns
+def read_session(path, columns=None):
+    _, pq = _import_pyarrow()
+    return pq.read_table(path, columns=columns).to_pandas()
+
+# Define a function to read several sessions into one DataFrame (with a Session column holding the file name)
+def read_sessions(paths, columns=None):
+    pa, pq = _import_pyarrow()
+    tables = []
+    for path in paths:
+        table = pq.read_table(path, columns=columns)
+        session = os.path.splitext(os.path.basename(path))[0]
+        tables.append(table.append_column("Session", pa.array([session] * table.num_rows, type=pa.string())))
+    return pa.concat_tables(tables).to_pandas() if tables else None
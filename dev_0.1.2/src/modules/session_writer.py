@@ -0,0 +1,123 @@
+import os
+import csv
+import glob
+import time
+from datetime import datetime
+from modules.dataset_writer import write_atomic, append_rows
+
+
+# Append-only session journal.
+# Every measurement of a session is written to a CSV journal as soon as it is
+# taken: one line per row, flushed to the operating system straight away (so a
+# crash of the process loses nothing) and fsynced in batches (so a power cut
+# loses at most the last batch). Memory use does not grow with the session.
+# At the end the journal is materialized into the final CSV/Parquet file, and
+# journals left behind by a session that died are found again at startup.
+
+JOURNAL_SUFFIX = ".journal.csv"
+
+
+class SessionWriter:
+    """Buffered, fsync-batched journal of the rows of a measurement session"""
+    def __init__(self, journal_path, columns, fsync_rows=8, fsync_seconds=2.0):
+        self.journal_path = journal_path
+        self.columns = list(columns)
+        self.fsync_rows = fsync_rows
+        self.fsync_seconds = fsync_seconds
+        self.num_rows = 0
+        self.unsynced_rows = 0
+        self.last_sync = time.monotonic()
+        self.started = datetime.now().isoformat(timespec="seconds")
+
+        os.makedirs(os.path.dirname(os.path.abspath(journal_path)), exist_ok=True)
+        new_file = not os.path.exists(journal_path) or os.path.getsize(journal_path) == 0
+        self.file = open(journal_path, "a", newline="")
+        self.writer = csv.writer(self.file)
+        if new_file:
+            self.writer.writerow(self.columns)
+            self.sync()
+
+    # Method to create a journal for a new session of an output file (e.g. data/sessions/reference_..._20240101-120000.journal.csv)
+    @classmethod
+    def create(cls, journal_dir, output_file, columns, **kwargs):
+        stem = os.path.splitext(os.path.basename(output_file))[0]
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return cls(os.path.join(journal_dir, f"{stem}_{timestamp}{JOURNAL_SUFFIX}"), columns, **kwargs)
+
+    # Method to list the journals of sessions that were not materialized (oldest first)
+    @staticmethod
+    def pending(journal_dir, output_file=None):
+        stem = os.path.splitext(os.path.basename(output_file))[0] + "_" if output_file else ""
+        return sorted(glob.glob(os.path.join(journal_dir, f"{stem}*{JOURNAL_SUFFIX}")))
+
+    # Method to append a row (a dict keyed by column name)
+    def append(self, row):
+        self.writer.writerow([row.get(column, "") for column in self.columns])
+        self.file.flush()
+        self.num_rows += 1
+        self.unsynced_rows += 1
+        if self.unsynced_rows >= self.fsync_rows or time.monotonic() - self.last_sync >= self.fsync_seconds:
+            self.sync()
+
+    # Method to force the journal to disk
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced_rows = 0
+        self.last_sync = time.monotonic()
+
+    # Method to close the journal (it stays on disk until it is discarded)
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    # Method to read the session as a DataFrame
+    def to_dataframe(self):
+        if not self.file.closed:
+            self.file.flush()
+        return read_journal(self.journal_path)
+
+    # Method to write the session to its final .csv or .parquet file (Parquet files embed the metadata)
+    def materialize(self, path, mode="w", metadata=None):
+        dataframe = self.to_dataframe()
+        if path.endswith(".parquet"):
+            from modules.session_store import write_session
+            metadata = dict(metadata or {})
+            metadata.setdefault("started", self.started)
+            metadata.setdefault("ended", datetime.now().isoformat(timespec="seconds"))
+            write_session(path, dataframe, metadata)
+        else:
+            if mode == "a" and os.path.exists(path):
+                append_rows(dataframe, path)
+            else:
+                write_atomic(dataframe, path)
+        return path
+
+    # Method to delete the journal once its rows are saved (or deliberately dropped)
+    def discard(self):
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+
+# Define a function to read a journal (a torn last line from a power cut is dropped)
+def read_journal(journal_path):
+    import io
+    import pandas as pd
+    with open(journal_path, "r", newline="") as file:
+        text = file.read()
+    # Every row is written with its line break, so a last line without one was cut off (even if its field count is right)
+    text = text[:text.rfind("\n") + 1]
+    rows = list(csv.reader(io.StringIO(text, newline="")))
+    if not rows:
+        return pd.DataFrame()
+    columns = rows[0]
+    rows = [row for row in rows[1:] if len(row) == len(columns)]
+    dataframe = pd.DataFrame(rows, columns=columns)
+    for column in columns:
+        try:
+            dataframe[column] = pd.to_numeric(dataframe[column])
+        except (ValueError, TypeError):
+            pass # Text column (e.g. Label_Name)
+    return dataframe
@@ -0,0 +1,69 @@
+import time
+import threading
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """Phase-by-phase timing of the device startup"""
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.phases = []
+
+    # Method to time a phase of the startup
+    @contextmanager
+    def phase(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start_time)
+
+    # Method to record a phase timed elsewhere (e.g. in a background thread)
+    def add(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    # Method to return the time since the timer was created
+    def elapsed(self):
+        return time.perf_counter() - self.start_time
+
+    # Method to print the timing breakdown
+    def report(self, title="Startup timing"):
+        print(f"{title}:")
+        for name, seconds in self.phases:
+            print(f"\t{name:<28} {seconds * 1000:8.1f} ms")
+        print(f"\t{'Total (wall clock)':<28} {self.elapsed() * 1000:8.1f} ms")
+
+
+class BackgroundTask:
+    """Run a function in a background thread and collect its result later"""
+    def __init__(self, function, *args, **kwargs):
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.value = None
+        self.error = None
+        self.seconds = None
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        start_time = time.perf_counter()
+        try:
+            self.value = self.function(*self.args, **self.kwargs)
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.seconds = time.perf_counter() - start_time
+
+    # Method to check whether the task has finished
+    def done(self):
+        return not self.thread.is_alive()
+
+    # Method to wait for the task and return its result (exceptions are re-raised here)
+    def result(self, timeout=None):
+        self.thread.join(timeout)
+        if self.thread.is_alive():
+            raise TimeoutError(f"{self.function.__name__} did not finish within {timeout} s.")
+        if self.error is not None:
+            raise self.error
+        return self.value
@@ -0,0 +1,144 @@
+import time
+import numpy as np
+
+
+# RBF support vector regressors exported as kernel expansions.
+# A fitted SVR predicts f(x) = sum_i coef_i * exp(-gamma * |x - c_i|^2) + intercept
+# over its support vectors c_i. The export stores this expansion either
+# exactly (every support vector) or compressed to a smaller set of centers
+# (k-means over the support vectors) whose coefficients are refitted by least
+# squares to reproduce the original decision function. The runtime evaluates
+# the expansion as one dense matrix product, so its cost depends on the
+# number of centers instead of the training set size.
+
+FORMAT_NAME = "svr"
+
+
+# Define a function to compute the RBF kernel matrix between two sets of points
+def rbf_kernel(X, centers, gamma, centers_sq=None):
+    if centers_sq is None:
+        centers_sq = np.einsum("ij,ij->i", centers, centers)
+    X_sq = np.einsum("ij,ij->i", X, X)
+    distances = X_sq[:, None] + centers_sq[None, :] - 2 * (X @ centers.T)
+    np.maximum(distances, 0, out=distances)
+    distances *= -gamma
+    return np.exp(distances, out=distances)
+
+# Define a function to check that a model is an RBF SVR
+def _check_svr(model):
+    if type(model).__name__ != "SVR":
+        raise ValueError(f"Model type {type(model).__name__} is not an SVR.")
+    if model.kernel != "rbf":
+        raise ValueError(f"SVR with {model.kernel} kernel cannot be exported.")
+
+# Define a function to pack a kernel expansion into exportable arrays
+def _svr_arrays(centers, coef, intercept, gamma, n_support):
+    return {
+        "format": FORMAT_NAME,
+        "n_features": centers.shape[1],
+        "n_support": n_support,
+        "gamma": float(gamma),
+        "intercept": float(intercept),
+        "centers": np.ascontiguousarray(centers, dtype=np.float64),
+        "coef": np.asarray(coef, dtype=np.float64).ravel(),
+    }
+
+# Define a function to export the exact kernel expansion of a fitted SVR
+def export_svr(model):
+    _check_svr(model)
+    return _svr_arrays(model.support_vectors_, model.dual_coef_, model.intercept_[0],
+                       model._gamma, len(model.support_vectors_))
+
+# Define a function to compress a fitted SVR to a given number of kernel centers
+def compress_svr(model, X_fit, n_centers, random_state=0):
+    _check_svr(model)
+    support_vectors = model.support_vectors_
+    if n_centers >= len(support_vectors):
+        return export_svr(model)
+
+    # Place the centers where the support vectors are
+    from sklearn.cluster import KMeans
+    kmeans = KMeans(n_clusters=n_centers, n_init=10, random_state=random_state)
+    centers = kmeans.fit(support_vectors).cluster_centers_
+
+    # Refit coefficients and intercept to the original decision function
+    X_fit = np.vstack([support_vectors, np.asarray(X_fit, dtype=np.float64)])
+    target = model.predict(X_fit)
+    design = np.column_stack([rbf_kernel(X_fit, centers, model._gamma), np.ones(len(X_fit))])
+    solution = np.linalg.lstsq(design, target, rcond=None)[0]
+
+    return _svr_arrays(centers, solution[:-1], solution[-1], model._gamma, len(support_vectors))
+
+# Define a function to compress an SVR to the fewest centers meeting a maximum error bound
+def compress_svr_to_tolerance(model, X_fit, X_check, tolerance, center_counts=(4, 8, 16, 32, 64, 128), random_state=0):
+    expected = model.predict(X_check)
+    for n_centers in center_counts:
+        arrays = compress_svr(model, X_fit, n_centers, random_state)
+        max_error = np.max(np.abs(CompressedSVR(arrays).predict(X_check) - expected))
+        if max_error <= tolerance:
+            return arrays, max_error
+
+    # Fall back on the exact expansion
+    arrays = export_svr(model)
+    max_error = np.max(np.abs(CompressedSVR(arrays).predict(X_check) - expected))
+    return arrays, max_error
+
+# Define a function to time a predict function (seconds per call)
+def _time_predict(predict, X, repeats):
+    predict(X)
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        predict(X)
+    return (time.perf_counter() - start_time) / repeats
+
+# Define a function to report accuracy and speed of compressed SVRs against the original
+def svr_compression_report(model, X_fit, X_check, center_counts=(4, 8, 16, 32, 64, 128), repeats=200, random_state=0):
+    expected = model.predict(X_check)
+    single_row = X_check[:1]
+    report = [{
+        "Centers": len(model.support_vectors_),
+        "Runtime": "sklearn",
+        "MAE": 0.0,
+        "Max_Error": 0.0,
+        "Single_Row_us": _time_predict(model.predict, single_row, repeats) * 1e6,
+        "Batch_Rows_per_s": len(X_check) / _time_predict(model.predict, X_check, max(repeats // 10, 1)),
+    }]
+
+    counts = [n for n in center_counts if n < len(model.support_vectors_)] + [len(model.support_vectors_)]
+    for n_centers in counts:
+        compressed = CompressedSVR(compress_svr(model, X_fit, n_centers, random_state))
+        errors = np.abs(compressed.predict(X_check) - expected)
+        report.append({
+            "Centers": n_centers,
+            "Runtime": "numpy",
+            "MAE": float(np.mean(errors)),
+            "Max_Error": float(np.max(errors)),
+            "Single_Row_us": _time_predict(compressed.predict, single_row, repeats) * 1e6,
+            "Batch_Rows_per_s": len(X_check) / _time_predict(compressed.predict, X_check, max(repeats // 10, 1)),
+        })
+    return report
+
+
+class CompressedSVR:
+    """Dense evaluation of an exported (optionally compressed) RBF SVR"""
+    def __init__(self, arrays):
+        if str(arrays["format"]) != FORMAT_NAME:
+            raise ValueError(f"Arrays are not in the {FORMAT_NAME} format.")
+        self.n_features = int(arrays["n_features"])
+        self.n_support = int(arrays["n_support"])
+        self.gamma = float(arrays["gamma"])
+        self.intercept = float(arrays["intercept"])
+        self.centers = np.asarray(arrays["centers"])
+        self.coef = np.asarray(arrays["coef"])
+        self.centers_sq = np.einsum("ij,ij->i", self.centers, self.centers)
+
+    # Method to load an exported SVR from a .npz file
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    # Method to predict values of a batch of inputs, shape (n_samples, n_features)
+    def predict(self, X):
+        X = np.asarray(X, dtype=np.float64).reshape(-1, self.n_features)
+        return rbf_kernel(X, self.centers, self.gamma, self.centers_sq) @ self.coef + self.intercept
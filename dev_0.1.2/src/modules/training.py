@@ -0,0 +1,254 @@
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from modules.color_space import convert_color_space
+
+
+# Model training of train_models.py.
+# The models, parameter grids, train/test split and metrics reproduce the ones
+# of model_training/models_training_{rgb,hsl,hsv,cmyk,lab}.ipynb (the notebooks
+# keep their own copy of this code), so a model trained here is the model the
+# notebook would have produced.
+
+MODEL_NAMES = ["random_forest", "gradient_boosting", "svm", "mlp"]
+COLOR_SPACES = ["rgb", "hsl", "hsv", "cmyk", "lab"]
+TEST_SIZE = 0.2
+RANDOM_STATE = 2
+CV_FOLDS = 5
+METRIC_COLUMNS = ["Model", "MAE", "MSE", "RMSE", "R^2"]
+
+# Parameter grids for each model
+PARAM_GRIDS = {
+    "random_forest": {
+        "n_estimators": [500, 1000, 2000],
+        "max_depth": [None, 10, 20, 30],
+        "min_samples_split": [2, 5, 10],
+    },
+    "gradient_boosting": {
+        "n_estimators": [500, 1000, 2000],
+        "learning_rate": [0.01, 0.1, 0.2],
+        "max_depth": [3, 5, 10],
+    },
+    "svm": {
+        "C": [0.1, 1, 10],
+        "gamma": ["scale", "auto", 0.1, 1],
+    },
+    "mlp": {
+        "hidden_layer_sizes": [(50, 30), (100, 50), (200, 100)],
+        "activation": ["relu", "tanh"],
+    },
+}
+
+# Relative cost of one fit of each model, used to start the longest jobs first
+MODEL_COSTS = {"random_forest": 20, "gradient_boosting": 10, "mlp": 2, "svm": 1}
+
+# Hyperparameter search methods:
+#   grid     - every candidate of the grid, in grid order (exhaustive without a budget, as in the notebooks)
+#   random   - candidates of the grid in random order, until the budget is spent
+#   halving  - successive halving: all candidates on few samples (few trees for ensembles), the best third
+#              again on three times as many, ...
+SEARCH_METHODS = ["grid", "random", "halving"]
+HALVING_FACTOR = 3
+
+# Early stopping of gradient boosting: stop adding stages when the score on a
+# held-out part of the training set has not improved for this many stages.
+# The n_estimators grid then only gives the upper bound.
+EARLY_STOPPING = {"n_iter_no_change": 10, "validation_fraction": 0.1, "tol": 1e-4}
+
+
+# Define a function to create an unfitted model
+def build_estimator(model_name, early_stopping=False):
+    from sklearn import ensemble, svm, neural_network
+    estimators = {
+        "random_forest": ensemble.RandomForestRegressor,
+        "gradient_boosting": ensemble.GradientBoostingRegressor,
+        "svm": svm.SVR,
+        "mlp": neural_network.MLPRegressor,
+    }
+    if model_name not in estimators:
+        raise ValueError(f"Unknown model name: {model_name}")
+    if early_stopping and model_name == "gradient_boosting":
+        return estimators[model_name](random_state=RANDOM_STATE, **EARLY_STOPPING)
+    return estimators[model_name]()
+
+# Define a function to get the parameter grid of a model (early stopping searches only the largest n_estimators)
+def get_param_grid(model_name, early_stopping=False):
+    param_grid = dict(PARAM_GRIDS[model_name])
+    if early_stopping and model_name == "gradient_boosting":
+        param_grid["n_estimators"] = [max(param_grid["n_estimators"])]
+    return param_grid
+
+# Define a function to get the dataset name of a reference file (e.g. "reference_corrected_BCA-200uL-2.csv")
+def get_dataset_name(reference_file):
+    return re.sub(r"^reference_(corrected_)?", "", os.path.splitext(os.path.basename(reference_file))[0])
+
+# Define a function to load a reference file as features of a color space and labels (cached when cache_dir is given)
+def load_dataset(reference_file, color_space_name, cache_dir=None):
+    if cache_dir is not None:
+        from modules.feature_cache import FeatureCache
+        return FeatureCache(cache_dir).load(reference_file, color_space_name, load_dataset)
+    if reference_file.endswith(".parquet"):
+        # Sessions in Parquet are read column-projected
+        from modules.session_store import read_session
+        reference_df = read_session(reference_file, columns=["Red", "Green", "Blue", "Label"])
+    else:
+        reference_df = pd.read_csv(reference_file)
+    X = convert_color_space(reference_df[["Red", "Green", "Blue"]].to_numpy(dtype=np.float64), color_space_name)
+    Y = reference_df["Label"].to_numpy()
+    return X, Y
+
+# Define a function to split a dataset as the training notebooks do
+def split_dataset(X, Y, test_size=TEST_SIZE, random_state=RANDOM_STATE):
+    from sklearn.model_selection import train_test_split
+    return train_test_split(X, Y, test_size=test_size, random_state=random_state)
+
+# Define a function to compute the evaluation metrics of a fitted model
+def evaluate_model(model, X_test, Y_test):
+    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+    Y_pred = model.predict(X_test)
+    mae = mean_absolute_error(Y_test, Y_pred)
+    mse = mean_squared_error(Y_test, Y_pred)
+    return {"MAE": mae, "MSE": mse, "RMSE": np.sqrt(mse), "R^2": r2_score(Y_test, Y_pred)}
+
+# Define a function to get the model id of a trained model (the dataset is omitted for single-dataset runs)
+def get_model_id(model_name, color_space_name, dataset_name=None):
+    return f"{model_name}_{color_space_name}" + (f"_{dataset_name}" if dataset_name else "")
+
+# Define a function to run the grid search of one model on one dataset
+def grid_search_model(model_name, X_train, Y_train, n_jobs=-1, cv=CV_FOLDS, param_grid=None, early_stopping=False):
+    from sklearn.model_selection import GridSearchCV
+    grid_search = GridSearchCV(build_estimator(model_name, early_stopping), param_grid or get_param_grid(model_name, early_stopping),
+                               cv=cv, n_jobs=n_jobs)
+    grid_search.fit(X_train, Y_train)
+    return grid_search.best_estimator_, grid_search.best_params_, grid_search.best_score_
+
+# Define a function to cross-validate candidates in rounds until a fit-count or wall-clock budget is spent
+def budgeted_search(estimator, candidates, X_train, Y_train, n_jobs=-1, cv=CV_FOLDS, max_fits=None, time_budget=None, journal=None):
+    from sklearn.base import clone
+    from sklearn.model_selection import GridSearchCV
+    start_time = time.perf_counter()
+    round_size = max(1, n_jobs if n_jobs > 0 else (os.cpu_count() or 1))
+    best_params, best_score, n_fits = None, -np.inf, 0
+
+    for start in range(0, len(candidates), round_size):
+        if best_params is not None and time_budget is not None and time.perf_counter() - start_time >= time_budget:
+            break
+        round_candidates = candidates[start:start + round_size]
+        if max_fits is not None:
+            # The first candidate is always evaluated, so a search never ends without a model
+            round_candidates = round_candidates[:max(max_fits - n_fits, 0 if best_params is not None else cv) // cv]
+        if not round_candidates:
+            break
+
+        # Candidates scored before an interruption are taken from the journal
+        scores = {i: journal.get(params) for i, params in enumerate(round_candidates)} if journal is not None else {}
+        pending = [i for i, params in enumerate(round_candidates) if scores.get(i) is None]
+        if pending:
+            search = GridSearchCV(clone(estimator), [{key: [value] for key, value in round_candidates[i].items()} for i in pending],
+                                  cv=cv, n_jobs=n_jobs, refit=False)
+            search.fit(X_train, Y_train)
+            for i, score in zip(pending, search.cv_results_["mean_test_score"]):
+                scores[i] = score
+                if journal is not None:
+                    journal.record(round_candidates[i], score, cv)
+        n_fits += len(round_candidates) * cv
+
+        # The first of equally good candidates wins, as in GridSearchCV
+        for i, params in enumerate(round_candidates):
+            if scores[i] > best_score:
+                best_params, best_score = params, scores[i]
+
+    best_estimator = clone(estimator).set_params(**best_params).fit(X_train, Y_train)
+    return best_estimator, best_params, best_score, n_fits
+
+# Define a function to search the hyperparameters of one model with a search method and an optional budget
+def search_model(model_name, X_train, Y_train, method="grid", n_jobs=-1, cv=CV_FOLDS, max_fits=None,
+                 time_budget=None, early_stopping=False, random_state=RANDOM_STATE, journal=None):
+    from sklearn.model_selection import ParameterGrid
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Unknown search method: {method}. Choose from {SEARCH_METHODS}.")
+    estimator = build_estimator(model_name, early_stopping)
+    param_grid = get_param_grid(model_name, early_stopping)
+    candidates = list(ParameterGrid(param_grid))
+
+    if method == "halving":
+        from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+        from sklearn.model_selection import HalvingGridSearchCV, HalvingRandomSearchCV
+        if time_budget is not None:
+            raise ValueError("Successive halving takes a fit-count budget (max_fits), not a time budget.")
+        # Ensembles spend trees on the candidates instead of samples, the n_estimators grid gives the largest size
+        resource = {"resource": "n_samples"}
+        if "n_estimators" in param_grid and not early_stopping:
+            param_grid = {key: values for key, values in param_grid.items() if key != "n_estimators"}
+            resource = {"resource": "n_estimators", "max_resources": max(PARAM_GRIDS[model_name]["n_estimators"])}
+            candidates = list(ParameterGrid(param_grid))
+        if max_fits is not None and max_fits < len(candidates) * cv * 1.5:
+            # Fits of all rounds add up to about 1.5 times the fits of the first round
+            n_candidates = min(len(candidates), max(HALVING_FACTOR, int(max_fits / (cv * 1.5))))
+            search = HalvingRandomSearchCV(estimator, param_grid, n_candidates=n_candidates, factor=HALVING_FACTOR,
+                                           cv=cv, n_jobs=n_jobs, random_state=random_state, **resource)
+        else:
+            search = HalvingGridSearchCV(estimator, param_grid, factor=HALVING_FACTOR, cv=cv, n_jobs=n_jobs,
+                                         random_state=random_state, **resource)
+        search.fit(X_train, Y_train)
+        return search.best_estimator_, search.best_params_, search.best_score_, int(np.sum(search.n_candidates_)) * cv
+
+    # Searches with a journal run in rounds, so that they can resume after an interruption
+    if method == "grid" and max_fits is None and time_budget is None and journal is None:
+        best_estimator, best_params, best_score = grid_search_model(model_name, X_train, Y_train, n_jobs, cv, param_grid, early_stopping)
+        return best_estimator, best_params, best_score, len(candidates) * cv
+
+    if method == "random":
+        candidates = [candidates[i] for i in np.random.RandomState(random_state).permutation(len(candidates))]
+    return budgeted_search(estimator, candidates, X_train, Y_train, n_jobs, cv, max_fits, time_budget, journal)
+
+# Define a function to save metrics as the training notebooks do (data/metrics/metrics_{color space}_{dataset}.csv)
+# Rows of the models trained now replace their earlier rows, the rows of other models are kept
+def save_metrics(rows, metrics_dir, color_space_name, dataset_name):
+    from modules.dataset_writer import write_atomic
+    if not os.path.exists(metrics_dir):
+        os.makedirs(metrics_dir)
+        print(f"Metrics directory is created at: {metrics_dir}")
+    metrics_file = os.path.join(metrics_dir, f"metrics_{color_space_name}_{dataset_name}.csv")
+    metrics_df = pd.DataFrame(rows, columns=METRIC_COLUMNS)
+    if os.path.exists(metrics_file):
+        existing_df = pd.read_csv(metrics_file, float_precision="round_trip") # Kept rows are written back unchanged
+        updated = existing_df["Model"].isin(metrics_df["Model"])
+        new_rows = metrics_df.set_index("Model")
+        existing_df.loc[updated, METRIC_COLUMNS[1:]] = new_rows.loc[existing_df.loc[updated, "Model"], METRIC_COLUMNS[1:]].to_numpy()
+        metrics_df = pd.concat([existing_df, metrics_df[~metrics_df["Model"].isin(existing_df["Model"])]], ignore_index=True)
+    write_atomic(metrics_df[METRIC_COLUMNS], metrics_file)
+    print(f"Metrics saved at: {os.path.abspath(metrics_file)}")
+    return metrics_file
+
+# Define a function to get the MAE recorded for a model in the metrics files of its color space ({dataset name: MAE}, None for metrics_{color space}.csv)
+def get_recorded_mae(metrics_dir, model_id, model_name, color_space_name):
+    recorded = {}
+    prefix = f"metrics_{color_space_name}"
+    for metrics_file in sorted(os.listdir(metrics_dir)) if os.path.isdir(metrics_dir) else []:
+        stem, extension = os.path.splitext(metrics_file)
+        if extension != ".csv" or not (stem == prefix or stem.startswith(f"{prefix}_")):
+            continue
+        metrics_df = pd.read_csv(os.path.join(metrics_dir, metrics_file))
+        rows = metrics_df[metrics_df["Model"].isin([model_id, model_name])]
+        if not rows.empty:
+            recorded[stem[len(prefix) + 1:] or None] = float(rows["MAE"].iloc[0])
+    return recorded
+
+# Define a function to find the dataset a model was trained on (the reference file on whose test split the model reproduces its recorded MAE; None if there is no single match)
+def infer_dataset(model, color_space_name, recorded_mae, reference_files):
+    candidates = set()
+    for reference_file in reference_files:
+        dataset_name = get_dataset_name(reference_file)
+        X, Y = load_dataset(reference_file, color_space_name)
+        if X.shape[1] != getattr(model, "n_features_in_", X.shape[1]):
+            return None
+        _, X_test, _, Y_test = split_dataset(X, Y)
+        mae = evaluate_model(model, X_test, Y_test)["MAE"]
+        if dataset_name in recorded_mae and np.isclose(mae, recorded_mae[dataset_name], rtol=1e-9, atol=0):
+            return dataset_name
+        if None in recorded_mae and np.isclose(mae, recorded_mae[None], rtol=1e-9, atol=0):
+            candidates.add(dataset_name)
+    return candidates.pop() if len(candidates) == 1 else None
@@ -0,0 +1,163 @@
+import os
+import glob
+import shutil
+import numpy as np
+
+
+# Tree ensembles flattened to packed NumPy node arrays.
+# Every node of every tree is stored in one set of arrays (feature, threshold,
+# left, right, value) with global node indices, so that all trees of the
+# ensemble can be traversed at once with a few vectorized gathers. Leaves point
+# to themselves, which lets the traversal run a fixed number of steps (the
+# maximum tree depth) without checking for leaves.
+
+FORMAT_NAME = "tree_ensemble"
+
+
+# Define a function to flatten a fitted RandomForestRegressor or GradientBoostingRegressor
+def export_tree_ensemble(model):
+    model_type = type(model).__name__
+    if model_type in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        kind = "forest"
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        learning_rate = 1.0
+        init_value = 0.0
+    elif model_type == "GradientBoostingRegressor":
+        kind = "boosting"
+        if model.estimators_.shape[1] != 1:
+            raise ValueError("Only single-output gradient boosting regressors can be exported.")
+        trees = [estimator.tree_ for estimator in model.estimators_[:, 0]]
+        learning_rate = float(model.learning_rate)
+        if model.init_ == "zero":
+            init_value = 0.0
+        elif type(model.init_).__name__ == "DummyRegressor":
+            init_value = float(np.asarray(model.init_.constant_).ravel()[0])
+        else:
+            raise ValueError(f"Gradient boosting with init estimator {model.init_} cannot be exported.")
+    else:
+        raise ValueError(f"Model type {model_type} is not a supported tree ensemble.")
+
+    if trees[0].n_outputs != 1:
+        raise ValueError("Only single-output tree ensembles can be exported.")
+
+    # Concatenate the node arrays of every tree with global node indices
+    node_counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    roots = np.concatenate([[0], np.cumsum(node_counts)[:-1]])
+    feature = np.empty(node_counts.sum(), dtype=np.int32)
+    threshold = np.empty(node_counts.sum(), dtype=np.float64)
+    left = np.empty(node_counts.sum(), dtype=np.int32)
+    right = np.empty(node_counts.sum(), dtype=np.int32)
+    value = np.empty(node_counts.sum(), dtype=np.float64)
+
+    for tree, root, count in zip(trees, roots, node_counts):
+        nodes = slice(root, root + count)
+        is_leaf = tree.children_left == -1
+        own_index = np.arange(root, root + count)
+        feature[nodes] = np.where(is_leaf, 0, tree.feature)
+        threshold[nodes] = np.where(is_leaf, 0.0, tree.threshold)
+        left[nodes] = np.where(is_leaf, own_index, tree.children_left + root)
+        right[nodes] = np.where(is_leaf, own_index, tree.children_right + root)
+        value[nodes] = tree.value[:, 0, 0]
+
+    return {
+        "format": FORMAT_NAME,
+        "kind": kind,
+        "model_type": model_type,
+        "n_features": int(model.n_features_in_),
+        "max_depth": int(max(tree.max_depth for tree in trees)),
+        "learning_rate": learning_rate,
+        "init_value": init_value,
+        "roots": roots.astype(np.int32),
+        "feature": feature,
+        "threshold": threshold,
+        "left": left,
+        "right": right,
+        "value": value,
+    }
+
+# Define a function to save a flattened tree ensemble to a .npz file
+def save_tree_ensemble(model, path):
+    np.savez(path, **export_tree_ensemble(model))
+    print(f"Tree ensemble exported to: {path}")
+
+# Define a function to save flattened node arrays as one .npy file per array (written to a temporary directory, then renamed)
+def save_tree_arrays(arrays, directory):
+    temp_dir = f"{directory}.{os.getpid()}.tmp"
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    os.makedirs(temp_dir)
+    for name, array in arrays.items():
+        np.save(os.path.join(temp_dir, f"{name}.npy"), np.asarray(array))
+    try:
+        os.replace(temp_dir, directory)
+    except OSError:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        if not os.path.isdir(directory): # Otherwise another process saved the same arrays first
+            raise
+    return directory
+
+# Define a function to load flattened node arrays saved with save_tree_arrays (memory-mapped, so processes share the pages)
+def load_tree_arrays(directory, mmap_mode="r"):
+    return {os.path.splitext(os.path.basename(path))[0]: np.load(path, mmap_mode=mmap_mode)
+            for path in glob.glob(os.path.join(directory, "*.npy"))}
+
+
+class TreeEnsemble:
+    """Vectorized evaluator of a flattened tree ensemble"""
+    def __init__(self, arrays):
+        if str(arrays["format"]) != FORMAT_NAME:
+            raise ValueError(f"Arrays are not in the {FORMAT_NAME} format.")
+        self.kind = str(arrays["kind"])
+        self.model_type = str(arrays["model_type"])
+        self.n_features = int(arrays["n_features"])
+        self.max_depth = int(arrays["max_depth"])
+        self.learning_rate = float(arrays["learning_rate"])
+        self.init_value = float(arrays["init_value"])
+        self.roots = np.asarray(arrays["roots"])
+        self.feature = np.asarray(arrays["feature"])
+        self.threshold = np.asarray(arrays["threshold"])
+        self.left = np.asarray(arrays["left"])
+        self.right = np.asarray(arrays["right"])
+        self.value = np.asarray(arrays["value"])
+        self.n_estimators = len(self.roots)
+
+    # Method to load a flattened tree ensemble from a .npz file
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({key: data[key] for key in data.files})
+
+    # Method to return the leaf value reached in every tree, shape (n_samples, n_estimators)
+    def predict_trees(self, X):
+        # sklearn compares float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        rows = np.arange(len(X))[:, None]
+
+        # Traverse all trees at once, leaves loop back onto themselves
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_estimators))
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes]
+
+    # Method to predict values, bitwise identical to the sklearn ensemble
+    def predict(self, X):
+        return self.combine(self.predict_trees(X))
+
+    # Method to predict values together with the standard deviation across trees (forests only, one traversal)
+    def predict_with_std(self, X):
+        values = self.predict_trees(X)
+        tree_std = np.std(values, axis=1) if self.kind == "forest" else None
+        return self.combine(values), tree_std
+
+    # Method to combine the leaf values of every tree into the ensemble prediction
+    def combine(self, values):
+        if self.kind == "forest":
+            # Trees are accumulated one after another, then averaged
+            return np.cumsum(values, axis=1)[:, -1] / self.n_estimators
+
+        # Boosting stages are added one after another to the initial prediction
+        stages = np.empty((len(values), self.n_estimators + 1), dtype=np.float64)
+        stages[:, 0] = self.init_value
+        stages[:, 1:] = self.learning_rate * values
+        return np.cumsum(stages, axis=1)[:, -1]
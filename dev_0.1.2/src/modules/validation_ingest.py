@@ -0,0 +1,145 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+
+
+# Ingestion of plate reader validation spreadsheets.
+# The plate reader exports either tab-separated text reports saved as .xls
+# (iMark: a standards report and a data analysis report) or .xlsx sheets with
+# Well/Replicates/Mean/Conc columns. Both are parsed into one long table with
+# one row per well: plate, section, sample id, normalized well label ("D7"),
+# absorbance, mean and concentration. Replicate wells (rows without their own
+# sample id or concentration) take the values of the sample they belong to.
+# Parsed files are cached as Parquet under the hash of their content.
+
+PARSER_VERSION = 1
+VALIDATION_COLUMNS = ["Source", "Plate", "Section", "Sample_ID", "Well", "Absorbance", "Mean", "Conc", "SD"]
+
+
+# Define a function to normalize well labels (e.g. " d07", "1-D7" or "1_D7" -> "D7"; None if it is not a well)
+def normalize_wells(labels):
+    match = pd.Series(labels, dtype="object").astype(str).str.strip().str.upper().str.extract(r"([A-H])0*(\d{1,2})$")
+    return (match[0] + match[1]).where(match[0].notna(), None)
+
+# Define a function to get the plate number of labels (e.g. "1_D7" -> "1"; None if there is no plate prefix)
+def get_plates(labels):
+    return pd.Series(labels, dtype="object").astype(str).str.strip().str.extract(r"^(\d+)[-_][A-Ha-h]\d{1,2}$")[0]
+
+# Define a function to get the plate number from a file name (e.g. "... plate 1_without correction.xls" or "BCA_unknown_sample_1_validation.xlsx")
+def get_file_plate(path):
+    match = re.search(r"(?:plate|sample)[ _-]?(\d+)", os.path.basename(path), flags=re.IGNORECASE)
+    return match.group(1) if match else None
+
+# Define a function to parse a section of a text report (header line, then tab-separated rows until a blank line)
+def parse_text_section(lines, title):
+    if title not in lines:
+        return pd.DataFrame()
+    start = lines.index(title) + 1
+    header = [column.strip() for column in lines[start].split("\t")]
+    rows = []
+    for line in lines[start + 1:]:
+        if not line.strip():
+            break
+        values = [value.strip() for value in line.split("\t")]
+        rows.append((values + [""] * len(header))[:len(header)])
+    return pd.DataFrame(rows, columns=header).replace("", np.nan)
+
+# Define a function to parse a tab-separated text report (.xls exported by the iMark reader)
+def parse_text_report(path):
+    with open(path, "r", encoding="latin-1") as file:
+        lines = [line.rstrip("\r\n") for line in file]
+
+    standards = parse_text_section(lines, "Standards Report:")
+    if not standards.empty:
+        standards = standards.assign(Section="standard", Sample_ID=standards["Std #"].ffill(), Conc=standards["Conc"].ffill(),
+                                     Mean=standards["Mean"].ffill(), SD=standards["SD"].ffill())
+    samples = parse_text_section(lines, "Data Analysis Report:")
+    if not samples.empty:
+        samples = samples.assign(Section="sample", Sample_ID=samples["Sample ID"].ffill(), Conc=samples["Conc"].ffill(),
+                                 Mean=samples["Mean"].ffill(), SD=samples["SD (Conc)"].ffill())
+    return pd.concat([standards, samples], ignore_index=True).rename(columns={"Replicates": "Absorbance"})
+
+# Define a function to parse a spreadsheet (.xlsx with Well/Replicates/Mean/Conc columns)
+def parse_spreadsheet(path):
+    dataframe = pd.read_excel(path)
+    dataframe.columns = [str(column).strip() for column in dataframe.columns]
+    dataframe = dataframe.replace(r"^\s*$", np.nan, regex=True)
+    sample = dataframe["Conc"].notna().cumsum() # Replicate rows follow the row of their sample
+    return dataframe.assign(Section="sample", Sample_ID=sample.astype(str), Conc=dataframe["Conc"].ffill(),
+                            Mean=dataframe["Mean"].ffill(), SD=np.nan).rename(columns={"Replicates": "Absorbance"})
+
+# Define a function to parse a validation file into the validation columns
+def parse_validation_file(path):
+    with open(path, "rb") as file:
+        text_report = not file.read(8).startswith((b"PK", b"\xd0\xcf\x11\xe0")) # Not a zip (.xlsx) or OLE (.xls) file
+    dataframe = parse_text_report(path) if text_report else parse_spreadsheet(path)
+
+    dataframe["Source"] = os.path.basename(path)
+    dataframe["Plate"] = get_file_plate(path)
+    dataframe["Well"] = normalize_wells(dataframe["Well"]).to_numpy()
+    for column in ("Absorbance", "Mean", "Conc", "SD"):
+        dataframe[column] = pd.to_numeric(dataframe.get(column), errors="coerce") # e.g. "( * )" for a single replicate
+    dataframe["Sample_ID"] = dataframe["Sample_ID"].astype("string")
+    return dataframe.loc[dataframe["Well"].notna(), VALIDATION_COLUMNS].reset_index(drop=True)
+
+
+class ValidationCache:
+    """Parsed validation files stored as Parquet under the hash of their content"""
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    # Method to get the cache path of a file
+    def path(self, sha256):
+        return os.path.join(self.cache_dir, f"{sha256[:32]}_v{PARSER_VERSION}.parquet")
+
+    # Method to get a cached parse (None on a miss, or if pyarrow is not installed)
+    def get(self, sha256):
+        path = self.path(sha256)
+        if not os.path.exists(path):
+            return None
+        try:
+            return pd.read_parquet(path)
+        except ImportError:
+            return None
+
+    # Method to cache a parse (written to a temporary file, then renamed; skipped if pyarrow is not installed)
+    def put(self, sha256, dataframe):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{self.path(sha256)}.tmp"
+        try:
+            dataframe.to_parquet(temp_path, index=False)
+        except ImportError:
+            return False
+        os.replace(temp_path, self.path(sha256))
+        return True
+
+
+# Define a function to read predictions and key them by plate and well (the plate comes from labels like "1_D7" or the file name)
+def prepare_predictions(predictions_df, source=None):
+    predictions_df = predictions_df.rename(columns=lambda column: str(column).strip())
+    labels = predictions_df["Label_Name"] if "Label_Name" in predictions_df.columns else predictions_df["Label"]
+    plates = get_plates(labels)
+    if source is not None:
+        plates = plates.fillna(get_file_plate(source))
+    return predictions_df.assign(Plate=plates.to_numpy(), Well=normalize_wells(labels).to_numpy())
+
+# Define a function to join predictions with validation data (one merge on plate and well)
+def merge_validations(predictions_df, validations_df):
+    samples = validations_df[validations_df["Section"] == "sample"].drop_duplicates(["Plate", "Well"], keep="last")
+    return predictions_df.merge(samples[["Plate", "Well", "Sample_ID", "Absorbance", "Conc", "Source"]], on=["Plate", "Well"],
+                                how="inner", validate="many_to_one")
+
+# Define a function to get error metrics of every prediction column against the validation concentration
+def get_validation_metrics(merged_df):
+    rows = []
+    for column in [column for column in merged_df.columns if column.startswith("Predicted")]:
+        valid = merged_df[[column, "Conc"]].apply(pd.to_numeric, errors="coerce").dropna()
+        if valid.empty:
+            continue
+        error = valid[column] - valid["Conc"]
+        total = ((valid["Conc"] - valid["Conc"].mean()) ** 2).sum()
+        rows.append({"Prediction": column, "Wells": len(valid), "MAE": error.abs().mean(), "RMSE": np.sqrt((error ** 2).mean()),
+                     "R^2": 1 - (error ** 2).sum() / total if total > 0 else np.nan})
+    return pd.DataFrame(rows, columns=["Prediction", "Wells", "MAE", "RMSE", "R^2"])
+
@@ -7,54 +7,15 @@ import numpy as np
 import pandas as pd
 from modules.I2CLCD import I2CLCD
 from modules.TCS3200 import TCS3200
+from modules.calibration_store import load_calibration_data
+from modules.data_catalog import DataCatalog
+from modules.dataset_writer import write_atomic, append_rows, replay_journals
 
 
 # Hyperparameters
 DATA_DIRECTORY = os.path.join("..", "data")
-CALIBRATION_FILE = "calibration.txt"
 REFERENCE_FILE = ""
 
-def get_latest_file(directory, default_name="*.csv"):
-    """Return the most recently modified file in the given directory."""
-    # Get list of all files in the directory
-    list_of_files = [os.path.join(directory, file) for file in os.listdir(directory) if os.path.isfile(os.path.join(directory, file)) and file.endswith('.csv')]
-
-    # If there are no files, return the default_name
-    if not list_of_files:
-        return default_name
-
-    # Otherwise, return the file with the most recent modification time
-    return max(list_of_files, key=os.path.getmtime)
-
-# Define a function to load sensor calibration data
-def load_calibration_data(calibration_data, data_dir):
-    # Get the directory of the current script
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Join it with the relative path of your data
-    data_path = os.path.join(current_dir, data_dir)
-
-    # Define the calibration data path
-    calibration_data_path = os.path.join(data_path, calibration_data)
-    
-    # Check if the data file exists
-    if not os.path.exists(calibration_data_path):
-        print(f"No calibration data found at: {os.path.abspath(calibration_data_path)}")
-        return None, None
-
-    # Load the global_min and global_max data
-    try:
-        with open(calibration_data_path, 'r') as file:
-            lines = file.readlines()
-            global_min = [float(val) for val in lines[0].split(":")[1].strip()[1:-1].split(", ")]
-            global_max = [float(val) for val in lines[1].split(":")[1].strip()[1:-1].split(", ")]
-
-        print(f"Calibration data loaded from: {os.path.abspath(calibration_data_path)}")
-    except Exception as e:
-        print(f"Calibration data load error occurred: {e}")
-        return None, None
-
-    return global_min, global_max
 
 # Define a function to save the reference data
 def save_data(dataframe, data_dir):
@@ -63,7 +24,11 @@ def save_data(dataframe, data_dir):
 
     # Join it with the relative path of your data
     data_path = os.path.join(current_dir, data_dir)
-    filename = get_latest_file(data_path)
+
+    # The latest dataset in the data directory, from the data catalog (refreshed, other scripts may have written datasets)
+    catalog = DataCatalog(data_path)
+    catalog.refresh()
+    filename = catalog.latest(kind="dataset") or "*.csv"
 
     # Define the reference data path
     reference_data_path = os.path.join(data_path, filename)
@@ -92,7 +57,8 @@ def save_data(dataframe, data_dir):
 
         if option.lower() in ['a', 'append']:
             try:
-                dataframe.to_csv(reference_data_path, mode='a', header=False, index=False)
+                append_rows(dataframe, reference_data_path)
+                catalog.add(reference_data_path)
                 print(f"Data appended at: {os.path.abspath(reference_data_path)}")
             except Exception as e:
                 print(f"Data append error occurred: {e}")
@@ -106,7 +72,8 @@ def save_data(dataframe, data_dir):
                 new_filename = input("Enter another filename: ")
                 new_data_path = os.path.join(data_path, new_filename)
             try:
-                dataframe.to_csv(new_data_path, index=False)
+                write_atomic(dataframe, new_data_path)
+                catalog.add(new_data_path)
                 print(f"Data saved at: {os.path.abspath(new_data_path)}")
             except Exception as e:
                 print(f"Data save error occurred: {e}")
@@ -114,7 +81,8 @@ def save_data(dataframe, data_dir):
             
         elif option.lower() in ['o', 'overwrite']:
             try:
-                dataframe.to_csv(reference_data_path, index=False)
+                write_atomic(dataframe, reference_data_path)
+                catalog.add(reference_data_path)
                 print(f"Data overwritten at: {os.path.abspath(reference_data_path)}")
             except Exception as e:
                 print(f"Data overwrite error occurred: {e}")
@@ -131,7 +99,8 @@ def save_data(dataframe, data_dir):
     else:
         # Save the data in a new file if the file does not exist
         try:
-            dataframe.to_csv(reference_data_path, index=False)
+            write_atomic(dataframe, reference_data_path)
+            catalog.add(reference_data_path)
             print(f"Data saved at: {os.path.abspath(reference_data_path)}")
         except Exception as e:
             print(f"Data save error occurred: {e}")
@@ -240,10 +209,13 @@ if __name__ == "__main__":
         print("Sensor is ready.")
         time.sleep(1)
 
-        global_min, global_max = load_calibration_data(CALIBRATION_FILE, DATA_DIRECTORY)
+        global_min, global_max = load_calibration_data(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY), sensor)
         print("Calibration data is ready.")
         time.sleep(1)
 
+        # Finish appends that were cut off by a power cut
+        replay_journals(os.path.join(os.path.dirname(os.path.abspath(__file__)), DATA_DIRECTORY))
+
         # Initialize parameters
         reference_data = pd.DataFrame(columns=["Label_Name", "Red_Frequency", "Green_Frequency", "Blue_Frequency", "Clear_Frequency", "Red", "Green", "Blue"])
         previous_label = None
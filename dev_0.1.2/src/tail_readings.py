@@ -0,0 +1,59 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+from modules.reading_log import ReadingLog, FIELDS
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+READING_LOG_FILE = os.path.join("monitoring", "readings.ringlog")
+
+
+# Define a function to format the records of the reading log as lines
+def format_records(records):
+    for record in records:
+        timestamp = datetime.fromtimestamp(record["timestamp"]).isoformat(sep=" ", timespec="seconds")
+        spread = f" +/- {record['spread']:.3f}" if record["spread"] == record["spread"] else "" # NaN: no spread
+        cached = " (cached)" if record["cached"] else ""
+        yield (f"{int(record['seq']) - 1:>8} {timestamp} RGB({record['red']:3.3f}, {record['green']:3.3f}, {record['blue']:3.3f}) "
+               f"Value: {record['value']:.3f}{spread}{cached}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Print or export the readings logged by main.py (safe to run while it is monitoring).")
+    parser.add_argument("--log", default=None, help="Reading log file (default: data/monitoring/readings.ringlog).")
+    parser.add_argument("-n", "--lines", type=int, default=10, help="Number of last readings to print (default: 10).")
+    parser.add_argument("-f", "--follow", action="store_true", help="Keep printing new readings as they are logged.")
+    parser.add_argument("--poll", type=float, default=0.5, help="Polling interval in seconds with --follow (default: 0.5).")
+    parser.add_argument("--export", default=None, help="Write all readings in the log to a .csv or .parquet file and exit.")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    log_path = args.log or os.path.join(current_dir, DATA_DIRECTORY, READING_LOG_FILE)
+    if not os.path.exists(log_path):
+        print(f"No reading log found at: {os.path.abspath(log_path)}")
+        sys.exit(1)
+    log = ReadingLog(log_path)
+
+    if args.export:
+        dataframe = log.to_dataframe()
+        if args.export.endswith(".parquet"):
+            dataframe.to_parquet(args.export, index=False)
+        else:
+            dataframe.to_csv(args.export, index=False)
+        print(f"{len(dataframe)} readings ({', '.join(FIELDS)}) exported to: {os.path.abspath(args.export)}")
+        sys.exit(0)
+
+    records, next_seq = log.read(limit=args.lines)
+    for line in format_records(records):
+        print(line)
+
+    try:
+        if args.follow:
+            for records in log.follow(since=next_seq, poll_seconds=args.poll):
+                for line in format_records(records):
+                    print(line, flush=True)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import joblib
+from modules import training
+from modules.model_registry import ModelRegistry, file_hash
+from modules.checkpoint import SweepCheckpoint, CandidateJournal
+from modules.data_catalog import DataCatalog
+from modules.calibration_store import get_store
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+METRICS_DIRECTORY = "metrics"
+TRAINING_DIRECTORY = "training"
+FEATURE_CACHE_DIRECTORY = os.path.join("cache", "features")
+CHECKPOINT_DIRECTORY = os.path.join("cache", "sweeps")
+DATASET_NAME = "BCA-200uL-2"
+
+# Thread limits of the worker process (kept alive for the lifetime of the process)
+thread_limits = None
+
+
+# Define a function to initialize a worker process
+def init_worker(blas_threads):
+    global thread_limits
+    # One BLAS thread per worker, the cores are shared out between the grid searches instead
+    from threadpoolctl import threadpool_limits
+    thread_limits = threadpool_limits(limits=blas_threads)
+
+# Define a function to train, save and evaluate one model on one dataset
+def train_job(model_name, color_space_name, reference_file, model_id, models_dir, n_jobs, search, cache_dir=None, journal_path=None):
+    start_time = time.perf_counter()
+    X, Y = training.load_dataset(reference_file, color_space_name, cache_dir)
+    X_train, X_test, Y_train, Y_test = training.split_dataset(X, Y)
+    journal = CandidateJournal(journal_path) if journal_path is not None else None
+    model, best_params, best_score, n_fits = training.search_model(model_name, X_train, Y_train, n_jobs=n_jobs,
+                                                                   journal=journal, **search)
+
+    # Save the model atomically, so an interrupted run never leaves a truncated file
+    model_file = os.path.join(models_dir, f"{model_id}.joblib")
+    temp_file = f"{model_file}.tmp"
+    joblib.dump(model, temp_file)
+    os.replace(temp_file, model_file)
+
+    return {
+        "model_id": model_id,
+        "model_name": model_name,
+        "color_space": color_space_name,
+        "dataset": training.get_dataset_name(reference_file),
+        "model_file": model_file,
+        "sha256": file_hash(model_file),
+        "model_type": type(model).__name__,
+        "n_features": int(model.n_features_in_),
+        "best_params": best_params,
+        "best_score": float(best_score),
+        "search": dict(search, n_fits=n_fits, n_estimators=int(getattr(model, "n_estimators_", 0)) or None),
+        "metrics": training.evaluate_model(model, X_test, Y_test),
+        "seconds": time.perf_counter() - start_time,
+    }
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Train every model x color space x dataset combination in parallel.")
+    parser.add_argument("--models", nargs="+", default=training.MODEL_NAMES, choices=training.MODEL_NAMES, help="Models to train.")
+    parser.add_argument("--color-spaces", nargs="+", default=training.COLOR_SPACES, choices=training.COLOR_SPACES, help="Color spaces to train.")
+    parser.add_argument("--datasets", nargs="+", default=[DATASET_NAME],
+                        help="Dataset names of data/training/reference_corrected_*.csv ('all' for every dataset).")
+    parser.add_argument("--search", choices=training.SEARCH_METHODS, default="grid", help="Hyperparameter search method.")
+    parser.add_argument("--max-fits", type=int, default=None, help="Budget of cross-validation fits per model.")
+    parser.add_argument("--time-budget", type=float, default=None, help="Budget of search time per model in seconds (grid and random).")
+    parser.add_argument("--early-stopping", action="store_true", help="Stop adding gradient boosting stages when validation stops improving.")
+    parser.add_argument("--no-feature-cache", action="store_true", help="Featurize the reference files again instead of using data/cache.")
+    parser.add_argument("--restart", action="store_true", help="Discard the checkpoints of earlier runs instead of resuming.")
+    parser.add_argument("--workers", type=int, default=None, help="Parallel training jobs (default: one per core, at most one per job).")
+    parser.add_argument("--output", default=None, help="Data directory to write models and metrics to (default: data).")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    output_path = args.output or data_path
+    models_dir = os.path.join(output_path, MODELS_DIRECTORY)
+    metrics_dir = os.path.join(output_path, METRICS_DIRECTORY)
+    cache_dir = None if args.no_feature_cache else os.path.join(data_path, FEATURE_CACHE_DIRECTORY)
+    if not os.path.exists(models_dir):
+        os.makedirs(models_dir)
+        print(f"Model directory is created at: {models_dir}")
+
+    # Collect the reference files of the datasets
+    catalog = DataCatalog(data_path)
+    if args.datasets == ["all"]:
+        reference_files = sorted(catalog.absolute(row["path"]) for row in catalog.find(kind="reference_corrected"))
+    else:
+        reference_files = [os.path.join(data_path, TRAINING_DIRECTORY, f"reference_corrected_{name}.csv") for name in args.datasets]
+    missing_files = [reference_file for reference_file in reference_files if not os.path.exists(reference_file)]
+    if missing_files or not reference_files:
+        print(f"No reference data found at: {missing_files or os.path.join(data_path, TRAINING_DIRECTORY)}")
+        sys.exit(1)
+
+    # Model ids keep the notebook names (e.g. "svm_hsl") unless several datasets are trained at once
+    multiple_datasets = len(reference_files) > 1
+    jobs = []
+    for reference_file in reference_files:
+        dataset_name = training.get_dataset_name(reference_file)
+        for color_space_name in args.color_spaces:
+            for model_name in args.models:
+                model_id = training.get_model_id(model_name, color_space_name, dataset_name if multiple_datasets else None)
+                jobs.append((model_name, color_space_name, reference_file, model_id))
+    # Longest jobs first, so the short ones fill the gaps at the end
+    jobs.sort(key=lambda job: -training.MODEL_COSTS.get(job[0], 1))
+
+    # Share the cores between parallel jobs and the cross-validation inside each job
+    num_cores = os.cpu_count() or 1
+    workers = max(1, min(args.workers or num_cores, len(jobs)))
+    n_jobs = max(1, num_cores // workers)
+    search = {"method": args.search, "max_fits": args.max_fits, "time_budget": args.time_budget, "early_stopping": args.early_stopping}
+    print(f"Training {len(jobs)} models with {workers} workers x {n_jobs} jobs on {num_cores} cores.")
+    print(f"Search: {search}\n")
+
+    # Jobs finished by an earlier, interrupted run are skipped if their model file is unchanged
+    checkpoint = SweepCheckpoint(os.path.join(data_path, CHECKPOINT_DIRECTORY))
+    if args.restart:
+        checkpoint.clear()
+    source_hashes = {reference_file: file_hash(reference_file) for reference_file in reference_files}
+    results = []
+    pending_jobs = []
+    for job in jobs:
+        job_key = SweepCheckpoint.job_key(job[3], source_hashes[job[2]], search)
+        result = checkpoint.get(job_key)
+        model_file = result["model_file"] if result is not None else None
+        if result is not None and model_file == os.path.join(models_dir, f"{job[3]}.joblib") \
+                and os.path.exists(model_file) and file_hash(model_file) == result["sha256"]:
+            results.append(result)
+            print(f"{job[3]}: finished in an earlier run, skipped.")
+        else:
+            pending_jobs.append((job, job_key))
+
+    start_time = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(1,)) as executor:
+        futures = {
+            executor.submit(train_job, *job, models_dir, n_jobs, search, cache_dir,
+                            os.path.join(checkpoint.checkpoint_dir, f"{job_key}.jsonl")): (job, job_key)
+            for job, job_key in pending_jobs
+        }
+        for future in as_completed(futures):
+            job, job_key = futures[future]
+            model_id = job[3]
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"{model_id}: training error occurred: {e}")
+                continue
+            checkpoint.record(job_key, result)
+            results.append(result)
+            print(f"{model_id}: MAE {result['metrics']['MAE']:.4f}, R^2 {result['metrics']['R^2']:.4f} "
+                  f"in {result['seconds']:.1f} s ({result['search']['n_fits']} fits), best parameters {result['best_params']}")
+
+    # Metrics per color space and dataset, in the notebooks' model order
+    print()
+    output_files = []
+    for reference_file in reference_files:
+        dataset_name = training.get_dataset_name(reference_file)
+        for color_space_name in args.color_spaces:
+            rows = [
+                {"Model": training.get_model_id(result["model_name"], color_space_name), **result["metrics"]}
+                for model_name in args.models for result in results
+                if result["model_name"] == model_name and result["color_space"] == color_space_name and result["dataset"] == dataset_name
+            ]
+            if rows:
+                output_files.append(training.save_metrics(rows, metrics_dir, color_space_name, dataset_name))
+
+    # Register the models in the manifest, with the calibration the reference data was scaled with (the active one)
+    registry = ModelRegistry(models_dir)
+    calibration = get_store(data_path).reference()
+    for result in results:
+        registry.register(result["model_file"], model_id=result["model_id"], model_name=result["model_name"],
+                          color_space=result["color_space"], dataset=result["dataset"], calibration=calibration,
+                          model_type=result["model_type"], n_features=result["n_features"], save=False, best_params=result["best_params"],
+                          metrics=result["metrics"], search=result["search"])
+    registry.save_manifest()
+    print(f"Manifest updated at: {registry.manifest_path}")
+
+    # Index the new files in the data catalog (models are linked to their dataset through the manifest)
+    if os.path.abspath(output_path) == os.path.abspath(data_path):
+        for output_file in [result["model_file"] for result in results] + output_files + [registry.manifest_path]:
+            catalog.add(output_file, commit=False)
+        catalog.connection.commit()
+    catalog.close()
+
+    print(f"\nTrained {len(results)}/{len(jobs)} models ({len(jobs) - len(pending_jobs)} from checkpoints) "
+          f"in {time.perf_counter() - start_time:.1f} s.")
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import joblib
+from modules.model_registry import ModelRegistry, file_hash
+from modules.incremental import ModelVersions, update_model
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+TRAINING_DIRECTORY = "training"
+DATASET_NAME = "BCA-200uL-2"
+
+
+# Define a function to print the version history of a model
+def print_history(versions, model_id):
+    entry = versions.registry.get(model_id)
+    print(f"{model_id}: version {versions.version(model_id)} ({entry['sha256'][:12]})")
+    for record in versions.history(model_id):
+        update = record.get("metadata") or {}
+        print(f"\tversion {record['version']:>3} {record['sha256'][:12]} {update.get('updated', 'initial'):>19} "
+              f"{update.get('method', '')} {update.get('new_rows', '')}")
+
+# Define a function to get the mean absolute error of a model on some rows
+def get_mae(model, X, Y):
+    return float(np.mean(np.abs(model.predict(X) - Y))) if len(X) else float("nan")
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Update a registered model with newly appended reference rows, or roll it back.")
+    parser.add_argument("model_id", help="Registered model id (e.g. svm_hsl).")
+    parser.add_argument("--reference", default=None, help="Reference .csv file (default: data/training/reference_corrected_<dataset>.csv).")
+    parser.add_argument("--since-row", type=int, default=None,
+                        help="First new row of the reference file (default: the rows after the last update).")
+    parser.add_argument("--rollback", nargs="?", type=int, const=-1, default=None, metavar="VERSION",
+                        help="Restore an earlier version (default: the previous one) instead of updating.")
+    parser.add_argument("--history", action="store_true", help="Print the version history and exit.")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    registry = ModelRegistry(os.path.join(data_path, MODELS_DIRECTORY))
+    versions = ModelVersions(registry)
+    entry = registry.get(args.model_id)
+
+    if args.history:
+        print_history(versions, args.model_id)
+        sys.exit(0)
+
+    if args.rollback is not None:
+        try:
+            version = versions.rollback(args.model_id, None if args.rollback < 0 else args.rollback)
+        except ValueError as e:
+            print(f"Rollback error occurred: {e}")
+            sys.exit(1)
+        print(f"{args.model_id} rolled back to version {version}.")
+        print_history(versions, args.model_id)
+        sys.exit(0)
+
+    # Find the rows that the model has not seen yet
+    reference_file = args.reference or os.path.join(data_path, TRAINING_DIRECTORY,
+                                                    f"reference_corrected_{entry.get('dataset') or DATASET_NAME}.csv")
+    reference_df = pd.read_csv(reference_file)
+    last_update = entry.get("update") or {}
+    since_row = args.since_row
+    if since_row is None:
+        if last_update.get("reference_file") != os.path.basename(reference_file):
+            print(f"{args.model_id} was not updated from {os.path.basename(reference_file)} before. Give the first new row with --since-row.")
+            sys.exit(1)
+        since_row = last_update["reference_rows"]
+    if since_row >= len(reference_df):
+        print(f"No new rows in {reference_file} (rows: {len(reference_df)}, since row: {since_row}).")
+        sys.exit(0)
+
+    X_all = registry.featurize(args.model_id, reference_df[["Red", "Green", "Blue"]].to_numpy(dtype=np.float64))
+    Y_all = reference_df["Label"].to_numpy(dtype=np.float64)
+    X_new, Y_new = X_all[since_row:], Y_all[since_row:]
+    print(f"Updating {args.model_id} (version {versions.version(args.model_id)}) with {len(X_new)} new rows of {len(X_all)}.")
+
+    # Update a copy of the model, the registered file is only replaced by the commit
+    model = joblib.load(os.path.join(registry.models_dir, entry["file"]))
+    mae_before = get_mae(model, X_new, Y_new) # Rows the model has not seen yet
+    start_time = time.perf_counter()
+    model, method = update_model(model, X_new, Y_new, X_all, Y_all)
+    seconds = time.perf_counter() - start_time
+    mae_training = get_mae(model, X_new, Y_new) # Training error: the model was just fitted on these rows
+
+    version = versions.commit(args.model_id, model, method=method, reference_file=os.path.basename(reference_file),
+                              reference_sha256=file_hash(reference_file), reference_rows=len(reference_df),
+                              new_rows=len(X_new), mae_new_rows_before=mae_before, mae_new_rows_training=mae_training)
+    print(f"Update ({method}) took {seconds:.2f} s. MAE on new rows: {mae_before:.4f} before the update (unseen), "
+          f"{mae_training:.4f} after it (training error)")
+    print(f"{args.model_id} is now version {version}. Roll back with: {sys.argv[0]} {args.model_id} --rollback")
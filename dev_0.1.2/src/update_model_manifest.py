@@ -0,0 +1,74 @@
+import os
+import sys
+import glob
+import argparse
+from modules import training
+from modules.model_registry import ModelRegistry
+from modules.calibration_store import get_store, LEGACY_CALIBRATION_FILE
+
+
+# Hyperparameters
+DATA_DIRECTORY = os.path.join("..", "data")
+MODELS_DIRECTORY = "models"
+METRICS_DIRECTORY = "metrics"
+TRAINING_DIRECTORY = "training"
+
+
+if __name__ == "__main__":
+    print("\n"+"="*50)
+    print(f"{sys.argv[0]} is running.")
+    print("="*50+"\n")
+
+    parser = argparse.ArgumentParser(description="Register new models in the manifest and verify registered ones.")
+    parser.add_argument("--no-inspect", action="store_true", help="Do not load new models to record their type and dataset.")
+    args = parser.parse_args()
+
+    # Get the directory of the current script
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    data_path = os.path.join(current_dir, DATA_DIRECTORY)
+    models_path = os.path.join(data_path, MODELS_DIRECTORY)
+    registry = ModelRegistry(models_path)
+
+    # Register models not in the manifest yet
+    new_ids = registry.scan(inspect=not args.no_inspect)
+    for model_id in new_ids:
+        print(f"Registered: {model_id}")
+
+    # Record where models without a dataset came from: the corrected reference file on which they reproduce their recorded MAE,
+    # scaled with the legacy calibration.txt (train_models.py records both when it trains a model)
+    if not args.no_inspect:
+        reference_files = sorted(glob.glob(os.path.join(data_path, TRAINING_DIRECTORY, "reference_corrected_*.csv")))
+        legacy_calibration = get_store(data_path).reference(source=LEGACY_CALIBRATION_FILE)
+        for model_id in registry.model_ids():
+            entry = registry.get(model_id)
+            if entry["dataset"] is not None or entry["format"] != "joblib":
+                continue
+            color_space_name = entry["pipeline"]["color_space"]
+            recorded_mae = training.get_recorded_mae(os.path.join(data_path, METRICS_DIRECTORY), model_id, entry["model_name"], color_space_name)
+            dataset_name = training.infer_dataset(registry.load(model_id, mmap_mode=None), color_space_name, recorded_mae, reference_files)
+            if dataset_name is None:
+                print(f"Dataset of {model_id} not found.")
+                continue
+            registry.update(model_id, save=False, dataset=dataset_name, calibration=entry["calibration"] or legacy_calibration)
+            print(f"Dataset of {model_id}: {dataset_name}")
+        registry.save_manifest()
+
+    # Verify every registered model
+    print(f"\n{'Model':<32} {'Type':<28} {'Features':<18} {'Hash':<8}")
+    mismatches = []
+    for model_id in registry.model_ids():
+        entry = registry.get(model_id)
+        features = entry["pipeline"]["features"] or []
+        status = "ok" if registry.verify(model_id) else "CHANGED"
+        if status != "ok":
+            mismatches.append(model_id)
+        feature_text = f"{entry['pipeline']['color_space']} ({entry['n_features']})"
+        if entry["n_features"] is not None and entry["n_features"] != len(features):
+            feature_text += " !"
+        print(f"{model_id:<32} {str(entry['model_type']):<28} {feature_text:<18} {status:<8}")
+
+    print(f"\nManifest: {os.path.abspath(registry.manifest_path)}")
+    print("Models marked with ! expect a different number of features than their color space provides.")
+    if mismatches:
+        print(f"Models changed since they were registered: {mismatches}")
+        sys.exit(1)